@@ -0,0 +1,109 @@
+"""
+Benchmark the per-call overhead of the dino wrapper, with a stub provider
+answering instantly so that only the work done by dino itself is measured.
+
+Usage:
+
+    python benchmarks/dino_overhead.py --calls 2000 --tools 3
+"""
+
+from opsmate.dino import dino
+from opsmate.dino.limiter import RateLimiter
+from opsmate.dino.provider.openai import OpenAIProvider
+from opsmate.dino.types import ToolCall
+from pydantic import BaseModel, Field, create_model
+from unittest.mock import patch
+import argparse
+import asyncio
+import time
+
+
+class Answer(BaseModel):
+    answer: str = Field(description="The answer")
+
+
+def make_tools(count: int):
+    return [
+        create_model(
+            f"Tool{i}",
+            __base__=ToolCall,
+            value=(str, Field(description="The value")),
+        )
+        for i in range(count)
+    ]
+
+
+async def stub_chat_completion(response_model, stream: bool = False, **kwargs):
+    if response_model is Answer:
+        return Answer(answer="42")
+
+    # the tool calls phase, no tool is called
+    async def no_tool_calls():
+        return
+        yield
+
+    return no_tool_calls() if stream else []
+
+
+async def bench(name: str, fn, calls: int):
+    # warm up the caches
+    await fn("warm up")
+    start = time.perf_counter()
+    for i in range(calls):
+        await fn(f"question {i}")
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>10}: {calls} calls in {elapsed:.3f}s ({elapsed / calls * 1e6:.1f}µs/call)"
+    )
+
+
+async def main(calls: int, tools: int):
+    rate_limiter = RateLimiter()
+
+    @dino("gpt-4o-mini", response_model=Answer, rate_limiter=rate_limiter)
+    async def plain(question: str):
+        """
+        You are a helpful assistant.
+        """
+        return question
+
+    @dino(
+        "gpt-4o-mini",
+        response_model=Answer,
+        tools=make_tools(tools),
+        rate_limiter=rate_limiter,
+    )
+    async def with_tools(question: str):
+        """
+        You are a helpful assistant.
+        """
+        return question
+
+    def after_hook(question: str, response: Answer):
+        return response
+
+    @dino(
+        "gpt-4o-mini",
+        response_model=Answer,
+        after_hook=after_hook,
+        rate_limiter=rate_limiter,
+    )
+    def with_hook(question: str):
+        """
+        You are a helpful assistant.
+        """
+        return question
+
+    with patch.object(OpenAIProvider, "chat_completion", stub_chat_completion):
+        await bench("plain", plain, calls)
+        await bench("tools", with_tools, calls)
+        await bench("after_hook", with_hook, calls)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--tools", type=int, default=3)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.calls, args.tools))
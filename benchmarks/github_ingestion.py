@@ -0,0 +1,123 @@
+"""
+Compare the per-file contents API against the tarball fast path of GithubIngestion.
+
+A local HTTP stub serves a fixture repository through the tree, contents and
+tarball endpoints, with a fixed latency per request to mimic the round trip
+to api.github.com.
+
+Usage:
+
+    python benchmarks/github_ingestion.py --files 500 --latency-ms 20
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from opsmate.ingestions.github import GithubIngestion
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import tarfile
+import threading
+import time
+import httpx
+
+
+def fixture_repo(num_files: int, file_size: int) -> dict[str, bytes]:
+    return {
+        f"docs/section-{i // 50}/page-{i}.md": (
+            f"# Page {i}\n\n" + "lorem ipsum dolor sit amet " * (file_size // 27)
+        ).encode()
+        for i in range(num_files)
+    }
+
+
+def make_handler(files: dict[str, bytes], tarball: bytes, latency: float):
+    tree = {
+        "tree": [
+            {"type": "blob", "path": path, "sha": hashlib.sha1(data).hexdigest()}
+            for path, data in files.items()
+        ]
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, body: bytes, content_type: str):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            time.sleep(latency)
+            if "/git/trees/" in self.path:
+                self._send(json.dumps(tree).encode(), "application/json")
+            elif "/tarball/" in self.path:
+                self._send(tarball, "application/x-gzip")
+            elif "/contents/" in self.path:
+                path = self.path.split("/contents/", 1)[1]
+                body = {
+                    "content": base64.b64encode(files[path]).decode(),
+                    "html_url": f"https://github.com/owner/repo/blob/main/{path}",
+                    "sha": hashlib.sha1(files[path]).hexdigest(),
+                }
+                self._send(json.dumps(body).encode(), "application/json")
+            else:
+                self.send_error(404)
+
+    return Handler
+
+
+def make_tarball(files: dict[str, bytes]) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for path, data in files.items():
+            info = tarfile.TarInfo(f"owner-repo-abc123/{path}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+async def run(api_url: str, use_archive: bool):
+    async with httpx.AsyncClient() as client:
+        ingestion = GithubIngestion(
+            repo="owner/repo",
+            github_token="fake-token",
+            github_api_url=api_url,
+            glob="**/*.md",
+            client=client,
+            use_archive=use_archive,
+            archive_min_files=0,
+        )
+        start = time.perf_counter()
+        docs = [doc async for doc in ingestion.load()]
+        return len(docs), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--file-size", type=int, default=4096)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    files = fixture_repo(args.files, args.file_size)
+    handler = make_handler(files, make_tarball(files), args.latency_ms / 1000)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        for name, use_archive in (("contents api", False), ("tarball", True)):
+            num_docs, elapsed = asyncio.run(run(api_url, use_archive))
+            print(f"{name:>12}: {num_docs} docs in {elapsed:.3f}s")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark RecursiveTextSplitter on large log-like and prose-like inputs,
+with split_text on a string and iter_split streaming from a file.
+
+Usage:
+
+    python benchmarks/recursive_splitter.py --size-mb 4 --chunk-size 1000
+"""
+
+from opsmate.textsplitters.recursive import RecursiveTextSplitter
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+
+
+def log_text(size: int) -> str:
+    levels = ["INFO", "WARN", "ERROR", "DEBUG"]
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        line = (
+            f"2024-01-01T00:00:{i % 60:02d}Z {random.choice(levels)} "
+            f"pod/api-{i % 7} request_id={i:08x} latency_ms={random.randint(1, 999)}, "
+            "upstream responded; retrying."
+        )
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+    return "\n".join(lines)
+
+
+def prose_text(size: int) -> str:
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing"]
+    paragraphs = []
+    total = 0
+    while total < size:
+        sentences = [
+            " ".join(random.choices(words, k=random.randint(5, 20))) + "."
+            for _ in range(random.randint(2, 8))
+        ]
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def bench(name: str, text: str, chunk_size: int, chunk_overlap: int):
+    splitter = RecursiveTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    start = time.perf_counter()
+    chunks = splitter.split_text(text)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>6}: {len(text) / 1024 / 1024:.1f}MB -> {len(chunks)} chunks "
+        f"in {elapsed:.3f}s ({len(text) / 1024 / 1024 / elapsed:.1f}MB/s)"
+    )
+
+
+def bench_stream(name: str, text: str, chunk_size: int, chunk_overlap: int):
+    splitter = RecursiveTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    with tempfile.TemporaryFile("w+") as f:
+        f.write(text)
+        f.seek(0)
+        tracemalloc.start()
+        start = time.perf_counter()
+        num_chunks = sum(1 for _ in splitter.iter_split(f))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(
+        f"{name:>6}: {len(text) / 1024 / 1024:.1f}MB -> {num_chunks} chunks "
+        f"streamed in {elapsed:.3f}s, peak {peak / 1024 / 1024:.1f}MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(0)
+    size = int(args.size_mb * 1024 * 1024)
+    logs, prose = log_text(size), prose_text(size)
+    bench("logs", logs, args.chunk_size, args.chunk_overlap)
+    bench("prose", prose, args.chunk_size, args.chunk_overlap)
+    bench_stream("logs", logs, args.chunk_size, args.chunk_overlap)
+    bench_stream("prose", prose, args.chunk_size, args.chunk_overlap)
+    # a single unbroken line exercises the character level split
+    bench("blob", "x" * (size // 8), args.chunk_size, args.chunk_overlap)
+
+
+if __name__ == "__main__":
+    main()
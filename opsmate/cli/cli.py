@@ -6,7 +6,8 @@ from rich.table import Table
 from rich.text import Text
 from rich.prompt import Prompt
 from rich.markdown import Markdown
-from opsmate.dino import dino, run_react
+from rich.live import Live
+from opsmate.dino import dino, run_react, is_partial
 from opsmate.dino.types import (
     Observation,
     ReactAnswer,
@@ -16,6 +17,8 @@ from opsmate.dino.types import (
 )
 from opsmate.dino.provider import Provider
 from opsmate.dino.context import ContextRegistry
+from opsmate.dino.cache import ToolCache
+from opsmate.dino.usage import UsageRegistry, usage_context
 from functools import wraps
 from opsmate.config import config
 from opsmate.gui.config import config as gui_config
@@ -185,7 +188,8 @@ def with_runtime(func):
         try:
             for runtime in runtimes.values():
                 await runtime.connect()
-            return await func(*args, **kwargs)
+            with usage_context(kwargs["config"].context):
+                return await func(*args, **kwargs)
         finally:
             for runtime in runtimes.values():
                 await runtime.disconnect()
@@ -244,6 +248,7 @@ def common_params(func):
         kwargs["tool_call_context"] = {
             "max_output_length": kwargs.pop("max_output_length"),
             "in_terminal": True,
+            "tool_cache": ToolCache(),
         }
         if review:
             kwargs["tool_call_context"]["confirmation"] = confirmation_prompt
@@ -270,6 +275,63 @@ def auto_migrate(func):
     return wrapper
 
 
+class LiveMarkdown:
+    """
+    Render the partial outputs in place, until the complete output is printed.
+    """
+
+    def __init__(self):
+        self._live = None
+
+    def update(self, text: str):
+        if self._live is None:
+            self._live = Live(
+                Markdown(text), console=console, transient=True, refresh_per_second=8
+            )
+            self._live.start()
+        else:
+            self._live.update(Markdown(text))
+
+    def stop(self):
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def partial_markdown(output: React | ReactAnswer | Observation) -> str:
+    match output:
+        case React():
+            return f"""
+## Thought process
+### Thought
+
+{output.thoughts or ""}
+
+### Action
+
+{output.action or ""}
+"""
+        case ReactAnswer():
+            return f"""
+## Answer
+
+{output.answer or ""}
+"""
+        case Observation():
+            return f"""
+## Observation
+
+{output.observation or ""}
+"""
+    return ""
+
+
 async def confirmation_prompt(tool_call: ToolCall):
     console.print(
         Markdown(
@@ -308,6 +370,11 @@ Edit the execution if needed, then press Enter to execute:
     is_flag=True,
     help="Do not print observation",
 )
+@click.option(
+    "--no-stream",
+    is_flag=True,
+    help="Do not stream the responses as they are generated",
+)
 @config_params()
 @tool_config_params
 @runtime_params
@@ -321,6 +388,7 @@ async def run(
     system_prompt,
     no_tool_output,
     no_observation,
+    no_stream,
     runtimes,
     config,
     span,
@@ -343,13 +411,21 @@ async def run(
             "cli.run.system_prompt": system_prompt if system_prompt else "",
             "cli.run.no_tool_output": no_tool_output,
             "cli.run.no_observation": no_observation,
+            "cli.run.no_stream": no_stream,
             "cli.run.max_output_length": tool_call_context["max_output_length"],
         }
     )
 
     logger.info("Running on", instruction=instruction, model=config.model)
 
-    @dino(config.model, response_model=Observation, tools=tools, **run_kwargs)
+    @dino(
+        config.model,
+        response_model=Observation,
+        tools=tools,
+        stream=not no_stream,
+        stream_tool_calls=True,
+        **run_kwargs,
+    )
     async def run_command(instruction: str, context={}):
         sys_prompts = await ctx.resolve_contexts(runtimes=runtimes)
         if system_prompt:
@@ -362,11 +438,18 @@ async def run(
         ]
 
     try:
-        observation = await run_command(
+        observations = run_command(
             instruction,
             context=tool_call_context,
             tool_calls_only=no_observation,
         )
+        if no_stream:
+            observation = await observations
+        else:
+            with LiveMarkdown() as live:
+                async for observation in observations:
+                    if is_partial(observation):
+                        live.update(partial_markdown(observation))
         if no_observation:
             for tool_call in observation.tool_outputs:
                 console.print(
@@ -415,6 +498,17 @@ async def run(
     show_default=True,
     help="Number of tool calls per action",
 )
+@click.option(
+    "--max-history-tokens",
+    default=None,
+    type=int,
+    help="Compact the older iterations once the history is over this many tokens, kept in full if not set",
+)
+@click.option(
+    "--no-stream",
+    is_flag=True,
+    help="Do not stream the responses as they are generated",
+)
 @config_params()
 @tool_config_params
 @runtime_params
@@ -430,6 +524,8 @@ async def solve(
     no_tool_output,
     answer_only,
     tool_calls_per_action,
+    max_history_tokens,
+    no_stream,
     config,
     runtimes,
     span,
@@ -453,6 +549,8 @@ async def solve(
             "cli.solve.no_tool_output": no_tool_output,
             "cli.solve.answer_only": answer_only,
             "cli.solve.tool_calls_per_action": tool_calls_per_action,
+            "cli.solve.max_history_tokens": max_history_tokens or 0,
+            "cli.solve.no_stream": no_stream,
         }
     )
     contexts = await ctx.resolve_contexts(runtimes=runtimes)
@@ -470,17 +568,24 @@ async def solve(
             tools=tools,
             tool_call_context=tool_call_context,
             tool_calls_per_action=tool_calls_per_action,
+            max_history_tokens=max_history_tokens,
+            stream=not no_stream and not answer_only,
             **run_react_kwargs,
         )
     ) as run:
-        async for output in run:
-            match output:
-                case React():
-                    if answer_only:
-                        continue
-                    console.print(
-                        Markdown(
-                            f"""
+        with LiveMarkdown() as live:
+            async for output in run:
+                if is_partial(output):
+                    live.update(partial_markdown(output))
+                    continue
+                live.stop()
+                match output:
+                    case React():
+                        if answer_only:
+                            continue
+                        console.print(
+                            Markdown(
+                                f"""
 ## Thought process
 ### Thought
 
@@ -490,33 +595,33 @@ async def solve(
 
 {output.action}
 """
+                            )
                         )
-                    )
-                case Observation():
-                    if answer_only:
-                        continue
-                    console.print(Markdown("## Observation"))
-                    if not no_tool_output:
-                        for tool_call in output.tool_outputs:
-                            console.print(
-                                Markdown(
-                                    tool_call.display(context={"in_terminal": True})
+                    case Observation():
+                        if answer_only:
+                            continue
+                        console.print(Markdown("## Observation"))
+                        if not no_tool_output:
+                            for tool_call in output.tool_outputs:
+                                console.print(
+                                    Markdown(
+                                        tool_call.display(context={"in_terminal": True})
+                                    )
                                 )
-                            )
-                    console.print(Markdown(output.observation))
-                case ReactAnswer():
-                    if answer_only:
-                        print(output.answer)
-                        break
-                    console.print(
-                        Markdown(
-                            f"""
+                        console.print(Markdown(output.observation))
+                    case ReactAnswer():
+                        if answer_only:
+                            print(output.answer)
+                            break
+                        console.print(
+                            Markdown(
+                                f"""
 ## Answer
 
 {output.answer}
 """
+                            )
                         )
-                    )
 
 
 help_msg = """
@@ -542,6 +647,17 @@ Commands:
     show_default=True,
     help="Number of tool calls per action",
 )
+@click.option(
+    "--max-history-tokens",
+    default=None,
+    type=int,
+    help="Compact the older iterations once the history is over this many tokens, kept in full if not set",
+)
+@click.option(
+    "--no-stream",
+    is_flag=True,
+    help="Do not stream the responses as they are generated",
+)
 @config_params()
 @tool_config_params
 @runtime_params
@@ -554,6 +670,8 @@ async def chat(
     tool_call_context,
     system_prompt,
     tool_calls_per_action,
+    max_history_tokens,
+    no_stream,
     runtimes,
     config,
     span,
@@ -574,10 +692,13 @@ async def chat(
             "cli.chat.tools": [t.__name__ for t in tools],
             "cli.chat.system_prompt": system_prompt if system_prompt else "",
             "cli.chat.tool_calls_per_action": tool_calls_per_action,
+            "cli.chat.max_history_tokens": max_history_tokens or 0,
+            "cli.chat.no_stream": no_stream,
         }
     )
     opsmate_says("Howdy! How can I help you?\n" + help_msg)
 
+    live = LiveMarkdown()
     try:
         chat_history = []
         while True:
@@ -607,11 +728,17 @@ async def chat(
                 chat_history=chat_history,
                 tool_call_context=tool_call_context,
                 tool_calls_per_action=tool_calls_per_action,
+                max_history_tokens=max_history_tokens,
+                stream=not no_stream,
                 **run_react_kwargs,
             )
             chat_history.append(Message.user(user_input))
 
             async for output in run:
+                if is_partial(output):
+                    live.update(partial_markdown(output))
+                    continue
+                live.stop()
                 if isinstance(output, React):
                     tp = f"""
 ## Thought process
@@ -649,6 +776,7 @@ async def chat(
                     console.print(Markdown(tp))
                     chat_history.append(Message.assistant(tp))
     except (KeyboardInterrupt, EOFError):
+        live.stop()
         opsmate_says("Goodbye!")
 
 
@@ -990,6 +1118,54 @@ def list_models(provider):
     console.print(table)
 
 
+@opsmate_cli.command()
+@click.option(
+    "--path",
+    envvar="OPSMATE_DINO_USAGE_PATH",
+    required=True,
+    help="The usage records to report on (env: OPSMATE_DINO_USAGE_PATH)",
+)
+@click.option(
+    "--by",
+    type=click.Choice(["function", "model", "context"]),
+    multiple=True,
+    default=["function", "model", "context"],
+    show_default=True,
+    help="The fields to aggregate the usage by",
+)
+def usage(path, by):
+    """
+    Report the token usage and latency of the LLM calls.
+
+    The usage is recorded when OPSMATE_DINO_USAGE_PATH is set.
+    """
+    if not os.path.exists(path):
+        console.print(f"No usage recorded at {path}")
+        exit(1)
+
+    table = Table(title="Usage", show_header=True)
+    for field in by:
+        table.add_column(field.capitalize())
+    for column in ["Calls", "Prompt", "Cached", "Completion", "TTFT", "Latency"]:
+        table.add_column(column, justify="right")
+
+    for report in UsageRegistry.load(path).report(by=by):
+        cached_ratio = (
+            report.cached_tokens / report.prompt_tokens if report.prompt_tokens else 0
+        )
+        table.add_row(
+            *[getattr(report, field) or "-" for field in by],
+            str(report.calls),
+            str(report.prompt_tokens),
+            f"{report.cached_tokens} ({cached_ratio:.0%})",
+            str(report.completion_tokens),
+            f"{report.ttft:.2f}s",
+            f"{report.latency:.2f}s",
+        )
+
+    console.print(table)
+
+
 @opsmate_cli.command()
 @click.option(
     "--source",
@@ -1007,10 +1183,20 @@ def list_models(provider):
     show_default=True,
     help="Glob to use to find the knowledge base",
 )
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Keep watching the fs knowledge base and ingest the files as they change",
+)
+@click.option(
+    "--force-polling",
+    is_flag=True,
+    help="Poll for changes instead of using inotify when watching",
+)
 @config_params()
 @auto_migrate
 @coro
-async def ingest(source, path, glob, config):
+async def ingest(source, path, glob, watch, force_polling, config):
     """
     Ingest a knowledge base.
     Notes the ingestion worker needs to be started separately with `opsmate worker`.
@@ -1034,6 +1220,10 @@ async def ingest(source, path, glob, config):
 
     provider, source = splitted
 
+    if watch and provider != "fs":
+        console.print("--watch is only supported for the fs source")
+        exit(1)
+
     if ":" in source:
         source, branch = source.split(":")
     else:
@@ -1064,7 +1254,18 @@ async def ingest(source, path, glob, config):
                     },
                     splitter_config=splitter_config,
                 )
-    console.print("Ingesting knowledges in the background...")
+        console.print("Ingesting knowledges in the background...")
+
+        if watch:
+            from opsmate.ingestions.watch import watch_and_ingest
+
+            console.print(f"Watching {source} for changes...")
+            await watch_and_ingest(
+                session,
+                ingestor_config={"local_path": source, "glob_pattern": glob},
+                splitter_config=splitter_config,
+                force_polling=force_polling,
+            )
 
 
 alembic_cfg_path = os.path.join(
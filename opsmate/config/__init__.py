@@ -20,6 +20,8 @@ import os
 logger = structlog.get_logger(__name__)
 
 default_embeddings_db_path = str(Path.home() / ".opsmate" / "embeddings")
+default_ingestion_blobs_path = str(Path.home() / ".opsmate" / "blobs")
+default_ingestion_manifests_path = str(Path.home() / ".opsmate" / "manifests")
 default_db_url = f"sqlite:///{str(Path.home() / '.opsmate' / 'opsmate.db')}"
 default_config_file = str(Path.home() / ".opsmate" / "config.yaml")
 default_plugins_dir = str(Path.home() / ".opsmate" / "plugins")
@@ -130,6 +132,21 @@ class Config(BaseSettings):
         description=github_embedding_desc,
         alias="OPSMATE_GITHUB_EMBEDDINGS_CONFIG",
     )
+    ingestion_blobs_path: str = Field(
+        default=default_ingestion_blobs_path,
+        description="The path to store the documents pending to be chunked by the ingestion workers",
+        alias="OPSMATE_INGESTION_BLOBS_PATH",
+    )
+    ingestion_manifests_path: str = Field(
+        default=default_ingestion_manifests_path,
+        description="The path to store the scan manifests of the fs ingestions",
+        alias="OPSMATE_INGESTION_MANIFESTS_PATH",
+    )
+    splitter_workers: int = Field(
+        default_factory=lambda: min(os.cpu_count() or 1, 4),
+        description="The number of processes to split the batches of documents with during ingestion, 0 to split them in the ingestion worker",
+        alias="OPSMATE_SPLITTER_WORKERS",
+    )
     categorise: bool = Field(
         default=True,
         description="Whether to categorise the embeddings",
@@ -197,6 +214,8 @@ class Config(BaseSettings):
         ):
             Path(self.embeddings_db_path).mkdir(parents=True, exist_ok=True)
         Path(self.contexts_dir).mkdir(parents=True, exist_ok=True)
+        Path(self.ingestion_blobs_path).mkdir(parents=True, exist_ok=True)
+        Path(self.ingestion_manifests_path).mkdir(parents=True, exist_ok=True)
         return self
 
     def db_engine(self):
@@ -5,6 +5,7 @@ from opsmate.tools import (
     HtmlToText,
     PrometheusTool,
     Thinking,
+    SpillRead,
 )
 from opsmate.dino.context import context
 from opsmate.runtime import Runtime
@@ -20,6 +21,7 @@ from jinja2 import Template
         HtmlToText,
         PrometheusTool,
         Thinking,
+        SpillRead,
     ],
 )
 async def cli_ctx(runtimes: dict[str, Runtime] = {}) -> str:
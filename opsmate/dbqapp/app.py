@@ -1,5 +1,6 @@
 from opsmate.dbq.dbq import Worker
 from opsmate.config import config
+from opsmate.ingestions.github import aclose_shared_clients
 import asyncio
 import structlog
 import signal
@@ -19,7 +20,10 @@ async def main(worker_count: int = 10, worker_queue: str = "default"):
     signal.signal(signal.SIGTERM, handle_signal)
     signal.signal(signal.SIGINT, handle_signal)
 
-    await worker.start()
+    try:
+        await worker.start()
+    finally:
+        await aclose_shared_clients()
 
 
 if __name__ == "__main__":
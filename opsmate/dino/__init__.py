@@ -1,4 +1,4 @@
-from .dino import dino
+from .dino import dino, is_partial
 from .provider import discover_providers, Provider
 from .tools import dtool
 from .react import run_react, react
@@ -6,6 +6,7 @@ from .context import context
 
 __all__ = [
     "dino",
+    "is_partial",
     "dtool",
     "run_react",
     "context",
@@ -0,0 +1,317 @@
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, Type, TypeVar, get_args
+from collections import OrderedDict
+from functools import cache, lru_cache
+from hashlib import sha256
+from pydantic import BaseModel, TypeAdapter
+from .types import Message, ToolCall
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class ResponseCache:
+    """
+    ResponseCache caches the serialised responses of the LLM calls,
+    in a memory LRU and optionally in a SQLite database on disk.
+
+    Parameters:
+        maxsize (int):
+            The maximum number of responses kept in memory.
+        path (str, optional):
+            The path of the SQLite database. When set, responses evicted from memory
+            and responses from previous runs are served from disk.
+        ttl (float, optional):
+            The number of seconds a response stays valid, forever if not set.
+    """
+
+    def __init__(
+        self, maxsize: int = 1024, path: str | None = None, ttl: float | None = None
+    ):
+        self.maxsize = maxsize
+        self.path = path
+        self.ttl = ttl
+        self._memory: OrderedDict[str, tuple[float | None, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS dino_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT value, expires_at FROM dino_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._db.execute("DELETE FROM dino_cache WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._set_memory(key, expires_at, value)
+            return value
+
+    def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._set_memory(key, expires_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO dino_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM dino_cache")
+                self._db.commit()
+
+    def _set_memory(self, key: str, expires_at: float | None, value: str):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+
+class ToolCache:
+    """
+    ToolCache caches the outputs of the tool calls registered as cacheable,
+    see `register_tool`, for the identical calls made later in the session.
+
+    It is scoped to the session by passing it in the tool call context as
+    `tool_cache`, `run_react` starts one for each run unless given.
+
+    Parameters:
+        maxsize (int):
+            The maximum number of outputs kept.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._outputs: OrderedDict[str, tuple[float | None, Any]] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        """
+        The number of times the cache is cleared, to be captured before a call
+        and passed to `set` with its output.
+        """
+        return self._generation
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Returns whether the output is cached and a copy of it.
+        """
+        with self._lock:
+            entry = self._outputs.get(key)
+            if entry is None:
+                return False, None
+            expires_at, output = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._outputs[key]
+                return False, None
+            self._outputs.move_to_end(key)
+        # the callers are free to mutate the output
+        return True, copy.deepcopy(output)
+
+    def set(
+        self,
+        key: str,
+        output: Any,
+        ttl: float | None = None,
+        generation: int | None = None,
+    ):
+        """
+        Cache the output, unless the cache is cleared since the generation the
+        call started in, as the output may be stale.
+        """
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._outputs[key] = (expires_at, copy.deepcopy(output))
+            self._outputs.move_to_end(key)
+            while len(self._outputs) > self.maxsize:
+                self._outputs.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._outputs.clear()
+            self._generation += 1
+
+
+class _Flight:
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.shared = False
+
+
+class SingleFlight:
+    """
+    SingleFlight coalesces the concurrent calls with the same key into one,
+    whose result is shared by all the callers.
+
+    When the result is shared each caller gets its own deep copy, as the
+    callers are free to mutate the result, e.g. running the returned tool calls.
+    """
+
+    def __init__(self):
+        # futures are bound to their event loop, the flights of a loop go away with it
+        self._flights: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, Dict[str, _Flight]
+        ] = weakref.WeakKeyDictionary()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Run fn unless a call with the same key is in flight.
+        Returns the result and whether it is shared with other callers.
+        """
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        flight = flights.get(key)
+        if flight is not None:
+            flight.shared = True
+            result = await asyncio.shield(flight.future)
+            return copy.deepcopy(result), True
+
+        flight = _Flight(asyncio.ensure_future(fn()))
+        flights[key] = flight
+
+        def done(future: asyncio.Future):
+            # runs before any of the callers resume, so late callers start a new flight
+            if flights.get(key) is flight:
+                del flights[key]
+            if not future.cancelled():
+                # the error is raised to the callers, if any are left
+                future.exception()
+
+        flight.future.add_done_callback(done)
+
+        # the flight carries on for the other callers if this one is cancelled
+        result = await asyncio.shield(flight.future)
+        if flight.shared:
+            return copy.deepcopy(result), True
+        return result, False
+
+
+@cache
+def default_response_cache() -> ResponseCache:
+    """
+    The response cache used by `dino(..., cache=True)`.
+
+    It is in memory only, unless OPSMATE_DINO_CACHE_PATH points at a SQLite database,
+    with the TTL in seconds configured by OPSMATE_DINO_CACHE_TTL.
+    """
+    ttl = os.getenv("OPSMATE_DINO_CACHE_TTL")
+    return ResponseCache(
+        path=os.getenv("OPSMATE_DINO_CACHE_PATH"),
+        ttl=float(ttl) if ttl else None,
+    )
+
+
+@lru_cache(maxsize=256)
+def _schema_hash(response_model: Any) -> str:
+    if isinstance(response_model, type) and issubclass(response_model, BaseModel):
+        schema = response_model.model_json_schema()
+    else:
+        schema = TypeAdapter(response_model).json_schema()
+    return sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+
+def cache_key(
+    model: str,
+    response_model: Any,
+    messages: List[Message],
+    tools: List[Type[ToolCall]],
+    kwargs: Dict[str, Any],
+) -> str:
+    """
+    The cache key of a LLM call.
+
+    Values that are not JSON serialisable are keyed by their repr, which for
+    most objects includes their identity, so calls with them are only shared
+    when the very same objects are passed.
+    """
+    key = {
+        "model": model,
+        "response_model": _schema_hash(response_model),
+        "messages": [message.model_dump(mode="json") for message in messages],
+        "tools": [_schema_hash(tool) for tool in tools],
+        "kwargs": kwargs,
+    }
+    return sha256(json.dumps(key, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+def _models(tp: Any) -> Dict[str, Type[BaseModel]]:
+    """Collect the pydantic models referenced by a type, by name."""
+    if isinstance(tp, type) and issubclass(tp, BaseModel):
+        return {tp.__name__: tp}
+    models = {}
+    for arg in get_args(tp):
+        models.update(_models(arg))
+    return models
+
+
+def dump_response(response: Any) -> str:
+    """
+    Serialise a response, recording the class of the pydantic models
+    so that unions are restored to the same members.
+    """
+
+    def encode(value: Any):
+        if isinstance(value, BaseModel):
+            return {
+                "model": value.__class__.__name__,
+                "data": value.model_dump(mode="json", exclude={"tool_outputs"}),
+            }
+        if isinstance(value, list):
+            return {"list": [encode(item) for item in value]}
+        return {"value": value}
+
+    return json.dumps(encode(response))
+
+
+def load_response(
+    data: str, response_model: Any, context: Dict[str, Any] | None = None
+) -> Any:
+    models = _models(response_model)
+
+    def decode(value: Dict[str, Any]):
+        if "model" in value:
+            return models[value["model"]].model_validate(value["data"], context=context)
+        if "list" in value:
+            return [decode(item) for item in value["list"]]
+        return value["value"]
+
+    return decode(json.loads(data))
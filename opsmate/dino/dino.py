@@ -1,5 +1,6 @@
 from typing import (
     Any,
+    AsyncGenerator,
     Callable,
     Coroutine,
     List,
@@ -10,23 +11,56 @@ from typing import (
     Awaitable,
     Type,
     Optional,
+    get_args,
+    get_origin,
 )
-from pydantic import BaseModel
+from types import UnionType
+from pydantic import BaseModel, TypeAdapter, create_model
 import inspect
-from functools import wraps
+from functools import lru_cache, wraps
 from .provider import Provider
 from .types import Message, ToolCall
 from .utils import args_dump
+from .cache import (
+    ResponseCache,
+    SingleFlight,
+    cache_key,
+    default_response_cache,
+    dump_response,
+    load_response,
+)
+from .prompt import assemble_prompt
+from .usage import (
+    UsageRecord,
+    UsageRegistry,
+    current_usage_context,
+    default_usage_registry,
+    track_usage,
+)
+from .limiter import (
+    Priority,
+    RateLimiter,
+    default_rate_limiter,
+    estimate_tokens,
+    use_priority,
+)
 import structlog
-from instructor import AsyncInstructor
+from instructor import AsyncInstructor, Partial
+from instructor.dsl.partial import PartialBase
 from tenacity import AsyncRetrying, stop_after_attempt, wait_fixed
 from opentelemetry import trace
 from opentelemetry.trace.status import Status, StatusCode
+from contextlib import nullcontext
 import asyncio
+import collections.abc
+import time
 
 logger = structlog.get_logger(__name__)
 tracer = trace.get_tracer("opsmate.dino")
 
+# shared by all the dino functions, so that identical calls coalesce across them
+single_flight = SingleFlight()
+
 P = ParamSpec("P")
 R = TypeVar("R")
 T = TypeVar("T")
@@ -38,6 +72,13 @@ def dino(
     after_hook: Optional[Callable | Coroutine] = None,
     tools: List[ToolCall] = [],
     client: AsyncInstructor = None,
+    cache: bool | ResponseCache = False,
+    coalesce: bool | None = None,
+    priority: Priority | None = None,
+    rate_limiter: RateLimiter | None = None,
+    usage_registry: UsageRegistry | None = None,
+    stream: bool = False,
+    stream_tool_calls: bool = False,
     **kwargs: Any,
 ):
     """
@@ -56,6 +97,28 @@ def dino(
             A list of tools to use, each must be a ToolCall.
         client (AsyncInstructor, optional):
             A custom instructor.AsyncInstructor instance. e.g. `instructor.from_openai(AsyncOpenAI()`
+        cache (bool | ResponseCache, optional):
+            Cache the responses of the LLM calls, keyed by the model, the response model schema,
+            the messages, the tools and the kwargs. Only meant for deterministic calls.
+            If True, the default cache is used, see `default_response_cache`.
+        coalesce (bool, optional):
+            Share one in-flight LLM call between the concurrent identical calls, keyed
+            the same way as the cache. Defaults to whether the cache is enabled.
+        priority (Priority, optional):
+            The priority of the LLM calls waiting for the rate limiter, including the ones
+            of the nested dino functions. Inherited from the caller if not set.
+        rate_limiter (RateLimiter, optional):
+            The rate limiter of the LLM calls, defaults to `default_rate_limiter`.
+        usage_registry (UsageRegistry, optional):
+            The registry to record the token usage and latency of the LLM calls to,
+            defaults to `default_usage_registry`. The usage is set on the spans regardless.
+        stream (bool, optional):
+            Stream the response. The decorated function then returns an async generator
+            yielding the partial responses as they arrive, see `is_partial`, followed by
+            the complete response. Only pydantic models and unions of them are streamed.
+        stream_tool_calls (bool, optional):
+            Stream the tool calls, running each of them as soon as it is parsed,
+            while the remaining ones are being generated. Defaults to False.
         **kwargs (Any):
             Additional arguments for the provider, such as:
             - max_tokens: required by Anthropic, defaults to 1000 if not provided
@@ -91,14 +154,22 @@ def dino(
         kwargs.update(fn_kwargs)
         return kwargs
 
-    def _validate_after_hook(after_hook: Callable):
+    def _validate_after_hook(after_hook: Callable) -> ValueError | None:
+        if not callable(after_hook):
+            return ValueError("after_hook must be a coroutine or a function")
         params = inspect.signature(after_hook).parameters
         if "response" not in params:
-            raise ValueError("after_hook must have `response` as a parameter")
+            return ValueError("after_hook must have `response` as a parameter")
+        return None
 
     decorator_model = model
     decorator_tools = tools
     decorator_client = client
+    response_cache = default_response_cache() if cache is True else cache or None
+    if coalesce is None:
+        coalesce = response_cache is not None
+    rate_limiter = rate_limiter or default_rate_limiter()
+    usage_registry = usage_registry or default_usage_registry()
 
     def _get_model(model: str, decorator_model: str):
         if model:
@@ -130,7 +201,16 @@ def dino(
             return client
         return decorator_client
 
+    # the after hook is validated once, the error is raised when the function is called
+    after_hook_error = _validate_after_hook(after_hook) if after_hook else None
+    after_hook_is_coroutine = inspect.iscoroutinefunction(after_hook)
+
     def wrapper(fn: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[T]]:
+        # what does not change between the calls is worked out once
+        system_prompt = inspect.getdoc(fn) if fn.__doc__ else ""
+        fn_is_coroutine = inspect.iscoroutinefunction(fn)
+        span_name = f"dino.{fn.__name__}"
+
         @wraps(fn)
         async def wrapper(
             *args: P.args,
@@ -138,6 +218,7 @@ def dino(
             model: str = None,
             client: AsyncInstructor = None,
             tool_calls_only: bool = False,
+            on_partial: Callable[[Any], None] | None = None,
             **fn_kwargs: P.kwargs,
         ):
             if tool_calls_only:
@@ -145,15 +226,21 @@ def dino(
                     raise ValueError(
                         f"response_model {response_model} must have a tool_outputs field when tool_calls_only is True"
                     )
-            with tracer.start_as_current_span(f"dino.{fn.__name__}") as fn_span:
+            if after_hook_error is not None:
+                raise after_hook_error
+            with (
+                tracer.start_as_current_span(span_name) as fn_span,
+                use_priority(priority) if priority is not None else nullcontext(),
+                # the usage of the nested dino functions, e.g. called by the tools, included
+                track_usage(fn_span),
+            ):
                 _model = _get_model(model, decorator_model)
                 _tools = _get_tools(tools, decorator_tools)
                 _client = _get_client(client, decorator_client)
                 provider = Provider.from_model(_model)
 
-                system_prompt = inspect.getdoc(fn) if fn.__doc__ else ""
                 # if is coroutine, await it
-                if inspect.iscoroutinefunction(fn):
+                if fn_is_coroutine:
                     prompt = await fn(*args, **fn_kwargs)
                 else:
                     prompt = fn(*args, **fn_kwargs)
@@ -199,16 +286,34 @@ def dino(
                     with tracer.start_as_current_span(
                         "dino.tool_calls"
                     ) as tool_call_span:
-                        initial_response = await provider.chat_completion(
-                            messages=messages,
-                            response_model=Iterable[Union[tuple(_tools)]],
-                            client=_client,
-                            max_retries=AsyncRetrying(
-                                stop=stop_after_attempt(ikwargs.get("max_retries", 3)),
-                                wait=wait_fixed(1),
-                            ),
-                            **ikwargs,
-                        )
+                        # the tool calls run as they are streamed in
+                        runs = {}
+
+                        def _run(tool_call: ToolCall):
+                            runs[id(tool_call)] = asyncio.create_task(
+                                tool_call.run(context=tool_call_ctx)
+                            )
+
+                        try:
+                            initial_response = await _chat_completion(
+                                provider,
+                                messages=messages,
+                                response_model=_tool_calls_model(tuple(_tools)),
+                                client=_client,
+                                ikwargs=ikwargs,
+                                tools=_tools,
+                                response_cache=response_cache,
+                                coalesce=coalesce,
+                                rate_limiter=rate_limiter,
+                                usage_registry=usage_registry,
+                                function=fn.__name__,
+                                span=tool_call_span,
+                                on_partial=_run if stream_tool_calls else None,
+                            )
+                        except BaseException:
+                            for task in runs.values():
+                                task.cancel()
+                            raise
 
                         tool_call_span.set_attributes(
                             {
@@ -221,7 +326,9 @@ def dino(
                         )
                         tasks = []
                         for resp in initial_response:
-                            tasks.append(resp.run(context=tool_call_ctx))
+                            # cached responses are not streamed
+                            task = runs.get(id(resp))
+                            tasks.append(task or resp.run(context=tool_call_ctx))
 
                         await asyncio.gather(*tasks)
 
@@ -237,15 +344,26 @@ def dino(
                         response = response_model()
                         response.tool_outputs = tool_outputs
                     else:
-                        response = await provider.chat_completion(
+
+                        def _on_partial(partial: Any):
+                            if hasattr(partial, "tool_outputs"):
+                                partial.tool_outputs = tool_outputs
+                            on_partial(partial)
+
+                        response = await _chat_completion(
+                            provider,
                             messages=messages,
                             response_model=response_model,
                             client=_client,
-                            max_retries=AsyncRetrying(
-                                stop=stop_after_attempt(ikwargs.get("max_retries", 3)),
-                                wait=wait_fixed(1),
-                            ),
-                            **ikwargs,
+                            ikwargs=ikwargs,
+                            tools=[],
+                            response_cache=response_cache,
+                            coalesce=coalesce,
+                            rate_limiter=rate_limiter,
+                            usage_registry=usage_registry,
+                            function=fn.__name__,
+                            span=response_span,
+                            on_partial=_on_partial if on_partial else None,
                         )
 
                         if hasattr(response, "tool_outputs"):
@@ -263,29 +381,20 @@ def dino(
                     ) as after_hook_span:
                         after_hook_span.set_attribute(
                             "dino.after_hook_type",
-                            (
-                                "coroutine"
-                                if inspect.iscoroutinefunction(after_hook)
-                                else "function"
-                            ),
+                            "coroutine" if after_hook_is_coroutine else "function",
                         )
-                        _validate_after_hook(after_hook)
 
                         hook_args, hook_kwargs = args_dump(
                             fn, after_hook, args, fn_kwargs
                         )
                         hook_kwargs.update(response=response)
 
-                        if inspect.iscoroutinefunction(after_hook):
+                        if after_hook_is_coroutine:
                             transformed_response = await after_hook(
                                 *hook_args, **hook_kwargs
                             )
-                        elif callable(after_hook):
-                            transformed_response = after_hook(*hook_args, **hook_kwargs)
                         else:
-                            raise ValueError(
-                                "after_hook must be a coroutine or a function"
-                            )
+                            transformed_response = after_hook(*hook_args, **hook_kwargs)
 
                         if transformed_response is not None:
                             after_hook_span.set_status(StatusCode.OK)
@@ -294,6 +403,259 @@ def dino(
                         after_hook_span.set_status(StatusCode.OK)
                         return response
 
-        return wrapper
+        if not stream:
+            return wrapper
+
+        @wraps(fn)
+        async def stream_wrapper(*args, **kwargs) -> AsyncGenerator[Any, None]:
+            partials = asyncio.Queue()
+            done = object()
+            task = asyncio.create_task(
+                wrapper(*args, on_partial=partials.put_nowait, **kwargs)
+            )
+            task.add_done_callback(lambda _: partials.put_nowait(done))
+            try:
+                while (partial := await partials.get()) is not done:
+                    yield partial
+                yield task.result()
+            finally:
+                task.cancel()
+
+        return stream_wrapper
 
     return wrapper
+
+
+def is_partial(response: Any) -> bool:
+    """
+    Whether the response is a partial one yielded by a streaming dino function.
+    Note that the partial responses are instances of the response model.
+    """
+    return isinstance(response, PartialBase)
+
+
+async def _chat_completion(
+    provider: Provider,
+    messages: List[Message],
+    response_model: Any,
+    client: AsyncInstructor | None,
+    ikwargs: dict,
+    tools: List[ToolCall],
+    response_cache: ResponseCache | None,
+    coalesce: bool,
+    rate_limiter: RateLimiter,
+    usage_registry: UsageRegistry | None,
+    function: str,
+    span: trace.Span,
+    on_partial: Callable[[Any], None] | None = None,
+):
+    """
+    Call the provider, serving the response from the cache when enabled,
+    and sharing the call with the concurrent identical ones when coalescing.
+    The partial responses, or the items of the Iterable response models,
+    are reported to on_partial when streaming.
+
+    The token usage, the time to the first token and the latency of the call
+    are set on the span, and recorded to the usage registry if any.
+    """
+    messages = assemble_prompt(messages)
+    key = None
+    if response_cache is not None or coalesce:
+        key = cache_key(ikwargs["model"], response_model, messages, tools, ikwargs)
+
+    if response_cache is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            try:
+                response = load_response(
+                    cached, response_model, context=ikwargs.get("context")
+                )
+                span.set_attribute("dino.cache", "hit")
+                return response
+            except Exception as e:
+                logger.warning("failed to load the cached response", error=str(e))
+        span.set_attribute("dino.cache", "miss")
+
+    async def call():
+        queued_at = time.monotonic()
+        first_token_at = None
+
+        def _on_partial(partial: Any):
+            nonlocal first_token_at
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            on_partial(partial)
+
+        # the prompt tokens read from and written to the prompt cache included
+        with track_usage(span, call=True) as usage:
+            async with rate_limiter.acquire(
+                provider.provider_name,
+                ikwargs["model"],
+                estimate_tokens(messages, ikwargs.get("max_tokens")),
+            ):
+                started_at = time.monotonic()
+                span.set_attribute("dino.rate_limit.wait", started_at - queued_at)
+                # the retrying keeps the state of its attempts, so one is made per call
+                max_retries = AsyncRetrying(
+                    **_retry_strategy(ikwargs.get("max_retries", 3))
+                )
+                if on_partial is not None and _streamable(response_model):
+                    span.set_attribute("dino.stream", True)
+                    response = await _stream_completion(
+                        provider,
+                        _on_partial,
+                        messages=messages,
+                        response_model=response_model,
+                        client=client,
+                        max_retries=max_retries,
+                        **ikwargs,
+                    )
+                else:
+                    response = await provider.chat_completion(
+                        messages=messages,
+                        response_model=response_model,
+                        client=client,
+                        max_retries=max_retries,
+                        **ikwargs,
+                    )
+                completed_at = time.monotonic()
+
+        latency = completed_at - started_at
+        ttft = first_token_at - started_at if first_token_at is not None else latency
+        span.set_attributes({"dino.usage.ttft": ttft, "dino.usage.latency": latency})
+        if usage_registry is not None:
+            usage_registry.record(
+                UsageRecord(
+                    timestamp=time.time(),
+                    function=function,
+                    provider=provider.provider_name,
+                    model=ikwargs["model"],
+                    context=current_usage_context(),
+                    ttft=ttft,
+                    latency=latency,
+                    **usage.model_dump(),
+                )
+            )
+
+        if response_cache is not None:
+            try:
+                response_cache.set(key, dump_response(response))
+            except Exception as e:
+                logger.warning("failed to cache the response", error=str(e))
+        return response
+
+    # the partial responses are only delivered to the caller streaming them
+    if not coalesce or on_partial is not None:
+        return await call()
+
+    response, shared = await single_flight.do(key, call)
+    span.set_attribute("dino.coalesced", shared)
+    return response
+
+
+@lru_cache(maxsize=32)
+def _retry_strategy(max_retries: int) -> dict:
+    return {"stop": stop_after_attempt(max_retries), "wait": wait_fixed(1)}
+
+
+@lru_cache(maxsize=256)
+def _tool_calls_model(tools: tuple[Type[ToolCall], ...]) -> Any:
+    """The response model of the tool calls phase."""
+    return Iterable[Union[tools]]
+
+
+def _is_iterable(response_model: Any) -> bool:
+    return get_origin(response_model) is collections.abc.Iterable
+
+
+def _streamable(response_model: Any) -> bool:
+    return _is_iterable(response_model) or _stream_model(response_model) is not None
+
+
+@lru_cache(maxsize=256)
+def _stream_model(response_model: Any) -> Type[BaseModel] | None:
+    """
+    The model to stream the response with, None if the response model cannot be streamed.
+    Unions of models are wrapped into a model, as partial unions are not supported.
+    """
+    if isinstance(response_model, type) and issubclass(response_model, BaseModel):
+        return response_model
+    if get_origin(response_model) in (Union, UnionType) and all(
+        isinstance(arg, type) and issubclass(arg, BaseModel)
+        for arg in get_args(response_model)
+    ):
+        return create_model("Response", response=(response_model, ...))
+    return None
+
+
+@lru_cache(maxsize=256)
+def _partial_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    return Partial[model]
+
+
+@lru_cache(maxsize=256)
+def _type_adapter(response_model: Any) -> TypeAdapter:
+    return TypeAdapter(response_model)
+
+
+def _unwrap_partial(partial: BaseModel, response_model: Any) -> BaseModel | None:
+    """
+    Turn a partial of the stream model into a partial of the response model.
+    The members of the unions stay dicts until they are complete, so they are
+    matched to the first member with all their fields.
+    """
+    if _stream_model(response_model) is response_model:
+        value, members = partial.model_dump(exclude={"tool_outputs"}), [response_model]
+    else:
+        value, members = partial.response, get_args(response_model)
+        if isinstance(value, BaseModel):
+            value = value.model_dump(exclude={"tool_outputs"})
+    if not value:
+        return None
+    for member in members:
+        if value.keys() <= member.model_fields.keys():
+            return _partial_model(member).model_construct(
+                **{name: value.get(name) for name in member.model_fields}
+            )
+    return None
+
+
+async def _stream_completion(
+    provider: Provider,
+    on_partial: Callable[[Any], None],
+    response_model: Any,
+    **kwargs: Any,
+):
+    """
+    Stream the response, reporting the partial responses as they change,
+    or the items of the Iterable response models as they are parsed,
+    and return the complete response.
+    """
+    if _is_iterable(response_model):
+        items = []
+        async for item in await provider.chat_completion(
+            response_model=response_model, stream=True, **kwargs
+        ):
+            items.append(item)
+            on_partial(item)
+        return items
+
+    stream_model = _stream_model(response_model)
+    last = previous = None
+    async for last in await provider.chat_completion(
+        response_model=stream_model, stream=True, **kwargs
+    ):
+        partial = _unwrap_partial(last, response_model)
+        if partial is not None and partial != previous:
+            on_partial(partial)
+            previous = partial
+
+    if last is None:
+        raise ValueError("no response streamed")
+
+    data = last.model_dump(exclude={"tool_outputs"})
+    if stream_model is not response_model:
+        data = data["response"]
+    return _type_adapter(response_model).validate_python(
+        data, context=kwargs.get("context")
+    )
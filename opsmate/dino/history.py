@@ -0,0 +1,170 @@
+from typing import Any, Dict, List
+from .types import Message, React
+from .limiter import estimate_tokens
+from .spill import default_spill_store
+import yaml
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class _Turn:
+    """The messages of a react iteration, the thought and action followed by the observation."""
+
+    def __init__(self, react: React):
+        self.react = react
+        self.observation: Dict[str, Any] | None = None
+        self.compacted = False
+        self._messages: List[Message] | None = None
+
+    def messages(self, max_tool_output_length: int) -> List[Message]:
+        # rendered once, so that the prompt prefix stays byte-stable
+        if self._messages is None:
+            self._messages = [Message.user(self.react.model_dump_json())]
+            if self.observation is not None:
+                observation = self.observation
+                if self.compacted:
+                    observation = _compact_observation(
+                        observation, max_tool_output_length
+                    )
+                self._messages.append(Message.user(yaml.dump(observation)))
+        return self._messages
+
+    def compact(self):
+        if not self.compacted:
+            self.compacted = True
+            self._messages = None
+
+
+def _spill(text: str) -> str:
+    store = default_spill_store()
+    key = store.put(text)
+    return f"see {store.file_path(key)} for the full output, spill id {key}"
+
+
+def _compact_observation(
+    observation: Dict[str, Any], max_tool_output_length: int
+) -> Dict[str, Any]:
+    """
+    Replace the tool outputs longer than max_tool_output_length by a reference
+    to the file they are spilled over to, the observation summarising them is kept.
+    """
+    tool_outputs = []
+    for tool_output in observation.get("tool_outputs", []):
+        text = tool_output if isinstance(tool_output, str) else yaml.dump(tool_output)
+        if len(text) <= max_tool_output_length:
+            tool_outputs.append(tool_output)
+            continue
+        try:
+            reference = _spill(text)
+        except OSError as e:
+            logger.warning("failed to spill the tool output", error=str(e))
+            reference = None
+        tool_outputs.append(
+            f"<elided>{len(text)} characters of tool output"
+            + (f", {reference}" if reference else "")
+            + "</elided>"
+        )
+    return {**observation, "tool_outputs": tool_outputs}
+
+
+class ReactHistory:
+    """
+    ReactHistory keeps the message history of a react session within a token budget.
+
+    The prefix, i.e. the chat history and the contexts, is always kept verbatim,
+    and so are the most recent iterations. Once over the budget, the older
+    iterations are compacted all at once: their thoughts, actions and observations
+    are kept but the large tool outputs are spilled over to the spill store and
+    referenced instead. If still over the budget, the oldest iterations are elided,
+    leaving a note of the actions they took.
+
+    The iterations are only compacted when over the budget, rather than as they
+    age, so that the prompt prefix stays stable for the prompt caching in between.
+
+    Parameters:
+        prefix (List[Message]):
+            The messages preceding the iterations, never compacted.
+        max_tokens (int, optional):
+            The token budget of the history, estimated at 4 characters per token.
+            The history grows unbounded if not set.
+        keep_recent (int):
+            The number of the most recent iterations kept verbatim.
+        max_tool_output_length (int):
+            The length of the tool outputs of the compacted iterations over which
+            they are spilled over.
+    """
+
+    def __init__(
+        self,
+        prefix: List[Message] = [],
+        max_tokens: int | None = 16000,
+        keep_recent: int = 3,
+        max_tool_output_length: int = 500,
+    ):
+        self.prefix = list(prefix)
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.max_tool_output_length = max_tool_output_length
+        self._turns: List[_Turn] = []
+        self._elided_actions: List[str] = []
+        self._elided_message: Message | None = None
+
+    def add_react(self, react: React):
+        self._turns.append(_Turn(react))
+        self._compact()
+
+    def add_observation(self, observation: Dict[str, Any]):
+        """
+        Add the observation of the latest iteration, as a dict with the
+        tool outputs rendered for the prompt.
+        """
+        if not self._turns or self._turns[-1].observation is not None:
+            raise ValueError("an observation must follow a react")
+        turn = self._turns[-1]
+        turn.observation = observation
+        turn._messages = None
+        self._compact()
+
+    def messages(self) -> List[Message]:
+        messages = list(self.prefix)
+        if self._elided_message is not None:
+            messages.append(self._elided_message)
+        for turn in self._turns:
+            messages.extend(turn.messages(self.max_tool_output_length))
+        return messages
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.messages())
+
+    def _compact(self):
+        if self.max_tokens is None or self.tokens() <= self.max_tokens:
+            return
+
+        old = self._turns[: max(0, len(self._turns) - self.keep_recent)]
+        for turn in old:
+            turn.compact()
+
+        elided = 0
+        while elided < len(old) and self.tokens() > self.max_tokens:
+            turn = self._turns.pop(0)
+            self._elided_actions.append(turn.react.action)
+            self._update_elided_message()
+            elided += 1
+
+        if elided:
+            logger.debug(
+                "elided the react iterations over the budget",
+                elided=len(self._elided_actions),
+            )
+
+    def _update_elided_message(self):
+        actions = "\n".join(
+            f"- {action[:200]}" for action in self._elided_actions[-20:]
+        )
+        self._elided_message = Message.user(
+            f"""<elided-history>
+{len(self._elided_actions)} earlier iterations are elided to fit the context window, the latest actions they took were:
+{actions}
+</elided-history>"""
+        )
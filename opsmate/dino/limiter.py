@@ -0,0 +1,350 @@
+from typing import Any, AsyncIterator, Dict, List, Mapping, Tuple
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from enum import IntEnum
+from functools import cache
+from itertools import count
+from pydantic import BaseModel, Field
+from .types import Message
+import asyncio
+import heapq
+import json
+import os
+import re
+import time
+import weakref
+import httpx
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class Priority(IntEnum):
+    """
+    The priority of the LLM calls waiting for the rate limiter, the lower the sooner.
+    """
+
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BATCH = 2
+
+
+_priority: ContextVar[Priority] = ContextVar("dino_priority", default=Priority.DEFAULT)
+# the limiter of the LLM call in flight, for the response hook to report the headers to
+_current: ContextVar["_ModelLimiter | None"] = ContextVar(
+    "dino_rate_limiter", default=None
+)
+
+
+@contextmanager
+def use_priority(level: Priority):
+    """
+    Set the priority of the LLM calls made within the context, including the
+    ones made by the nested dino functions, e.g. from the tools.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RateLimit(BaseModel):
+    rpm: float | None = Field(None, description="The requests per minute")
+    tpm: float | None = Field(None, description="The tokens per minute")
+    max_concurrency: int | None = Field(
+        None, description="The maximum number of calls in flight"
+    )
+
+
+class TokenBucket:
+    """
+    TokenBucket refills `rate` tokens per minute up to `rate`.
+    A bucket without a rate never runs out, unless blocked by the server.
+    """
+
+    def __init__(self, rate: float | None):
+        self.rate = rate
+        self.level = rate
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        if self.rate is not None:
+            elapsed = now - self.updated
+            self.level = min(self.rate, self.level + elapsed * self.rate / 60)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """The number of seconds until amount can be consumed."""
+        delay = max(0.0, self.blocked_until - now)
+        if self.rate is None:
+            return delay
+        self._refill(now)
+        # a single call larger than the bucket waits for a full bucket
+        amount = min(amount, self.rate)
+        if self.level >= amount:
+            return delay
+        return max(delay, (amount - self.level) * 60 / self.rate)
+
+    def consume(self, amount: float, now: float):
+        if self.rate is not None:
+            self._refill(now)
+            self.level -= min(amount, self.rate)
+
+    def update(
+        self,
+        limit: float | None,
+        remaining: float | None,
+        reset: float | None,
+        now: float,
+    ):
+        """Adapt the bucket to the limit, remaining and reset reported by the server."""
+        if limit is not None and self.rate is None:
+            self.rate = self.level = limit
+        if remaining is not None and self.rate is not None:
+            self._refill(now)
+            self.level = min(self.level, remaining)
+        if remaining == 0 and reset is not None:
+            self.blocked_until = max(self.blocked_until, now + reset)
+
+    def block(self, seconds: float, now: float):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class _ModelLimiter:
+    def __init__(self, limit: RateLimit):
+        self.requests = TokenBucket(limit.rpm)
+        self.tokens = TokenBucket(limit.tpm)
+        self.max_concurrency = limit.max_concurrency
+        self.running = 0
+        self._queue: List[Tuple[int, int]] = []
+        self._seq = count()
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _wait(self, timeout: float | None):
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def acquire(self, tokens: float, priority: Priority):
+        entry = (int(priority), next(self._seq))
+        heapq.heappush(self._queue, entry)
+        try:
+            while True:
+                timeout = None
+                if self._queue[0] == entry and (
+                    self.max_concurrency is None or self.running < self.max_concurrency
+                ):
+                    now = time.monotonic()
+                    timeout = max(
+                        self.requests.delay(1, now), self.tokens.delay(tokens, now)
+                    )
+                    if timeout <= 0:
+                        heapq.heappop(self._queue)
+                        self.requests.consume(1, now)
+                        self.tokens.consume(tokens, now)
+                        self.running += 1
+                        # let the next in the queue have a go
+                        self._notify()
+                        return
+                await self._wait(timeout)
+        except BaseException:
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._notify()
+            raise
+
+    def release(self):
+        self.running -= 1
+        self._notify()
+
+    def update(self, headers: Mapping[str, str], status_code: int):
+        now = time.monotonic()
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            limit, remaining, reset = _rate_limit_headers(headers, kind)
+            bucket.update(limit, remaining, reset, now)
+
+        if status_code == 429:
+            retry_after = _parse_seconds(headers.get("retry-after")) or 1.0
+            logger.warning("rate limited by the provider", retry_after=retry_after)
+            self.requests.block(retry_after, now)
+        self._notify()
+
+
+def _parse_seconds(value: str | None) -> float | None:
+    """
+    Parse the durations of the rate limit headers, in seconds (`1.5`),
+    Go duration (`6m0s`, `20ms`) or RFC 3339 timestamp formats.
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+        return sum(float(n) * units[u] for n, u in parts)
+
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return max(0.0, reset_at.timestamp() - time.time())
+
+
+def _parse_number(value: str | None) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _rate_limit_headers(
+    headers: Mapping[str, str], kind: str
+) -> Tuple[float | None, float | None, float | None]:
+    """
+    The (limit, remaining, reset) of the requests or tokens from the
+    OpenAI `x-ratelimit-*` or the Anthropic `anthropic-ratelimit-*` headers.
+    """
+    for limit, remaining, reset in (
+        (
+            f"x-ratelimit-limit-{kind}",
+            f"x-ratelimit-remaining-{kind}",
+            f"x-ratelimit-reset-{kind}",
+        ),
+        (
+            f"anthropic-ratelimit-{kind}-limit",
+            f"anthropic-ratelimit-{kind}-remaining",
+            f"anthropic-ratelimit-{kind}-reset",
+        ),
+    ):
+        if remaining in headers:
+            return (
+                _parse_number(headers.get(limit)),
+                _parse_number(headers.get(remaining)),
+                _parse_seconds(headers.get(reset)),
+            )
+    return None, None, None
+
+
+def estimate_tokens(messages: List[Message], max_tokens: int | None = None) -> int:
+    """
+    A rough estimate of the tokens of a call at 4 characters per token,
+    the server reported remaining tokens correct the bucket afterwards.
+    """
+    chars = 0
+    for message in messages:
+        if isinstance(message.content, str):
+            chars += len(message.content)
+        else:
+            chars += sum(len(getattr(item, "text", "")) for item in message.content)
+    return chars // 4 + (max_tokens or 0)
+
+
+class RateLimiter:
+    """
+    RateLimiter bounds the LLM calls of each provider and model with a request
+    and a token bucket, and an optional concurrency limit.
+
+    Calls are served by priority, so that the interactive calls overtake the queued
+    batch ones. The buckets adapt to the rate limit headers returned by the providers,
+    learning the limits that are not configured and pausing until the reset
+    when the remaining requests or tokens run out, or when rate limited.
+
+    Parameters:
+        limits (Dict[str, RateLimit]):
+            The limits by `provider/model`, `model` or `provider`, in that order of precedence.
+        default (RateLimit):
+            The limit of the models not configured. The configured limits leaving
+            max_concurrency unset take the one of the default.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, RateLimit | Dict[str, Any]] = {},
+        default: RateLimit = RateLimit(),
+    ):
+        self.default = default
+        self.limits = {}
+        for key, limit in limits.items():
+            limit = RateLimit.model_validate(limit)
+            # an explicit null lifts the concurrency limit
+            if "max_concurrency" not in limit.model_fields_set:
+                limit = limit.model_copy(
+                    update={"max_concurrency": default.max_concurrency}
+                )
+            self.limits[key] = limit
+        # asyncio primitives are bound to their event loop, the limiters of
+        # a loop go away with it
+        self._limiters: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, Dict[Tuple[str, str], _ModelLimiter]
+        ] = weakref.WeakKeyDictionary()
+
+    def limit(self, provider: str, model: str) -> RateLimit:
+        for key in (f"{provider}/{model}", model, provider):
+            if key in self.limits:
+                return self.limits[key]
+        return self.default
+
+    def _limiter(self, provider: str, model: str) -> _ModelLimiter:
+        limiters = self._limiters.setdefault(asyncio.get_running_loop(), {})
+        limiter = limiters.get((provider, model))
+        if limiter is None:
+            limiter = limiters[(provider, model)] = _ModelLimiter(
+                self.limit(provider, model)
+            )
+        return limiter
+
+    @asynccontextmanager
+    async def acquire(
+        self, provider: str, model: str, tokens: float = 0
+    ) -> AsyncIterator[None]:
+        """
+        Wait for the turn of the call at the priority of the current context.
+        """
+        limiter = self._limiter(provider, model)
+        await limiter.acquire(tokens, _priority.get())
+        token = _current.set(limiter)
+        try:
+            yield
+        finally:
+            _current.reset(token)
+            limiter.release()
+
+
+async def record_rate_limits(response: httpx.Response):
+    """
+    httpx response hook reporting the rate limit headers to the limiter of the call.
+    """
+    limiter = _current.get()
+    if limiter is not None:
+        limiter.update(response.headers, response.status_code)
+
+
+@cache
+def default_rate_limiter() -> RateLimiter:
+    """
+    The rate limiter used by dino.
+
+    The limits are configured by OPSMATE_DINO_RATE_LIMITS as JSON, e.g.
+    `{"openai/gpt-4o": {"rpm": 500, "tpm": 30000}, "anthropic": {"max_concurrency": 4}}`,
+    and the concurrency of the models by OPSMATE_DINO_MAX_CONCURRENCY, 32 by default,
+    unless configured otherwise.
+    """
+    limits = json.loads(os.getenv("OPSMATE_DINO_RATE_LIMITS", "{}"))
+    max_concurrency = int(os.getenv("OPSMATE_DINO_MAX_CONCURRENCY", "32"))
+    return RateLimiter(
+        limits=limits,
+        default=RateLimit(max_concurrency=max_concurrency or None),
+    )
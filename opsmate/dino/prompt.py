@@ -0,0 +1,44 @@
+from typing import List
+from .types import Message
+
+# the most cache breakpoints a request can have, as limited by Anthropic
+MAX_CACHE_BREAKPOINTS = 4
+
+
+def assemble_prompt(messages: List[Message]) -> List[Message]:
+    """
+    Assemble the messages of a LLM call for prompt caching, which only pays off
+    when the calls share a byte-identical prefix.
+
+    The system messages, i.e. the instructions, the tool docs and the contexts,
+    are the static part of the prompt and are ordered first, followed by the
+    conversation in its order.
+
+    Cache breakpoints are placed at the end of the system messages and at the end
+    of the conversation, so that the next call extending the conversation, e.g. the
+    next react iteration, reads the prefix from the cache. The breakpoints marked by
+    the caller are kept too, the latest ones first when over the limit.
+    """
+    system = [m for m in messages if m.role == "system"]
+    conversation = [m for m in messages if m.role != "system"]
+    assembled = system + conversation
+
+    breakpoints = [idx for idx, m in enumerate(assembled) if m.cache_breakpoint]
+    if conversation:
+        breakpoints.append(len(assembled) - 1)
+    breakpoints = sorted(set(breakpoints) - {len(system) - 1}, reverse=True)
+    if system:
+        # the system messages are shared the most widely, they always get one
+        breakpoints = [len(system) - 1] + breakpoints[: MAX_CACHE_BREAKPOINTS - 1]
+    else:
+        breakpoints = breakpoints[:MAX_CACHE_BREAKPOINTS]
+
+    breakpoints = set(breakpoints)
+    return [
+        (
+            m
+            if m.cache_breakpoint == (idx in breakpoints)
+            else m.model_copy(update={"cache_breakpoint": idx in breakpoints})
+        )
+        for idx, m in enumerate(assembled)
+    ]
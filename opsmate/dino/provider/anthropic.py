@@ -1,6 +1,6 @@
 from .base import Provider, register_provider, T
 from instructor import AsyncInstructor
-from anthropic import AsyncAnthropic
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
 from typing import Any, Awaitable, List, Dict
 from tenacity import AsyncRetrying
 from opsmate.dino.types import Message, TextContent, ImageURLContent, Content
@@ -30,27 +30,33 @@ class AnthropicProvider(Provider):
         context: dict[str, Any] | None = None,  # {{ edit_1 }}
         strict: bool = True,
         client: AsyncInstructor | None = None,
+        stream: bool = False,
         **kwargs: Any,
     ) -> Awaitable[T]:
         thinking = kwargs.get("thinking", None)
         model = kwargs.get("model")
         client = client or cls.default_client(model, thinking)
         kwargs.pop("client", None)
-        messages = [
-            {"role": m.role, "content": cls.normalise_content(m.content)}
-            for m in messages
-        ]
-
         # filter out all the system messages
         sys_messages = [
-            {"type": "text", "text": m["content"]}
+            cls._cache_block({"type": "text", "text": m.content}, m.cache_breakpoint)
             for m in messages
-            if m["role"] == "system"
+            if m.role == "system"
+        ]
+        messages = [
+            {
+                "role": m.role,
+                "content": cls._cache_content(
+                    cls.normalise_content(m.content), m.cache_breakpoint
+                ),
+            }
+            for m in messages
+            if m.role != "system"
         ]
-        messages = [m for m in messages if m["role"] != "system"]
 
         if len(sys_messages) > 0:
-            sys_messages[-1]["cache_control"] = {"type": "ephemeral"}
+            if not any("cache_control" in m for m in sys_messages):
+                sys_messages[-1]["cache_control"] = {"type": "ephemeral"}
             kwargs["system"] = sys_messages
 
         if kwargs.get("max_tokens") is None:
@@ -60,6 +66,17 @@ class AnthropicProvider(Provider):
         if thinking:
             filtered_kwargs["thinking"] = thinking
 
+        if stream:
+            create, response_model = cls._stream_create(client, response_model)
+            return create(
+                response_model=response_model,
+                messages=messages,
+                max_retries=max_retries,
+                context=context,
+                strict=strict,
+                **filtered_kwargs,
+            )
+
         return await client.chat.completions.create(
             response_model=response_model,
             messages=messages,
@@ -70,15 +87,41 @@ class AnthropicProvider(Provider):
             **filtered_kwargs,
         )
 
+    @staticmethod
+    def _cache_block(block: Dict[str, Any], cache_breakpoint: bool) -> Dict[str, Any]:
+        if cache_breakpoint:
+            block["cache_control"] = {"type": "ephemeral"}
+        return block
+
+    @classmethod
+    def _cache_content(
+        cls, content: str | List[Dict[str, Any]], cache_breakpoint: bool
+    ):
+        """Mark the last block of the content as a cache breakpoint."""
+        if not cache_breakpoint:
+            return content
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if not content:
+            return content
+        return [*content[:-1], cls._cache_block(dict(content[-1]), True)]
+
     @classmethod
     @cache
     def _default_client(cls) -> AsyncInstructor:
-        return instructor.from_anthropic(AsyncAnthropic())
+        return instructor.from_anthropic(
+            AsyncAnthropic(
+                http_client=DefaultAsyncHttpxClient(event_hooks=cls._event_hooks())
+            )
+        )
 
     @classmethod
     def _default_reasoning_client(cls) -> AsyncInstructor:
         return instructor.from_anthropic(
-            AsyncAnthropic(), mode=instructor.Mode.ANTHROPIC_REASONING_TOOLS
+            AsyncAnthropic(
+                http_client=DefaultAsyncHttpxClient(event_hooks=cls._event_hooks())
+            ),
+            mode=instructor.Mode.ANTHROPIC_REASONING_TOOLS,
         )
 
     @classmethod
@@ -89,13 +132,17 @@ class AnthropicProvider(Provider):
     def default_client(
         cls, model: str, thinking: Dict[str, Any] | None = None
     ) -> AsyncInstructor:
-        if cls.is_reasoning_model(model) and thinking:
+        return cls._client(bool(cls.is_reasoning_model(model) and thinking))
+
+    @classmethod
+    @cache
+    def _client(cls, reasoning: bool) -> AsyncInstructor:
+        if reasoning:
             client = cls._default_reasoning_client()
         else:
             client = cls._default_client()
 
-        client.on("parse:error", cls._handle_parse_error)
-        return client
+        return cls._register_hooks(client)
 
     @staticmethod
     def normalise_content(content: Content):
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Any, Awaitable, TypeVar, List, Type
+from typing import Any, Awaitable, Callable, TypeVar, List, Type, get_args, get_origin
+from collections.abc import Iterable
 from instructor import AsyncInstructor
 from pydantic import ValidationError
 from tenacity import AsyncRetrying
@@ -10,6 +11,8 @@ import pkg_resources
 import json
 from pathlib import Path
 from opsmate.dino.types import Message
+from opsmate.dino.limiter import record_rate_limits
+from opsmate.dino.usage import record_usage
 
 import structlog
 
@@ -63,8 +66,23 @@ class Provider(ABC):
         context: dict[str, Any] | None = None,  # {{ edit_1 }}
         strict: bool = True,
         client: AsyncInstructor | None = None,
+        stream: bool = False,
         **kwargs: Any,
-    ) -> Awaitable[T]: ...
+    ) -> Awaitable[T]:
+        """
+        Create the response with the LLM. When stream is True, an async generator
+        of the partial responses is returned instead, or of the items as they are
+        parsed for the Iterable response models.
+        """
+
+    @staticmethod
+    def _stream_create(
+        client: AsyncInstructor, response_model: Any
+    ) -> tuple[Callable, Any]:
+        """The create function and response model to stream the response model with."""
+        if get_origin(response_model) is Iterable:
+            return client.chat.completions.create_iterable, get_args(response_model)[0]
+        return client.chat.completions.create_partial, response_model
 
     @classmethod
     @abstractmethod
@@ -72,6 +90,8 @@ class Provider(ABC):
 
     providers: dict[str, Type["Provider"]] = {}
     models_config: dict[str, dict[str, Any]] = {}
+    # the resolved provider by model, as listing the models may hit the network
+    _model_providers: dict[str, Type["Provider"]] = {}
 
     @classmethod
     def all_models_config(cls) -> dict[str, dict[str, Any]]:
@@ -82,8 +102,12 @@ class Provider(ABC):
 
     @classmethod
     def from_model(cls, model: str) -> "Provider":
+        provider = Provider._model_providers.get(model)
+        if provider is not None:
+            return provider
         for provider in cls.providers.values():
             if model in provider.models:
+                Provider._model_providers[model] = provider
                 return provider
         raise ValueError(f"No provider found for model: {model}")
 
@@ -94,8 +118,18 @@ class Provider(ABC):
     @classmethod
     @cache
     def default_client(cls, model: str) -> AsyncInstructor:
-        client = cls._default_client()
+        return cls._register_hooks(cls._default_client())
+
+    @staticmethod
+    def _event_hooks() -> dict[str, list]:
+        """The httpx event hooks of the default clients."""
+        return {"response": [record_rate_limits]}
+
+    @classmethod
+    def _register_hooks(cls, client: AsyncInstructor) -> AsyncInstructor:
+        """Register the instructor hooks of the default clients, once per client."""
         client.on("parse:error", cls._handle_parse_error)
+        client.on("completion:response", record_usage)
         return client
 
     @classmethod
@@ -112,6 +146,8 @@ class Provider(ABC):
 def register_provider(name: str):
     def wrapper(cls: Type[Provider]):
         Provider.providers[name] = cls
+        Provider._model_providers.clear()
+        cls.provider_name = name
         cls.MODELS_CACHE_FILE = Provider.CACHE_DIR / f"{name}_models.json"
         return cls
 
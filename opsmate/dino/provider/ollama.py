@@ -58,5 +58,4 @@ class OllamaProvider(OpenAIProvider):
             ),
             mode=instructor.Mode.JSON,
         )
-        client.on("parse:error", cls._handle_parse_error)
-        return client
+        return cls._register_hooks(client)
@@ -1,7 +1,7 @@
 from .base import Provider, register_provider, T
 from typing import Any, Awaitable, List
 from instructor import AsyncInstructor
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from functools import cache
 from tenacity import AsyncRetrying
 from opsmate.dino.types import Message, TextContent, ImageURLContent, Content
@@ -54,6 +54,7 @@ class OpenAIProvider(Provider):
         context: dict[str, Any] | None = None,  # {{ edit_1 }}
         strict: bool = True,
         client: AsyncInstructor | None = None,
+        stream: bool = False,
         **kwargs: Any,
     ) -> Awaitable[T]:
         model = kwargs.get("model")
@@ -75,6 +76,17 @@ class OpenAIProvider(Provider):
             reasoning_effort = kwargs.get("reasoning_effort", "medium")
             filtered_kwargs["reasoning_effort"] = reasoning_effort
 
+        if stream:
+            create, response_model = cls._stream_create(client, response_model)
+            return create(
+                response_model=response_model,
+                messages=messages,
+                max_retries=max_retries,
+                context=context,
+                strict=strict,
+                **filtered_kwargs,
+            )
+
         return await client.chat.completions.create(
             response_model=response_model,
             messages=messages,
@@ -87,11 +99,20 @@ class OpenAIProvider(Provider):
 
     @classmethod
     def _default_client(cls) -> AsyncInstructor:
-        return instructor.from_openai(AsyncOpenAI())
+        return instructor.from_openai(
+            AsyncOpenAI(
+                http_client=DefaultAsyncHttpxClient(event_hooks=cls._event_hooks())
+            )
+        )
 
     @classmethod
     def _default_reasoning_client(cls) -> AsyncInstructor:
-        return instructor.from_openai(AsyncOpenAI(), mode=instructor.Mode.JSON_O1)
+        return instructor.from_openai(
+            AsyncOpenAI(
+                http_client=DefaultAsyncHttpxClient(event_hooks=cls._event_hooks())
+            ),
+            mode=instructor.Mode.JSON_O1,
+        )
 
     @classmethod
     @cache
@@ -101,8 +122,7 @@ class OpenAIProvider(Provider):
         else:
             client = cls._default_client()
 
-        client.on("parse:error", cls._handle_parse_error)
-        return client
+        return cls._register_hooks(client)
 
     @classmethod
     def is_reasoning_model(cls, model: str) -> bool:
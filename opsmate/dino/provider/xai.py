@@ -1,7 +1,7 @@
 from .base import register_provider
 from .openai import OpenAIProvider
 from instructor import AsyncInstructor
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from functools import cache
 import os
 import instructor
@@ -40,6 +40,7 @@ class XAIProvider(OpenAIProvider):
             AsyncOpenAI(
                 base_url=os.getenv("XAI_BASE_URL", cls.DEFAULT_BASE_URL),
                 api_key=os.getenv("XAI_API_KEY"),
+                http_client=DefaultAsyncHttpxClient(event_hooks=cls._event_hooks()),
             ),
         )
 
@@ -49,6 +50,7 @@ class XAIProvider(OpenAIProvider):
             AsyncOpenAI(
                 base_url=os.getenv("XAI_BASE_URL", cls.DEFAULT_BASE_URL),
                 api_key=os.getenv("XAI_API_KEY"),
+                http_client=DefaultAsyncHttpxClient(event_hooks=cls._event_hooks()),
             ),
             mode=instructor.Mode.JSON_O1,
         )
@@ -9,16 +9,27 @@ from typing import (
     Awaitable,
     Dict,
 )
-from pydantic import BaseModel
-from .dino import dino
-from .types import Message, React, ReactAnswer, Observation, ToolCall, Context
+from pydantic import BaseModel, Field, create_model
+from .dino import dino, is_partial
+from .limiter import Priority
+from .history import ReactHistory
+from .cache import ToolCache
+from .types import (
+    Message,
+    React,
+    ParallelReact,
+    ReactAnswer,
+    Observation,
+    ToolCall,
+    Context,
+)
 from opsmate.libs.core.trace import traceit
 from opentelemetry import trace
 from opsmate.runtime.runtime import Runtime
-from functools import wraps
+from functools import cache, wraps
+import asyncio
 import inspect
 import structlog
-import yaml
 
 logger = structlog.get_logger(__name__)
 tracer = trace.get_tracer("opsmate.dino")
@@ -102,6 +113,8 @@ async def _react_prompt(
     </important 3>
     """
 
+    # sorted to keep the prompt prefix byte-stable for the prompt caching
+    tool_names = sorted(tool_names, key=lambda t: t.__name__)
     return [
         Message.system(
             f"""
@@ -114,6 +127,22 @@ Here is a list of tools you can use:
     ]
 
 
+@cache
+def _react_with_tool_calls_model(tools: tuple[type[ToolCall], ...]) -> type[React]:
+    """The thought and action coming with the tool calls carrying out the action."""
+    return create_model(
+        "ReactWithToolCalls",
+        __base__=React,
+        tool_calls=(
+            List[Union[tools]],
+            Field(
+                description="The tool calls carrying out the action, their outputs are observed in the next iteration",
+                default=[],
+            ),
+        ),
+    )
+
+
 @traceit(
     exclude=[
         "contexts",
@@ -136,9 +165,42 @@ async def run_react(
     ] = _react_prompt,
     tool_calls_per_action: int = 3,
     tool_call_context: Dict[str, Any] = {},
+    stream: bool = False,
+    max_history_tokens: int | None = None,
+    history_keep_recent: int = 3,
+    parallel_actions: bool = False,
+    single_call: bool = False,
     span: trace.Span = None,
     **kwargs: Any,
 ):
+    """
+    Run the loop of thought, action and observation until an answer is reached.
+
+    When stream is True, the partial thoughts, observations and answer are yielded
+    as they arrive, see `is_partial`, ahead of the complete ones.
+
+    When max_history_tokens is set, the history of the iterations is kept within
+    it, compacting the iterations older than the history_keep_recent most recent
+    ones when over the budget, see `ReactHistory`. The history is kept in full
+    otherwise.
+
+    When parallel_actions is True, a thought can come with several independent
+    actions, see `ParallelReact`. Up to tool_calls_per_action of them are carried
+    out concurrently and their observations merged into the one of the iteration.
+    The partial observations are not streamed for the concurrent actions.
+
+    When single_call is True, the thought comes with the tool calls carrying out
+    the action in one LLM call. Up to tool_calls_per_action of them are run and
+    their outputs observed straight away, without the LLM calls of `run_action`.
+    It takes precedence over parallel_actions.
+
+    The outputs of the cacheable tools are cached for the run, unless a
+    `ToolCache` is given as tool_cache in tool_call_context, e.g. for the session.
+
+    The tool calls are cancelled once the asyncio.Event given as cancellation in
+    tool_call_context is set, and so are the iterations left.
+    """
+    tool_call_context = {"tool_cache": ToolCache(), **tool_call_context}
     ctxs = []
     for ctx in contexts:
         if isinstance(ctx, str):
@@ -151,8 +213,18 @@ async def run_react(
             raise ValueError(f"Invalid context type: {type(ctx)}")
 
     tool_call_model = kwargs.get("tool_call_model", model)
-
-    @dino(tool_call_model, response_model=Observation, tools=tools, **kwargs)
+    # the user is waiting, overtake the batch calls queued for the rate limiter
+    kwargs.setdefault("priority", Priority.INTERACTIVE)
+    # start running the tools while the rest of the tool calls are generated
+    kwargs.setdefault("stream_tool_calls", True)
+
+    @dino(
+        tool_call_model,
+        response_model=Observation,
+        tools=tools,
+        stream=stream,
+        **kwargs,
+    )
     async def run_action(react: React, context: Dict[str, Any] = {}):
         f"""
         You are a world class expert to carry out actions using the tools you are given.
@@ -160,7 +232,7 @@ async def run_react(
         """
         return [
             # *ctxs,
-            *message_history,
+            *history.messages(),
             Message.assistant(
                 f"""
 <question-from-user>
@@ -184,18 +256,87 @@ thought: {react.thoughts}
             ),
         ]
 
-    react = dino(model, response_model=Union[React, ReactAnswer], **kwargs)(
-        react_prompt
+    if single_call and tools:
+        react_model = _react_with_tool_calls_model(tuple(tools))
+    elif parallel_actions and not single_call:
+        react_model = ParallelReact
+    else:
+        react_model = React
+
+    react = dino(
+        model,
+        response_model=Union[react_model, ReactAnswer],
+        stream=stream,
+        **kwargs,
+    )(react_prompt)
+
+    async def complete(responses):
+        """Yield the partial responses of a streaming call, then the complete one."""
+        if not stream:
+            yield await responses
+            return
+        async for response in responses:
+            yield response
+
+    async def run_actions(react_result: React, actions: List[str]):
+        """Carry out the actions concurrently, merging their observations into one."""
+
+        async def _run(action: str):
+            async for observation in complete(
+                run_action(
+                    React(thoughts=react_result.thoughts, action=action),
+                    context=tool_call_context,
+                )
+            ):
+                pass
+            return observation
+
+        observations = await asyncio.gather(*(_run(action) for action in actions))
+        observation = Observation(
+            observation="\n\n".join(
+                f"<action>\n{action}\n</action>\n{o.observation}"
+                for action, o in zip(actions, observations)
+            )
+        )
+        observation.tool_outputs = [t for o in observations for t in o.tool_outputs]
+        return observation
+
+    async def run_tool_calls(react_result: React):
+        """Run the tool calls coming with the thought, observing their outputs."""
+        tool_calls = getattr(react_result, "tool_calls", [])
+        if len(tool_calls) > tool_calls_per_action:
+            logger.warning(
+                "dropping the tool calls over the limit",
+                tool_calls=len(tool_calls),
+                limit=tool_calls_per_action,
+            )
+            tool_calls = tool_calls[:tool_calls_per_action]
+        context = {**tool_call_context, "dino_model": tool_call_model}
+        await asyncio.gather(*(t.run(context=context) for t in tool_calls))
+        for tool_call in tool_calls:
+            logger.debug("Tool output", tool=tool_call.model_dump_json())
+
+        observation = Observation()
+        observation.tool_outputs = tool_calls
+        return observation
+
+    history = ReactHistory(
+        prefix=[*Message.normalise(chat_history), *ctxs],
+        max_tokens=max_history_tokens,
+        keep_recent=history_keep_recent,
     )
-
-    message_history = Message.normalise(chat_history)
-    for ctx in ctxs:
-        message_history.append(ctx)
+    cancellation = tool_call_context.get("cancellation")
     for i in range(max_iter):
+        if cancellation is not None and cancellation.is_set():
+            logger.info("react cancelled", iteration=i)
+            break
         with tracer.start_as_current_span(f"dino.react.iter.{i}") as iter_span:
-            react_result = await react(
-                question, message_history=message_history, tool_names=tools
-            )
+            async for react_result in complete(
+                react(question, message_history=history.messages(), tool_names=tools)
+            ):
+                if is_partial(react_result):
+                    yield react_result
+
             if isinstance(react_result, React):
                 iter_span.add_event(
                     "dino.react.thinking",
@@ -212,18 +353,39 @@ thought: {react.thoughts}
                         "dino.react.action": react_result.action,
                     }
                 )
-                message_history.append(Message.user(react_result.model_dump_json()))
+                if single_call:
+                    # the tool calls are observed along with their outputs
+                    history.add_react(
+                        React(
+                            thoughts=react_result.thoughts, action=react_result.action
+                        )
+                    )
+                else:
+                    history.add_react(react_result)
                 yield react_result
+
+                actions = [react_result.action]
+                if isinstance(react_result, ParallelReact):
+                    actions.extend(react_result.actions)
+                actions = actions[: max(1, tool_calls_per_action)]
                 with tracer.start_as_current_span(
                     "dino.react.action",
                     attributes={
                         "dino.react.type": "action",
                         "dino.react.action": react_result.action,
+                        "dino.react.actions": actions,
                     },
                 ) as action_span:
-                    observation = await run_action(
-                        react_result, context=tool_call_context
-                    )
+                    if single_call:
+                        observation = await run_tool_calls(react_result)
+                    elif len(actions) > 1:
+                        observation = await run_actions(react_result, actions)
+                    else:
+                        async for observation in complete(
+                            run_action(react_result, context=tool_call_context)
+                        ):
+                            if is_partial(observation):
+                                yield observation
                     action_span.set_attribute(
                         "dino.react.observation",
                         observation.observation,
@@ -251,7 +413,7 @@ thought: {react.thoughts}
                             ],
                         },
                     )
-                    message_history.append(Message.user(yaml.dump(observation_out)))
+                    history.add_observation(observation_out)
                     yield observation
             elif isinstance(react_result, ReactAnswer):
                 iter_span.set_attributes(
@@ -356,7 +518,7 @@ def react(
                         prompt,
                         model=model,
                         contexts=ctxs,
-                        tools=list(_tools),
+                        tools=sorted(_tools, key=lambda t: t.__name__),
                         max_iter=max_iter,
                         tool_calls_per_action=tool_calls_per_action,
                         chat_history=chat_history,
@@ -370,7 +532,7 @@ def react(
                     prompt,
                     model=model,
                     contexts=ctxs,
-                    tools=list(_tools),
+                    tools=sorted(_tools, key=lambda t: t.__name__),
                     max_iter=max_iter,
                     tool_calls_per_action=tool_calls_per_action,
                     chat_history=chat_history,
@@ -382,7 +544,7 @@ def react(
                             await callback(result)
                         else:
                             callback(result)
-                    if isinstance(result, ReactAnswer):
+                    if isinstance(result, ReactAnswer) and not is_partial(result):
                         return result
 
         return wrapper
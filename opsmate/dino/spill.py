@@ -0,0 +1,159 @@
+from typing import Literal
+from functools import cache
+from hashlib import sha256
+from itertools import islice
+import os
+import re
+import tempfile
+import threading
+import time
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{16,64}$")
+
+
+class SpillStore:
+    """
+    SpillStore keeps the text too large for the context window, e.g. the tool
+    outputs, on disk for ranges of it to be read back later.
+
+    The texts are content-addressed, spilling the same text over twice writes it
+    once. The spilled texts older than the ttl are removed, and so are the least
+    recently spilled ones once the store is over max_bytes.
+
+    The size of the store is tracked in memory as the texts are spilled over, the
+    directory is only scanned once it is over max_bytes, or every cleanup_interval
+    seconds for the expired texts and the ones spilled over by other processes.
+
+    Parameters:
+        path (str, optional):
+            The directory of the store, opsmate-spill in the temp directory if not set.
+        max_bytes (int):
+            The maximum size of the store.
+        ttl (float, optional):
+            The number of seconds a spilled text is kept, forever if not set.
+        cleanup_interval (float):
+            The minimum number of seconds between the scans of the directory
+            while the store is within max_bytes.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: float | None = 24 * 60 * 60,
+        cleanup_interval: float = 60,
+    ):
+        self.path = path or os.path.join(tempfile.gettempdir(), "opsmate-spill")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+        # the size of the store as of the last scan plus the texts spilled since
+        self._total: int | None = None
+        self._cleaned_at = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def put(self, text: str) -> str:
+        """
+        Spill the text over, returning its key.
+        """
+        data = text.encode()
+        key = sha256(data).hexdigest()[:32]
+        path = self.file_path(key)
+        with self._lock:
+            if os.path.exists(path):
+                # spilled again, keep it the longest
+                os.utime(path)
+            else:
+                fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                if self._total is not None:
+                    self._total += len(data)
+            if (
+                self._total is None
+                or self._total > self.max_bytes
+                or time.monotonic() - self._cleaned_at >= self.cleanup_interval
+            ):
+                self._cleanup(keep=path)
+        return key
+
+    def file_path(self, key: str) -> str:
+        if not _KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid spill key: {key}")
+        return os.path.join(self.path, f"{key}.txt")
+
+    def read(
+        self,
+        key: str,
+        start: int = 0,
+        end: int | None = None,
+        unit: Literal["line", "byte"] = "line",
+    ) -> str:
+        """
+        Read the range [start, end) of the lines or bytes of the spilled text,
+        counted from 0, to the end of the text if end is not set.
+        """
+        path = self.file_path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"Spilled text {key} not found, it may have expired"
+            )
+        if start < 0 or (end is not None and end < start):
+            raise ValueError(f"Invalid range: {start} to {end}")
+
+        if unit == "byte":
+            with open(path, "rb") as f:
+                f.seek(start)
+                data = f.read() if end is None else f.read(end - start)
+            return data.decode(errors="replace")
+
+        with open(path, "r", errors="replace") as f:
+            return "".join(islice(f, start, end))
+
+    def cleanup(self):
+        with self._lock:
+            self._cleanup()
+
+    def _cleanup(self, keep: str | None = None):
+        now = time.time()
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if not entry.name.endswith(".txt"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        # the least recently spilled first
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            expired = self.ttl is not None and now - mtime > self.ttl
+            if not expired and (total <= self.max_bytes or path == keep):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                logger.warning(
+                    "failed to remove the spilled text", path=path, error=str(e)
+                )
+
+        self._total = total
+        self._cleaned_at = time.monotonic()
+
+
+@cache
+def default_spill_store() -> SpillStore:
+    """
+    The spill store of the tool outputs, in OPSMATE_DINO_SPILL_PATH if set.
+    """
+    return SpillStore(path=os.getenv("OPSMATE_DINO_SPILL_PATH"))
@@ -19,9 +19,11 @@ from opentelemetry.trace.status import Status, StatusCode
 from opsmate.runtime import Runtime
 from opsmate.libs.config import BaseSettings
 from abc import ABC, abstractmethod
+from functools import wraps
 import structlog
 import inspect
 import traceback
+import asyncio
 import warnings
 
 warnings.filterwarnings("ignore", message="fields may not start with an underscore")
@@ -67,6 +69,11 @@ class Message(BaseModel):
         description="The role of the message"
     )
     content: Content = Field(description="The content of the message")
+    cache_breakpoint: bool = Field(
+        False,
+        exclude=True,
+        description="Whether the prompt up to this message is cached by the providers supporting explicit prompt caching",
+    )
 
     @classmethod
     def system(cls, content: Content):
@@ -111,6 +118,17 @@ class React(BaseModel):
     action: str = Field(description="Action to take based on your thoughts")
 
 
+class ParallelReact(React):
+    actions: List[str] = Field(
+        description="""
+Further actions to take alongside the action, carried out concurrently with it.
+Only list the actions that are independent of each other and of the action,
+e.g. read-only investigations, leave empty otherwise.
+""",
+        default=[],
+    )
+
+
 class ReactAnswer(BaseModel):
     answer: str = Field(description="Your final answer to the question")
 
@@ -118,25 +136,56 @@ class ReactAnswer(BaseModel):
 # Define a type variable
 OutputType = TypeVar("OutputType")
 
+DEFAULT_TOOL_TIMEOUT = 300.0
+
+
+class ToolCallInterrupted(Exception):
+    """The tool call is timed out or cancelled before it completes."""
+
+    def __init__(self, message: str, reason: Literal["timeout", "cancelled"]):
+        super().__init__(message)
+        self.reason = reason
+
 
 class ToolCall(BaseModel, Generic[OutputType]):
     _tools: ClassVar[Dict[str, "ToolCall"]] = {}
     _tool_configs: ClassVar[Dict[str, "ToolCallConfig"]] = {}
     _tool_sources: ClassVar[Dict[str, str]] = {}
+    _cacheable: ClassVar[bool] = False
+    _cache_ttl: ClassVar[float | None] = None
+    _invalidates_cache: ClassVar[bool] = True
+    _timeout: ClassVar[float | None] = DEFAULT_TOOL_TIMEOUT
 
     _output: OutputType = PrivateAttr()
+    _cached: bool = PrivateAttr(default=False)
+    _partial_output: Any = PrivateAttr(default=None)
 
     async def run(self, context: dict[str, Any] = {}):
         """Run the tool call and return the output"""
         with tracer.start_as_current_span(
             name=f"{self.__class__.__name__}.run"
         ) as span:
+            self._cached, self._partial_output = False, None
+            tool_cache = context.get("tool_cache") if self._cacheable else None
+            if tool_cache is not None:
+                cache_key = self.cache_key()
+                cached, output = tool_cache.get(cache_key)
+                span.set_attribute("dino.tool.cached", cached)
+                if cached:
+                    self.output = output
+                    self._cached = True
+                    span.set_status(StatusCode.OK)
+                    return self.output
+                # the output is stale if a side effect clears the cache meanwhile
+                generation = tool_cache.generation
+
             try:
                 if inspect.iscoroutinefunction(self.__call__):
                     if self.call_has_context():
-                        self.output = await self(context=context)
+                        call = self(context=context)
                     else:
-                        self.output = await self()
+                        call = self()
+                    self.output = await self._interruptible(call, context)
                 else:
                     if self.call_has_context():
                         self.output = self(context=context)
@@ -146,6 +195,32 @@ class ToolCall(BaseModel, Generic[OutputType]):
                     "Tool call completed", attributes={"output": self.model_dump_json()}
                 )
                 span.set_status(StatusCode.OK)
+                if tool_cache is not None:
+                    tool_cache.set(
+                        cache_key,
+                        self.output,
+                        ttl=self._cache_ttl,
+                        generation=generation,
+                    )
+            except ToolCallInterrupted as e:
+                logger.warning(
+                    "Tool execution interrupted",
+                    error=str(e),
+                    tool=self.__class__.__name__,
+                )
+                span.add_event(
+                    "Tool call interrupted",
+                    attributes={"error": str(e), "reason": e.reason},
+                )
+                span.set_status(StatusCode.ERROR, str(e))
+                partial_output = self._partial_output
+                if isinstance(partial_output, BaseModel):
+                    partial_output = partial_output.model_dump(mode="json")
+                self.output = {
+                    "error": str(e),
+                    "message": f"tool execution {e.reason}",
+                    "partial_output": partial_output,
+                }
             except Exception as e:
                 logger.error(
                     "Tool execution failed",
@@ -160,8 +235,65 @@ class ToolCall(BaseModel, Generic[OutputType]):
                     "message": "error executing tool",
                     "stack": traceback.format_exc(),
                 }
+            finally:
+                # the call may have changed what the cached outputs were read from
+                if self._invalidates_cache and context.get("tool_cache") is not None:
+                    context["tool_cache"].clear()
             return self.output
 
+    async def _interruptible(self, call: Awaitable, context: dict[str, Any]):
+        """
+        Await the call until it completes, the deadline passes, or the cancellation
+        event in the context is set, whichever comes first.
+        """
+        deadline = self.deadline(context)
+        cancellation: asyncio.Event | None = context.get("cancellation")
+        task = asyncio.ensure_future(call)
+        waiters = {task}
+        if cancellation is not None:
+            cancelled = asyncio.ensure_future(cancellation.wait())
+            waiters.add(cancelled)
+        try:
+            done, _ = await asyncio.wait(
+                waiters, timeout=deadline, return_when=asyncio.FIRST_COMPLETED
+            )
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            if cancellation is not None:
+                cancelled.cancel()
+
+        if task in done:
+            return task.result()
+
+        # not waiting for the task to wind down, it may well ignore the cancellation
+        task.cancel()
+        task.add_done_callback(
+            lambda t: t.cancelled() or t.exception()  # retrieved to silence asyncio
+        )
+        if cancellation is not None and cancellation.is_set():
+            raise ToolCallInterrupted("The tool call is cancelled", "cancelled")
+        raise ToolCallInterrupted(
+            f"The tool call timed out after {deadline} seconds", "timeout"
+        )
+
+    def deadline(self, context: dict[str, Any] = {}) -> float | None:
+        """
+        The seconds the tool call is given to complete, tool_timeout in the context
+        overrides the one the tool is registered with. No deadline if None.
+        """
+        return context.get("tool_timeout", self._timeout)
+
+    @property
+    def partial_output(self) -> Any:
+        """The output so far, returned should the tool call be interrupted."""
+        return self._partial_output
+
+    @partial_output.setter
+    def partial_output(self, value: Any):
+        self._partial_output = value
+
     @computed_field
     @property
     def output(self) -> OutputType:
@@ -174,6 +306,16 @@ class ToolCall(BaseModel, Generic[OutputType]):
     def output(self, value: OutputType):
         self._output = value
 
+    @property
+    def cached(self) -> bool:
+        """Whether the output is served from the tool cache."""
+        return self._cached
+
+    def cache_key(self) -> str:
+        """The key of the tool call in the tool cache, derived from its fields."""
+        fields = self.model_dump_json(include=set(type(self).model_fields))
+        return f"{type(self).__module__}.{type(self).__qualname__}:{fields}"
+
     def call_has_context(self):
         if not hasattr(self, "__call__"):
             return False
@@ -217,18 +359,61 @@ class ToolCall(BaseModel, Generic[OutputType]):
 class ToolCallConfig(BaseSettings): ...
 
 
-def register_tool(config: Type[ToolCallConfig] | None = None):
+def register_tool(
+    config: Type[ToolCallConfig] | None = None,
+    cacheable: bool = False,
+    ttl: float | None = None,
+    timeout: float | None = DEFAULT_TOOL_TIMEOUT,
+    invalidates_cache: bool | None = None,
+):
+    """
+    Register the tool.
+
+    A cacheable tool, i.e. an idempotent read-only one, has the output of its
+    calls served from the tool cache of the session, see `ToolCache`, to the
+    calls with the identical fields for ttl seconds, or the whole session if not set.
+
+    The calls of any other tool are assumed to have side effects, e.g. writing files,
+    and clear the tool cache once run, unless invalidates_cache is False for the
+    read-only tools not worth caching.
+
+    The calls of the tool are cancelled after timeout seconds, never if None.
+    """
+
     def wrapper(cls: Type[ToolCall]):
         tool_name = cls.__name__
         ToolCall._tools[tool_name] = cls
         ToolCall._tool_sources[tool_name] = inspect.getfile(cls)
         if config:
             ToolCall._tool_configs[tool_name] = config
+        cls._timeout = timeout
+        cls._invalidates_cache = (
+            not cacheable if invalidates_cache is None else invalidates_cache
+        )
+        if cacheable:
+            cls._cacheable = True
+            cls._cache_ttl = ttl
+            if not getattr(cls.prompt_display, "_marks_cached", False):
+                cls.prompt_display = _cached_prompt_display(cls.prompt_display)
         return cls
 
     return wrapper
 
 
+def _cached_prompt_display(prompt_display: Callable[[ToolCall], str]):
+    @wraps(prompt_display)
+    def wrapper(self: ToolCall):
+        display = prompt_display(self)
+        if self.cached:
+            return (
+                f"<cached>the output of an identical earlier call</cached>\n{display}"
+            )
+        return display
+
+    wrapper._marks_cached = True
+    return wrapper
+
+
 class PresentationMixin(ABC):
     @abstractmethod
     def markdown(self, context: dict[str, Any] = {}):
@@ -0,0 +1,253 @@
+from typing import Any, Dict, Iterator, List, Sequence
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cache
+from opentelemetry import trace
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError
+import os
+import threading
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+TOKEN_FIELDS = (
+    "prompt_tokens",
+    "completion_tokens",
+    "cached_tokens",
+    "cache_creation_tokens",
+)
+
+
+class Usage(BaseModel):
+    """
+    The token usage of the LLM calls.
+    """
+
+    prompt_tokens: int = Field(0, description="The prompt tokens, cached or not")
+    completion_tokens: int = Field(0, description="The completion tokens")
+    cached_tokens: int = Field(0, description="The prompt tokens read from the cache")
+    cache_creation_tokens: int = Field(
+        0, description="The prompt tokens written to the cache"
+    )
+
+    _parent: "Usage | None" = PrivateAttr(None)
+    _call: bool = PrivateAttr(False)
+
+    def add(self, other: "Usage"):
+        for name in TOKEN_FIELDS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def attributes(self, prefix: str = "dino.usage") -> Dict[str, int]:
+        return {f"{prefix}.{name}": getattr(self, name) for name in TOKEN_FIELDS}
+
+
+class UsageRecord(Usage):
+    """
+    The usage of a LLM call made by a dino function.
+    """
+
+    timestamp: float = Field(description="The unix time the call completed at")
+    function: str = Field(description="The name of the dino function")
+    provider: str = Field(description="The provider of the model")
+    model: str = Field(description="The model called")
+    context: str | None = Field(None, description="The context of the call, if any")
+    ttft: float = Field(
+        description="The seconds to the first token, to the response when not streamed"
+    )
+    latency: float = Field(description="The seconds to the complete response")
+
+
+class UsageReport(Usage):
+    """
+    The usage of the LLM calls aggregated by the function, model and/or context.
+    The fields not aggregated by are None.
+    """
+
+    function: str | None = None
+    model: str | None = None
+    context: str | None = None
+    calls: int = 0
+    ttft: float = Field(0.0, description="The mean seconds to the first token")
+    latency: float = Field(0.0, description="The mean seconds to the complete response")
+
+
+# the usage of the LLM call in flight, for the completion hook to report to
+_current: ContextVar[Usage | None] = ContextVar("dino_usage", default=None)
+_context: ContextVar[str | None] = ContextVar("dino_usage_context", default=None)
+
+
+@contextmanager
+def track_usage(span: trace.Span | None = None, call: bool = False) -> Iterator[Usage]:
+    """
+    Collect the usage of the LLM calls made within the context, retries included.
+    The usage is added to the one tracked by the enclosing context, if any,
+    and set on the span when the context exits.
+
+    A context tracking a single LLM call only collects the usage of that call,
+    the ones started within it, e.g. by the streamed tool calls, are added to
+    the enclosing context instead.
+    """
+    parent = _current.get()
+    while parent is not None and parent._call:
+        parent = parent._parent
+    usage = Usage()
+    usage._parent, usage._call = parent, call
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+        if parent is not None:
+            parent.add(usage)
+        if span is not None and span.is_recording():
+            span.set_attributes(usage.attributes())
+
+
+@contextmanager
+def usage_context(name: str | None):
+    """
+    Attribute the usage of the LLM calls made within the context to the
+    named context, e.g. the opsmate context of the session.
+    """
+    token = _context.set(name)
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_usage_context() -> str | None:
+    return _context.get()
+
+
+def _tokens(usage: Any, name: str) -> int:
+    return getattr(usage, name, None) or 0
+
+
+def usage_from_response(response: Any) -> Usage | None:
+    """
+    The usage of an OpenAI chat completion or an Anthropic message.
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+
+    if hasattr(usage, "input_tokens"):
+        # anthropic input tokens do not include the ones read from or written to the cache
+        cached = _tokens(usage, "cache_read_input_tokens")
+        creation = _tokens(usage, "cache_creation_input_tokens")
+        return Usage(
+            prompt_tokens=_tokens(usage, "input_tokens") + cached + creation,
+            completion_tokens=_tokens(usage, "output_tokens"),
+            cached_tokens=cached,
+            cache_creation_tokens=creation,
+        )
+
+    return Usage(
+        prompt_tokens=_tokens(usage, "prompt_tokens"),
+        completion_tokens=_tokens(usage, "completion_tokens"),
+        cached_tokens=_tokens(
+            getattr(usage, "prompt_tokens_details", None), "cached_tokens"
+        ),
+    )
+
+
+def record_usage(response: Any):
+    """
+    instructor completion response hook reporting the usage to the LLM call in flight.
+    """
+    current = _current.get()
+    if current is None:
+        return
+    usage = usage_from_response(response)
+    if usage is not None:
+        current.add(usage)
+
+
+class UsageRegistry:
+    """
+    UsageRegistry keeps the usage records of the LLM calls in memory, and
+    appends them to a JSON lines file when a path is set, for `opsmate usage`
+    to report on.
+
+    Parameters:
+        path (str, optional):
+            The path of the JSON lines file the records are appended to.
+        maxsize (int):
+            The maximum number of records kept in memory.
+    """
+
+    def __init__(self, path: str | None = None, maxsize: int = 10000):
+        self.path = path
+        self._records: deque[UsageRecord] = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, record: UsageRecord):
+        with self._lock:
+            self._records.append(record)
+            if self.path:
+                try:
+                    with open(self.path, "a") as f:
+                        f.write(record.model_dump_json() + "\n")
+                except OSError as e:
+                    logger.warning(
+                        "failed to write the usage record", path=self.path, error=str(e)
+                    )
+
+    def records(self) -> List[UsageRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    @classmethod
+    def load(cls, path: str, maxsize: int | None = None) -> "UsageRegistry":
+        """
+        Load the records of a JSON lines file into a registry not writing to it.
+        """
+        registry = cls(maxsize=maxsize)
+        with open(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    registry._records.append(UsageRecord.model_validate_json(line))
+                except ValidationError as e:
+                    logger.warning("skip the invalid usage record", error=str(e))
+        return registry
+
+    def report(
+        self, by: Sequence[str] = ("function", "model", "context")
+    ) -> List[UsageReport]:
+        """
+        Aggregate the records by the given fields, the most prompt tokens first.
+        """
+        reports: Dict[tuple, UsageReport] = {}
+        for record in self.records():
+            key = tuple(getattr(record, field) for field in by)
+            report = reports.get(key)
+            if report is None:
+                report = reports[key] = UsageReport(**dict(zip(by, key)))
+            report.add(record)
+            report.calls += 1
+            # running means
+            report.ttft += (record.ttft - report.ttft) / report.calls
+            report.latency += (record.latency - report.latency) / report.calls
+        return sorted(reports.values(), key=lambda r: r.prompt_tokens, reverse=True)
+
+
+@cache
+def default_usage_registry() -> UsageRegistry | None:
+    """
+    The usage registry used by dino, enabled by pointing OPSMATE_DINO_USAGE_PATH
+    at the JSON lines file to record the usage to.
+    """
+    path = os.getenv("OPSMATE_DINO_USAGE_PATH")
+    if not path:
+        return None
+    return UsageRegistry(path=path)
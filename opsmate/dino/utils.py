@@ -1,5 +1,11 @@
-from typing import Callable
+from typing import Callable, Tuple
 from inspect import signature
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1024)
+def _param_names(fn: Callable) -> Tuple[str, ...]:
+    return tuple(signature(fn).parameters.keys())
 
 
 def args_dump(fn: Callable, cbk: Callable, args, kwargs):
@@ -24,8 +30,8 @@ def args_dump(fn: Callable, cbk: Callable, args, kwargs):
     args_dump(fn, cbk, (1, 2), {"c": 3, "d": 4})
     >> ( (1,), {"d": 4})
     """
-    fn_params = list(signature(fn).parameters.keys())
-    cbk_params = set(signature(cbk).parameters.keys())
+    fn_params = _param_names(fn)
+    cbk_params = set(_param_names(cbk))
 
     # Match positional arguments
     matched_args = tuple(
@@ -45,6 +45,7 @@ from opsmate.gui.views import (
 )
 from opsmate.gui.components import CellComponent, editor_script
 from opsmate.ingestions import ingest_from_config
+from opsmate.ingestions.github import aclose_shared_clients
 from opsmate.ingestions.models import IngestionRecord
 from opsmate.ingestions.jobs import ingest, delete_ingestion
 from opsmate.dbq.dbq import enqueue_task
@@ -101,6 +102,11 @@ async def startup():
         await kb_ingest()
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    await aclose_shared_clients()
+
+
 @app.route("/polya")
 async def get():
     with sqlmodel.Session(engine) as session:
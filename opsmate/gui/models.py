@@ -23,6 +23,7 @@ from sqlalchemy.orm import registry
 from opsmate.gui.config import config
 import yaml
 import pickle
+import asyncio
 from pydantic import BaseModel, model_validator
 from contextlib import asynccontextmanager
 from opsmate.dino.context import ContextRegistry
@@ -375,6 +376,7 @@ def gen_react():
         contexts=contexts,
         tools=config.opsmate_tools(),
         iterable=True,
+        stream=True,
         **config.models_config.get(config.model, {}),
     )
     async def run_react(question: str, chat_history: List[Message] = []):
@@ -422,6 +424,31 @@ async def with_runtimes():
             await runtime.disconnect()
 
 
+@asynccontextmanager
+async def cancellation_on_stopping(
+    cell: "Cell", session: Session, interval: float = 0.5
+):
+    """
+    Yield an event set once the cell is being stopped, for the tool calls
+    in flight to be cancelled cooperatively rather than run to completion.
+    """
+    cancellation = asyncio.Event()
+
+    async def watch():
+        while not cancellation.is_set():
+            await asyncio.sleep(interval)
+            state = session.exec(select(Cell.state).where(Cell.id == cell.id)).first()
+            if state in (CellStateEnum.STOPPING, CellStateEnum.STOPPED):
+                logger.info("cancelling the tool calls", cell_id=cell.id)
+                cancellation.set()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        yield cancellation
+    finally:
+        watcher.cancel()
+
+
 def gen_simple():
     runtimes, _ = get_runtimes()
     ctx = ContextRegistry.get_context(config.context)
@@ -430,6 +457,7 @@ def gen_simple():
         model=config.model,
         response_model=Observation,
         tools=config.opsmate_tools(),
+        stream_tool_calls=True,
         **config.models_config.get(config.model, {}),
     )
     async def instruction(question: str, chat_history: List[Message] = []):
@@ -528,6 +556,7 @@ class Completion(BaseModel):
     temperature=0.0,
     max_tokens=2000,
     response_model=str,
+    cache=True,
 )
 async def auto_complete(input: str, chat_history: list[Message]):
     """
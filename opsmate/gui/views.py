@@ -17,6 +17,7 @@ from opsmate.gui.models import (
     EnvVar,
     ExecutionConfirmation,
     with_runtimes,
+    cancellation_on_stopping,
 )
 from opsmate.gui.components import (
     CellComponent,
@@ -26,6 +27,7 @@ from opsmate.gui.components import (
     render_react_answer_markdown_raw,
 )
 from opsmate.dino.types import Message, Observation, React, ReactAnswer
+from opsmate.dino import is_partial
 from pydantic import BaseModel
 from opsmate.dino.provider import Provider
 from opsmate.ingestions.models import IngestionRecord
@@ -71,6 +73,9 @@ import os
 
 logger = structlog.get_logger()
 
+# the minimum interval in seconds between the renders of a streamed output
+STREAM_RENDER_INTERVAL = 0.25
+
 react = gen_react()
 simple = gen_simple()
 
@@ -171,6 +176,61 @@ async def prefill_conversation(cell: Cell, session: Session):
     return chat_history
 
 
+def react_cell_content(output: React | ReactAnswer | Observation):
+    """
+    The input, output and type of the cell of a react output.
+
+    Partial outputs are stored as complete ones, as the partial classes
+    are created on the fly and cannot be pickled.
+    """
+    match output:
+        case React():
+            output = React(thoughts=output.thoughts or "", action=output.action or "")
+            return (
+                render_react_markdown_raw(output),
+                {"type": "React", "output": output},
+                CellType.REASONING_THOUGHTS,
+            )
+        case ReactAnswer():
+            output = ReactAnswer(answer=output.answer or "")
+            return (
+                render_react_answer_markdown_raw(output),
+                {"type": "ReactAnswer", "output": output},
+                CellType.REASONING_ANSWER,
+            )
+        case Observation():
+            return (
+                render_observation_markdown_raw(output),
+                {"type": "Observation", "output": copy_observation(output)},
+                CellType.REASONING_OBSERVATION,
+            )
+    return None
+
+
+async def update_react_cell(
+    output: React | ReactAnswer | Observation,
+    react_cell: Cell,
+    session: Session,
+    send,
+):
+    content = react_cell_content(output)
+    if content is None:
+        logger.error("unknown output type", output=output)
+        return
+    react_cell.input, cell_output, react_cell.cell_type = content
+    react_cell.output = pickle.dumps([cell_output])
+    session.add(react_cell)
+    session.commit()
+
+    await send(
+        Div(
+            CellComponent(react_cell),
+            hx_swap_oob="true",
+            id=f"cell-component-{react_cell.id}",
+        )
+    )
+
+
 async def new_react_cell(
     output: React | ReactAnswer | Observation,
     prev_cell: Cell,
@@ -187,31 +247,11 @@ async def new_react_cell(
     session.commit()
 
     workflow = prev_cell.workflow
-    match output:
-        case React():
-            input = render_react_markdown_raw(output)
-            cell_output = {
-                "type": "React",
-                "output": output,
-            }
-            thinking_system = CellType.REASONING_THOUGHTS
-        case ReactAnswer():
-            input = render_react_answer_markdown_raw(output)
-            cell_output = {
-                "type": "ReactAnswer",
-                "output": output,
-            }
-            thinking_system = CellType.REASONING_ANSWER
-        case Observation():
-            input = render_observation_markdown_raw(output)
-            cell_output = {
-                "type": "Observation",
-                "output": copy_observation(output),
-            }
-            thinking_system = CellType.REASONING_OBSERVATION
-        case _:
-            logger.error("unknown output type", output=output)
-            return
+    content = react_cell_content(output)
+    if content is None:
+        logger.error("unknown output type", output=output)
+        return
+    input, cell_output, thinking_system = content
     react_cell = Cell(
         input=input,
         output=pickle.dumps([cell_output]),
@@ -324,8 +364,18 @@ async def react_streaming(
     prev_cell = cell
     thought_deduped = False
     stopped = False
+    # the cell of the output being streamed, updated with its partials
+    streaming_cell, rendered_at = None, 0.0
     async for output in await reactGenerator:
-        logger.debug("output", output=output)
+        partial = is_partial(output)
+        if (
+            partial
+            and streaming_cell is not None
+            and time.monotonic() - rendered_at < STREAM_RENDER_INTERVAL
+        ):
+            continue
+        if not partial:
+            logger.debug("output", output=output)
         session.refresh(cell)
 
         if cell.state == CellStateEnum.STOPPING:
@@ -338,6 +388,8 @@ async def react_streaming(
             break
 
         if cell.cell_type == CellType.REASONING_THOUGHTS and not thought_deduped:
+            if partial:
+                continue
             logger.info("thought deduped", output=output)
             cell.input = render_react_markdown_raw(output)
             cell = await render_notes_output(
@@ -345,8 +397,17 @@ async def react_streaming(
             )
             prev_cell = cell
             thought_deduped = True
+        elif streaming_cell is not None:
+            await update_react_cell(output, streaming_cell, session, send)
+            rendered_at = time.monotonic()
+            if not partial:
+                prev_cell, streaming_cell = streaming_cell, None
         else:
-            prev_cell = await new_react_cell(output, prev_cell, session, send)
+            react_cell = await new_react_cell(output, prev_cell, session, send)
+            if partial:
+                streaming_cell, rendered_at = react_cell, time.monotonic()
+            else:
+                prev_cell = react_cell
 
     if not stopped:
         cell = await render_notes_output(
@@ -431,7 +492,10 @@ async def execute_llm_react_instruction(
 
     confirmation_prompt = await gen_confirmation_prompt(cell, session, send)
 
-    async with with_runtimes() as runtimes:
+    async with (
+        with_runtimes() as runtimes,
+        cancellation_on_stopping(cell, session) as cancellation,
+    ):
         await react_streaming(
             cell,
             swap,
@@ -444,6 +508,7 @@ async def execute_llm_react_instruction(
                     "envvars": EnvVar.all(session),
                     "confirmation": confirmation_prompt,
                     "runtimes": runtimes,
+                    "cancellation": cancellation,
                 },
                 model=llm_model,
                 runtimes=runtimes,
@@ -803,7 +868,10 @@ Here are the tasks to be performed **ONLY**:
 
     confirmation_prompt = await gen_confirmation_prompt(cell, session, send)
 
-    async with with_runtimes() as runtimes:
+    async with (
+        with_runtimes() as runtimes,
+        cancellation_on_stopping(cell, session) as cancellation,
+    ):
         await react_streaming(
             cell,
             swap,
@@ -817,6 +885,7 @@ Here are the tasks to be performed **ONLY**:
                     "confirmation": confirmation_prompt,
                     "cwd": os.getcwd(),
                     "runtimes": runtimes,
+                    "cancellation": cancellation,
                 },
                 model=llm_model,
                 runtimes=runtimes,
@@ -1370,7 +1439,7 @@ def render_cells_container_with_ws(cells: list[Cell], hx_swap_oob: str = None):
 
 def copy_observation(observation: Observation):
     ob = Observation(
-        observation=observation.observation,
+        observation=observation.observation or "",
     )
     tool_outputs = []
     for tool_output in observation.tool_outputs:
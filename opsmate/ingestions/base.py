@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import AsyncGenerator, Callable, Awaitable
-from pydantic import BaseModel, Field
+from typing import AsyncGenerator, Callable, Awaitable, Set
+from pydantic import BaseModel, Field, PrivateAttr
 from opsmate.textsplitters.base import Chunk
 import structlog
 
@@ -21,6 +21,8 @@ class BaseIngestion(ABC, BaseModel):
     class Config:
         arbitrary_types_allowed = True
 
+    _skipped_paths: Set[str] = PrivateAttr(default_factory=set)
+
     @abstractmethod
     async def load(self) -> AsyncGenerator[Document, None]:
         """
@@ -28,6 +30,12 @@ class BaseIngestion(ABC, BaseModel):
         """
         pass
 
+    def skipped_paths(self) -> Set[str]:
+        """
+        The paths present in the source that the last load skipped as unchanged.
+        """
+        return self._skipped_paths
+
     @abstractmethod
     def data_source(self) -> str:
         """
@@ -0,0 +1,59 @@
+from pathlib import Path
+from hashlib import sha256
+from opsmate.config import config
+import os
+import tempfile
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class BlobStore:
+    """
+    BlobStore is a content-addressed store on the local filesystem.
+
+    Blobs are keyed by the sha256 of their content and laid out as
+    `<root>/<first 2 hex chars>/<sha256>`, so that large payloads can be
+    passed around by reference rather than by value.
+    """
+
+    def __init__(self, root: str | None = None):
+        self.root = Path(root or config.ingestion_blobs_path)
+
+    def path(self, ref: str) -> Path:
+        if len(ref) != 64 or not all(c in "0123456789abcdef" for c in ref):
+            raise ValueError(f"Invalid blob reference: {ref}")
+        return self.root / ref[:2] / ref
+
+    def put(self, data: bytes) -> str:
+        """
+        Store the data and return its reference. Storing the same data twice is a no-op.
+        """
+        ref = sha256(data).hexdigest()
+        path = self.path(ref)
+        if path.exists():
+            return ref
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temp file first so that readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return ref
+
+    def get(self, ref: str) -> bytes | None:
+        try:
+            return self.path(ref).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, ref: str):
+        try:
+            self.path(ref).unlink()
+        except FileNotFoundError:
+            logger.debug("blob already deleted", ref=ref)
@@ -1,5 +1,7 @@
 from opsmate.ingestions.base import Document
-from opsmate.textsplitters import TextSplitter
+from opsmate.textsplitters import TextSplitter, asplit_texts
+from opsmate.textsplitters.base import Chunk
+from typing import Any, Dict, List
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -9,15 +11,35 @@ async def chunk_document(splitter: TextSplitter, document: Document):
     """
     Chunk the individual document.
     """
-    for chunk_idx, chunk in enumerate(splitter.split_text(document.content)):
+    for chunk_idx, chunk in enumerate(splitter.iter_split(document.content)):
         logger.info(
             "chunking document", document=document.metadata["path"], chunk_idx=chunk_idx
         )
-        ch = chunk.model_copy()
-        for key, value in document.metadata.items():
-            ch.metadata[key] = value
-        ch.id = chunk_idx
-        ch.metadata["data_source"] = document.data_source
-        ch.metadata["data_source_provider"] = document.data_provider
+        yield _with_document(chunk, chunk_idx, document)
 
-        yield ch
+
+async def split_documents(
+    documents: List[Document],
+    splitter_config: Dict[str, Any],
+    workers: int | None = None,
+) -> List[List[Chunk]]:
+    """
+    Chunk the documents across a process pool of `workers` processes,
+    returning the chunks of each document in order.
+    """
+    chunks_per_document = await asplit_texts(
+        [document.content for document in documents], splitter_config, workers
+    )
+    for document, chunks in zip(documents, chunks_per_document):
+        for chunk_idx, chunk in enumerate(chunks):
+            _with_document(chunk, chunk_idx, document)
+    return chunks_per_document
+
+
+def _with_document(chunk: Chunk, chunk_idx: int, document: Document) -> Chunk:
+    # the chunks are freshly built by the splitter, no need to copy them
+    chunk.id = chunk_idx
+    chunk.metadata.update(document.metadata)
+    chunk.metadata["data_source"] = document.data_source
+    chunk.metadata["data_source_provider"] = document.data_provider
+    return chunk
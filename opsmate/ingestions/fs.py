@@ -1,39 +1,290 @@
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 from .base import BaseIngestion, Document
 from pydantic import Field
-from glob import glob
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from os import path
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, NamedTuple, Tuple
 from hashlib import sha256
+import asyncio
+import json
+import os
+import re
+import tempfile
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+class FileStat(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+
+
+def _translate_component(component: str) -> str:
+    result = []
+    i = 0
+    while i < len(component):
+        c = component[i]
+        if c == "*":
+            result.append("[^/]*")
+        elif c == "?":
+            result.append("[^/]")
+        elif c == "[" and "]" in component[i + 2 :]:
+            end = component.index("]", i + 2)
+            chars = component[i + 1 : end].replace("\\", "\\\\")
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            result.append(f"[{chars}]")
+            i = end
+        else:
+            result.append(re.escape(c))
+        i += 1
+
+    pattern = "".join(result)
+    # same as glob, wildcards do not match hidden files
+    if component[0] in "*?[":
+        pattern = r"(?!\.)" + pattern
+    return pattern
+
+
+def translate_glob(
+    glob_pattern: str,
+) -> Tuple[re.Pattern, List[str], Optional[int]]:
+    """
+    Translate a recursive glob pattern into a regex matching the paths relative to the root.
+
+    Returns the regex, the literal leading directories of the pattern to start the walk from,
+    and the directory depth to walk to, which is None when the pattern contains `**`.
+    """
+    components = [c for c in glob_pattern.split("/") if c not in ("", ".")]
+    prefix = []
+    for component in components[:-1]:
+        if any(c in component for c in "*?["):
+            break
+        prefix.append(component)
+
+    regex = []
+    max_depth = len(components)
+    for idx, component in enumerate(components):
+        last = idx == len(components) - 1
+        if component == "**":
+            max_depth = None
+            regex.append(r"(?:(?!\.)[^/]+/)*" + (r"(?!\.)[^/]+" if last else ""))
+        else:
+            regex.append(_translate_component(component) + ("" if last else "/"))
+    return re.compile("".join(regex) + r"\Z"), prefix, max_depth
 
 
 class FsIngestion(BaseIngestion):
     local_path: str = Field(..., description="The local path to the files")
     glob_pattern: str = Field("**/*", description="The glob pattern to match the files")
+    concurrency: int = Field(
+        8, description="The number of threads used to read and hash the files"
+    )
+    manifest_path: Optional[str] = Field(
+        None,
+        description="The path to the scan manifest of (path, size, mtime_ns, sha). When set, files unchanged since the last scan are not read",
+    )
+    indexed: Dict[str, str] = Field(
+        default_factory=dict,
+        description="The sha of the documents already indexed by path, unchanged files among them are not loaded",
+    )
+
+    def scan(self) -> List[FileStat]:
+        """
+        Walk the local path with os.scandir and return the files matching the glob pattern.
+        """
+        regex, prefix, max_depth = translate_glob(self.glob_pattern)
+        walk_hidden = any(
+            c.startswith(".") and c not in (".", "..")
+            for c in self.glob_pattern.split("/")
+        )
+
+        result = []
+
+        def walk(dirname: str, relpath: str, depth: int):
+            try:
+                with os.scandir(dirname) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except (FileNotFoundError, NotADirectoryError, PermissionError) as e:
+                logger.warning("failed to scan directory", path=dirname, error=str(e))
+                return
+
+            subdirs = []
+            for entry in entries:
+                rel = f"{relpath}{entry.name}"
+                if entry.is_dir():
+                    subdirs.append((entry, rel))
+                elif entry.is_file() and regex.match(rel):
+                    st = entry.stat()
+                    result.append(FileStat(entry.path, st.st_size, st.st_mtime_ns))
+
+            if max_depth is not None and depth >= max_depth:
+                return
+            for entry, rel in subdirs:
+                if entry.name.startswith(".") and not walk_hidden:
+                    continue
+                walk(entry.path, f"{rel}/", depth + 1)
+
+        relpath = "".join(f"{p}/" for p in prefix)
+        walk(path.join(self.local_path, *prefix), relpath, len(prefix) + 1)
+        return result
+
+    def matches(self, file_path: str) -> bool:
+        """
+        Whether the file path is matched by the glob pattern of the ingestion.
+        """
+        rel = path.relpath(path.abspath(file_path), path.abspath(self.local_path))
+        if rel.startswith(".."):
+            return False
+        regex, _, _ = translate_glob(self.glob_pattern)
+        return regex.match(rel.replace(os.sep, "/")) is not None
 
     async def load(self) -> AsyncGenerator[Document, None]:
-        glob_pattern = path.join(self.local_path, self.glob_pattern)
-        files = glob(glob_pattern, recursive=True)
-        for filename in files:
-            # skip if filename is a directory
-            if path.isdir(filename):
-                continue
-            with open(filename, "r") as f:
-                content = f.read()
-            base_name = path.basename(filename)
-            full_path = path.abspath(filename)
-            sha = sha256(content.encode("utf-8")).hexdigest()
-            yield Document(
-                data_provider=self.data_source_provider(),
-                data_source=self.data_source(),
-                content=content,
-                metadata={
-                    "name": base_name,
-                    "path": full_path,
-                    "sha": sha,
-                },
+        files = await asyncio.to_thread(self.scan)
+        manifest = await asyncio.to_thread(self._read_manifest)
+        new_manifest = {}
+        self._skipped_paths = set()
+
+        async for doc in self._load_files(files, manifest, new_manifest):
+            yield doc
+
+        await asyncio.to_thread(self._write_manifest, new_manifest)
+
+    async def load_files(self, file_paths: List[str]) -> AsyncGenerator[Document, None]:
+        """
+        Load the given files only, skipping the ones not matched by the glob pattern.
+        The manifest is left untouched.
+        """
+
+        def stat() -> List[FileStat]:
+            files = []
+            for file_path in file_paths:
+                if not self.matches(file_path) or not path.isfile(file_path):
+                    continue
+                try:
+                    st = os.stat(file_path)
+                except OSError as e:
+                    # e.g. removed since the change was seen
+                    logger.warning(
+                        "skipping file failed to stat", path=file_path, error=str(e)
+                    )
+                    continue
+                files.append(FileStat(file_path, st.st_size, st.st_mtime_ns))
+            return files
+
+        files = await asyncio.to_thread(stat)
+        async for doc in self._load_files(files, {}, {}):
+            yield doc
+
+    async def _load_files(
+        self,
+        files: List[FileStat],
+        manifest: Dict[str, list],
+        new_manifest: Dict[str, list],
+    ) -> AsyncGenerator[Document, None]:
+        def read(file: FileStat) -> Tuple[FileStat, str, str] | None:
+            try:
+                with open(file.path, "r") as f:
+                    content = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                # e.g. removed since it was scanned, or not a text file
+                logger.warning(
+                    "skipping file failed to read", path=file.path, error=str(e)
+                )
+                return None
+            return file, content, sha256(content.encode("utf-8")).hexdigest()
+
+        loop = asyncio.get_running_loop()
+        # keep a bounded window of reads in flight and yield them in scan order
+        window = deque()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            for file in files:
+                full_path = path.abspath(file.path)
+                entry = manifest.get(full_path)
+                if (
+                    entry is not None
+                    and entry[:2] == [file.size, file.mtime_ns]
+                    and self.indexed.get(full_path) == entry[2]
+                ):
+                    new_manifest[full_path] = entry
+                    self._skipped_paths.add(full_path)
+                    continue
+
+                window.append(loop.run_in_executor(executor, read, file))
+                if len(window) >= self.concurrency * 2:
+                    doc = self._document(await window.popleft(), new_manifest)
+                    if doc is not None:
+                        yield doc
+
+            while window:
+                doc = self._document(await window.popleft(), new_manifest)
+                if doc is not None:
+                    yield doc
+        finally:
+            # do not block the event loop on the pending reads when the
+            # consumer stops early
+            for future in window:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _document(
+        self, read: Tuple[FileStat, str, str] | None, manifest: Dict[str, list]
+    ) -> Document | None:
+        if read is None:
+            return None
+        file, content, sha = read
+        full_path = path.abspath(file.path)
+        manifest[full_path] = [file.size, file.mtime_ns, sha]
+        if self.indexed.get(full_path) == sha:
+            self._skipped_paths.add(full_path)
+            return None
+
+        return Document(
+            data_provider=self.data_source_provider(),
+            data_source=self.data_source(),
+            content=content,
+            metadata={
+                "name": path.basename(file.path),
+                "path": full_path,
+                "sha": sha,
+            },
+        )
+
+    def _read_manifest(self) -> Dict[str, list]:
+        if not self.manifest_path or not path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "failed to read the manifest", path=self.manifest_path, error=str(e)
             )
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest.get("files", {})
+
+    def _write_manifest(self, files: Dict[str, list]):
+        if not self.manifest_path:
+            return
+        dirname = path.dirname(path.abspath(self.manifest_path))
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": MANIFEST_VERSION, "files": files}, f)
+            os.replace(tmp_path, self.manifest_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
 
     def data_source(self) -> str:
         return str(Path(self.local_path) / self.glob_pattern)
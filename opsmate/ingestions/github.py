@@ -4,10 +4,118 @@ from pydantic import Field, model_validator
 import os
 import httpx
 import asyncio
+import queue
 import base64
 import fnmatch
+import tarfile
+import importlib.util
+import weakref
+import structlog
 from typing import Dict, List
 
+logger = structlog.get_logger(__name__)
+
+# one client per event loop, as the pooled connections are bound to the loop
+_shared_clients = weakref.WeakKeyDictionary()
+
+# the downloaded chunks of the tarball waiting to be read by the tar reader
+ARCHIVE_MAX_INFLIGHT_CHUNKS = 64
+
+# sentinel put on the documents queue by a worker once it runs out of files
+_WORKER_DONE = object()
+
+
+class _ArchiveClosed(Exception):
+    """The archive stream is closed before the tarball is read through."""
+
+
+class _ArchiveStream:
+    """
+    A file-like object reading the tarball chunks as they are downloaded,
+    for tarfile to read in a thread while the event loop downloads the rest.
+    """
+
+    def __init__(self, maxsize: int = ARCHIVE_MAX_INFLIGHT_CHUNKS):
+        self._chunks: queue.Queue[bytes | BaseException | None] = queue.Queue(maxsize)
+        self._buffer = bytearray()
+        self._eof = False
+        self.closed = False
+
+    def put_nowait(self, chunk: bytes | BaseException | None) -> bool:
+        try:
+            self._chunks.put_nowait(chunk)
+            return True
+        except queue.Full:
+            return False
+
+    def put(self, chunk: bytes | BaseException | None):
+        """Put the chunk, blocking while the reader is behind, until closed."""
+        while not self.closed:
+            try:
+                self._chunks.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    async def feed(self, chunk: bytes | BaseException | None):
+        if not self.put_nowait(chunk):
+            await asyncio.to_thread(self.put, chunk)
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            if self.closed:
+                raise _ArchiveClosed()
+            try:
+                chunk = self._chunks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if chunk is None:
+                self._eof = True
+            elif isinstance(chunk, BaseException):
+                raise chunk
+            else:
+                self._buffer += chunk
+
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def close(self):
+        self.closed = True
+
+
+def http2_available():
+    return importlib.util.find_spec("h2") is not None
+
+
+def shared_client() -> httpx.AsyncClient:
+    """
+    Return the connection-pooled HTTP client shared by all the GitHub ingestions
+    running on the current event loop. HTTP/2 is used when `h2` is installed (`pip install httpx[http2]`).
+    """
+    loop = asyncio.get_running_loop()
+    client = _shared_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=http2_available(),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+            timeout=httpx.Timeout(30.0),
+        )
+        _shared_clients[loop] = client
+    return client
+
+
+async def aclose_shared_clients():
+    """
+    Close the shared client of the current event loop, to be called before the
+    loop shuts down, e.g. by the worker on its way out.
+    """
+    client = _shared_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
 
 class GithubIngestion(BaseIngestion):
     repo: str = Field(..., description="The repository in the format of owner/repo")
@@ -20,10 +128,23 @@ class GithubIngestion(BaseIngestion):
     branch: str = Field("main", description="The branch to ingest")
     path: str = Field("", description="The path to ingest")
     client: Optional[httpx.AsyncClient] = Field(
-        description="The HTTP client to use", default_factory=httpx.AsyncClient
+        description="The HTTP client to use, defaults to the shared client",
+        default=None,
     )
     concurrency: int = Field(10, description="The concurrency to use")
+    max_inflight_docs: int = Field(
+        20,
+        description="The maximum number of fetched documents waiting to be consumed",
+    )
     glob: str = Field("", description="The glob patternto use")
+    use_archive: bool = Field(
+        True,
+        description="Download the branch tarball instead of fetching the files one by one",
+    )
+    archive_min_files: int = Field(
+        20,
+        description="The minimum number of matched files to use the tarball, below which the per-file API is used",
+    )
 
     @model_validator(mode="before")
     @classmethod
@@ -45,27 +166,44 @@ class GithubIngestion(BaseIngestion):
             "X-GitHub-Api-Version": "2022-11-28",
         }
 
-    async def get_files(self) -> AsyncGenerator[str, None]:
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self.client or shared_client()
+
+    @property
+    def html_base_url(self):
+        if self.github_api_url.rstrip("/") == "https://api.github.com":
+            return "https://github.com"
+        # GitHub Enterprise serves the API under /api/v3
+        return self.github_api_url.rstrip("/").removesuffix("/api/v3")
+
+    def _match(self, path: str) -> bool:
+        if self.path != "" and not path.startswith(self.path):
+            return False
+        if self.glob and not fnmatch.fnmatch(f"./{path}", self.glob):
+            return False
+        return True
+
+    async def get_blobs(self) -> AsyncGenerator[Dict[str, str], None]:
         # https://api.github.com/repos/OWNER/REPO/git/trees/TREE_SHA
         url = f"{self.github_api_url}/repos/{self.repo}/git/trees/{self.branch}?recursive=1"
-        response = await self.client.get(url, headers=self.headers)
+        response = await self.http_client.get(url, headers=self.headers)
         response.raise_for_status()
 
         tree = response.json().get("tree")
         for item in tree:
-            if item.get("type") == "blob":
-                path = item.get("path")
-                if self.path != "" and not path.startswith(self.path):
-                    continue
-                if self.glob and not fnmatch.fnmatch(f"./{path}", self.glob):
-                    continue
-                yield path
+            if item.get("type") == "blob" and self._match(item.get("path")):
+                yield item
+
+    async def get_files(self) -> AsyncGenerator[str, None]:
+        async for blob in self.get_blobs():
+            yield blob.get("path")
 
     async def get_file_with_metadata(self, file_path: str) -> Dict[str, str]:
         # https://docs.github.com/en/rest/repos/contents?apiVersion=2022-11-28
         url = f"{self.github_api_url}/repos/{self.repo}/contents/{file_path}"
 
-        response = await self.client.get(url, headers=self.headers)
+        response = await self.http_client.get(url, headers=self.headers)
         response.raise_for_status()
         body = response.json()
         content_encoded = body.get("content")
@@ -75,33 +213,178 @@ class GithubIngestion(BaseIngestion):
             "sha": body.get("sha"),
         }
 
+    def _document(self, file: str, content: str, source: str, sha: str) -> Document:
+        return Document(
+            data_provider=self.data_source_provider(),
+            data_source=self.data_source(),
+            content=content,
+            metadata={
+                "path": file,
+                "repo": self.repo,
+                "branch": self.branch,
+                "source": source,
+                "sha": sha,
+            },
+        )
+
     async def load(self) -> AsyncGenerator[Document, None]:
-        # semaphore to limit the number of concurrent requests
-        semaphore = asyncio.Semaphore(self.concurrency)
-
-        async def process_file(file: str) -> Document:
-            async with semaphore:
-                content_with_metadata = await self.get_file_with_metadata(file)
-                return Document(
-                    data_provider=self.data_source_provider(),
-                    data_source=self.data_source(),
-                    content=content_with_metadata.get("content"),
-                    metadata={
-                        "path": file,
-                        "repo": self.repo,
-                        "branch": self.branch,
-                        "source": content_with_metadata.get("html_url"),
-                        "sha": content_with_metadata.get("sha"),
-                    },
-                )
+        blobs = {blob.get("path"): blob async for blob in self.get_blobs()}
+
+        if self.use_archive and len(blobs) >= self.archive_min_files:
+            logger.info(
+                "loading files from the tarball",
+                repo=self.repo,
+                branch=self.branch,
+                num_files=len(blobs),
+            )
+            async for doc in self.load_from_archive(blobs):
+                yield doc
+            return
 
-        tasks = [
-            asyncio.create_task(process_file(file)) async for file in self.get_files()
+        async for doc in self.load_from_contents(list(blobs.keys())):
+            yield doc
+
+    async def load_from_contents(
+        self, files: List[str]
+    ) -> AsyncGenerator[Document, None]:
+        """
+        Fetch the files with `concurrency` workers. Fetched documents are handed
+        over through a queue of at most `max_inflight_docs`, so the workers stop
+        fetching until the consumer catches up.
+        """
+        pending: asyncio.Queue[str] = asyncio.Queue()
+        for file in files:
+            pending.put_nowait(file)
+        docs: asyncio.Queue[Document | Exception | object] = asyncio.Queue(
+            maxsize=self.max_inflight_docs
+        )
+
+        async def worker():
+            try:
+                while not pending.empty():
+                    file = pending.get_nowait()
+                    content_with_metadata = await self.get_file_with_metadata(file)
+                    await docs.put(
+                        self._document(
+                            file,
+                            content_with_metadata.get("content"),
+                            content_with_metadata.get("html_url"),
+                            content_with_metadata.get("sha"),
+                        )
+                    )
+            except Exception as e:
+                await docs.put(e)
+                return
+            await docs.put(_WORKER_DONE)
+
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(self.concurrency, len(files)))
         ]
+        try:
+            running = len(workers)
+            while running > 0:
+                item = await docs.get()
+                if item is _WORKER_DONE:
+                    running -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def load_from_archive(
+        self, blobs: Dict[str, Dict[str, str]]
+    ) -> AsyncGenerator[Document, None]:
+        """
+        Download the branch tarball in one request and read the matched files
+        straight out of the tar stream as it is downloaded, without buffering
+        the tarball or extracting it to disk.
+
+        The tarball is decompressed and read in a thread, handing the documents
+        over through a queue of at most `max_inflight_docs`.
+        """
+        # https://docs.github.com/en/rest/repos/contents?apiVersion=2022-11-28#download-a-repository-archive-tar
+        url = f"{self.github_api_url}/repos/{self.repo}/tarball/{self.branch}"
+
+        loop = asyncio.get_running_loop()
+        stream = _ArchiveStream()
+        docs: asyncio.Queue[tuple | Exception | object] = asyncio.Queue(
+            maxsize=self.max_inflight_docs
+        )
 
-        # Process completed tasks
-        for task in asyncio.as_completed(tasks):
-            yield await task
+        def emit(item):
+            future = asyncio.run_coroutine_threadsafe(docs.put(item), loop)
+            while True:
+                try:
+                    return future.result(timeout=0.1)
+                except TimeoutError:
+                    if stream.closed:
+                        future.cancel()
+                        raise _ArchiveClosed()
+
+        def read_archive():
+            try:
+                with tarfile.open(fileobj=stream, mode="r|gz") as tar:
+                    for member in tar:
+                        if not member.isfile():
+                            continue
+                        # strip the leading owner-repo-sha/ directory
+                        _, _, file = member.name.partition("/")
+                        blob = blobs.get(file)
+                        if blob is None:
+                            continue
+
+                        try:
+                            content = tar.extractfile(member).read().decode("utf-8")
+                        except UnicodeDecodeError:
+                            logger.warning(
+                                "skipping non utf-8 file", repo=self.repo, path=file
+                            )
+                            continue
+                        emit((file, content, blob.get("sha")))
+            except _ArchiveClosed:
+                return
+            except Exception as e:
+                emit(e)
+                return
+            emit(_WORKER_DONE)
+
+        async def download():
+            try:
+                async with self.http_client.stream(
+                    "GET", url, headers=self.headers, follow_redirects=True
+                ) as response:
+                    response.raise_for_status()
+                    async for data in response.aiter_bytes():
+                        await stream.feed(data)
+                await stream.feed(None)
+            except Exception as e:
+                await stream.feed(e)
+
+        downloader = asyncio.create_task(download())
+        reader = asyncio.create_task(asyncio.to_thread(read_archive))
+        try:
+            while True:
+                item = await docs.get()
+                if item is _WORKER_DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                file, content, sha = item
+                yield self._document(
+                    file,
+                    content,
+                    f"{self.html_base_url}/{self.repo}/blob/{self.branch}/{file}",
+                    sha,
+                )
+        finally:
+            stream.close()
+            downloader.cancel()
+            await asyncio.gather(downloader, reader, return_exceptions=True)
 
     def data_source(self) -> str:
         return self.repo
@@ -1,27 +1,39 @@
 from opsmate.knowledgestore.models import aconn, Category
 from opsmate.ingestions.base import Document
-from opsmate.ingestions.chunk import chunk_document
+from opsmate.ingestions.chunk import split_documents
 from opsmate.ingestions.fs import FsIngestion
 from opsmate.ingestions.github import GithubIngestion
 from opsmate.ingestions.models import IngestionRecord, DocumentRecord
+from opsmate.ingestions.blobs import BlobStore
+from opsmate.textsplitters.base import Chunk
 from opsmate.config import config
-from opsmate.dbq.dbq import enqueue_task, dbq_task
+from opsmate.dbq.dbq import enqueue_task, dbq_task, Task, TaskItem, TaskStatus
 from opsmate.dino import dino
-from opsmate.textsplitters import splitter_from_config
-from typing import Dict, Any, List
+from opsmate.dino.limiter import Priority
+from typing import Dict, Any, List, Set
 from datetime import datetime, UTC, timedelta
+from hashlib import sha256
+from pathlib import Path
 import asyncio
 import uuid
 import json
 import random
 import structlog
+from sqlmodel import Session
 
 logger = structlog.get_logger()
 
+# the maximum number of paths deleted by a single predicate
+DELETE_BATCH_SIZE = 1000
+# the maximum number of documents chunked by a single task
+CHUNK_BATCH_SIZE = 16
+
 
 @dino(
     model="gpt-4o-mini",
     response_model=List[Category],
+    cache=True,
+    priority=Priority.BATCH,
 )
 async def categorize(text: str) -> str:
     f"""
@@ -43,17 +55,55 @@ def backoff_func(retry_count: int):
     )
 
 
+class ChunkAndStoreTask(Task):
+    """
+    ChunkAndStoreTask removes the document blobs referenced by the task
+    once the task has either completed or permanently failed.
+    """
+
+    async def on_success(self, task_item: TaskItem, ctx: Dict[str, Any] = {}):
+        self._delete_doc_blobs(task_item)
+
+    async def on_failure(
+        self, task_item: TaskItem, error: Exception, ctx: Dict[str, Any] = {}
+    ):
+        if task_item.status == TaskStatus.FAILED:
+            self._delete_doc_blobs(task_item)
+
+    def _delete_doc_blobs(self, task_item: TaskItem):
+        blob_store = BlobStore()
+        for doc_ref in _doc_refs(
+            task_item.kwargs.get("doc_ref", ""), task_item.kwargs.get("doc_refs", [])
+        ):
+            blob_store.delete(doc_ref)
+
+
+def _doc_refs(doc_ref: str, doc_refs: List[str]) -> List[str]:
+    return [ref for ref in [doc_ref, *doc_refs] if ref]
+
+
 @dbq_task(
     retry_on=(Exception,),
     max_retries=10,
     back_off_func=backoff_func,
+    task_type=ChunkAndStoreTask,
 )
 async def chunk_and_store(
     ingestion_record_id: int,
     splitter_config: Dict[str, Any] = {},
     doc: Dict[str, Any] = {},
+    doc_ref: str = "",
+    doc_refs: List[str] = [],
     ctx: Dict[str, Any] = {},
 ):
+    """
+    Chunk the documents and store the chunks in the knowledge store.
+
+    A document is either passed inline via `doc`, or by reference via `doc_ref`,
+    which points at the serialised document in the blob store. A batch of documents
+    is passed by reference via `doc_refs`, and split together across
+    `splitter_workers` processes.
+    """
     session = ctx["session"]
 
     ingestion_record = await IngestionRecord.find_by_id(session, ingestion_record_id)
@@ -64,9 +114,55 @@ async def chunk_and_store(
         )
         return
 
-    doc = Document(**doc)
-    path = doc.metadata["path"]
+    refs = _doc_refs(doc_ref, doc_refs)
+    if refs:
+        docs = []
+        blob_store = BlobStore()
+        for ref in refs:
+            data = blob_store.get(ref)
+            if data is None:
+                # identical documents share the same blob, which is removed by
+                # whichever task completes first
+                logger.warning(
+                    "document blob not found, skipping",
+                    ingestion_record_id=ingestion_record_id,
+                    doc_ref=ref,
+                )
+                continue
+            docs.append(Document.model_validate_json(data))
+    else:
+        docs = [Document(**doc)]
+
+    pending = []
+    for doc in docs:
+        doc_record = await _pending_document_record(
+            session, ingestion_record, doc, splitter_config
+        )
+        if doc_record is not None:
+            pending.append((doc, doc_record))
+    if not pending:
+        return
+
+    chunks_per_document = await split_documents(
+        [doc for doc, _ in pending], splitter_config, workers=config.splitter_workers
+    )
 
+    db_conn = await aconn()
+    table = await db_conn.open_table("knowledge_store")
+    for (doc, doc_record), chunks in zip(pending, chunks_per_document):
+        await _store_chunks(session, table, doc, doc_record, chunks)
+
+
+async def _pending_document_record(
+    session: Session,
+    ingestion_record: IngestionRecord,
+    doc: Document,
+    splitter_config: Dict[str, Any],
+) -> DocumentRecord | None:
+    """
+    Return the record of the document to chunk, None if it is already chunked.
+    """
+    path = doc.metadata["path"]
     doc_record = await DocumentRecord.find_by_ingestion_id_and_path(
         session, ingestion_record.id, path
     )
@@ -80,22 +176,30 @@ async def chunk_and_store(
                 ingestion_record_id=ingestion_record.id,
                 path=path,
             )
-            return
-    else:
-        doc_record = await DocumentRecord.find_or_create(
-            session,
-            ingestion_record.id,
-            path,
-            doc.metadata.get("sha", ""),
-            splitter_config,
-        )
+            return None
+        return doc_record
 
-    splitter = splitter_from_config(splitter_config)
-    db_conn = await aconn()
-    table = await db_conn.open_table("knowledge_store")
+    return await DocumentRecord.find_or_create(
+        session,
+        ingestion_record.id,
+        path,
+        doc.metadata.get("sha", ""),
+        splitter_config,
+    )
+
+
+async def _store_chunks(
+    session: Session,
+    table: Any,
+    doc: Document,
+    doc_record: DocumentRecord,
+    chunks: List[Chunk],
+):
+    path = doc.metadata["path"]
+    logger.info("document chunked", path=path, num_chunks=len(chunks))
 
     kbs = []
-    async for chunk in chunk_document(splitter=splitter, document=doc):
+    for chunk in chunks:
         kbs.append(
             {
                 "uuid": str(uuid.uuid4()),
@@ -159,7 +263,14 @@ async def ingest(
         session, ingestor_type, ingestor_config
     )
 
+    if isinstance(ingestion, FsIngestion):
+        await with_scan_manifest(session, ingestion, ingestion_record, splitter_config)
+
+    blob_store = BlobStore()
+    seen_paths = set()
+    doc_refs = []
     async for doc in ingestion.load():
+        seen_paths.add(doc.metadata["path"])
         logger.info(
             "ingesting document",
             ingestor_type=ingestor_type,
@@ -167,12 +278,80 @@ async def ingest(
             splitter_config=splitter_config,
             doc_path=doc.metadata["path"],
         )
+        doc_refs.append(blob_store.put(doc.model_dump_json().encode("utf-8")))
+        # the documents are chunked in batches, split across the splitter workers
+        if len(doc_refs) >= CHUNK_BATCH_SIZE:
+            enqueue_task(
+                session,
+                chunk_and_store,
+                ingestion_record.id,
+                splitter_config=splitter_config,
+                doc_refs=doc_refs,
+            )
+            doc_refs = []
+    if doc_refs:
         enqueue_task(
             session,
             chunk_and_store,
             ingestion_record.id,
             splitter_config=splitter_config,
-            doc=doc.model_dump(),
+            doc_refs=doc_refs,
+        )
+
+    seen_paths |= ingestion.skipped_paths()
+    await remove_orphan_documents(session, ingestion_record, seen_paths)
+
+
+async def remove_orphan_documents(
+    session: Session, ingestion_record: IngestionRecord, seen_paths: Set[str]
+):
+    """
+    Remove the chunks and the document records of the documents that are no longer
+    present in the source.
+    """
+    if not seen_paths:
+        # most likely the source is unavailable rather than empty
+        logger.warning(
+            "no documents seen, skipping orphan cleanup",
+            ingestion_record_id=ingestion_record.id,
+        )
+        return
+
+    orphan_paths = [
+        doc_record.path
+        for doc_record in await DocumentRecord.find_all_by_ingestion_id(
+            session, ingestion_record.id
+        )
+        if doc_record.path not in seen_paths
+    ]
+    if not orphan_paths:
+        return
+
+    logger.info(
+        "removing orphan documents",
+        ingestion_record_id=ingestion_record.id,
+        num_orphans=len(orphan_paths),
+    )
+    await delete_chunks(ingestion_record, orphan_paths)
+    for i in range(0, len(orphan_paths), DELETE_BATCH_SIZE):
+        await DocumentRecord.delete_by_ingestion_id_and_paths(
+            session, ingestion_record.id, orphan_paths[i : i + DELETE_BATCH_SIZE]
+        )
+
+
+async def delete_chunks(ingestion_record: IngestionRecord, paths: List[str]):
+    """
+    Delete the chunks of the given paths from the knowledge store,
+    with one predicate per batch of paths.
+    """
+    db_conn = await aconn()
+    table = await db_conn.open_table("knowledge_store")
+    for i in range(0, len(paths), DELETE_BATCH_SIZE):
+        batch = paths[i : i + DELETE_BATCH_SIZE]
+        await table.delete(
+            f"data_source_provider = {sql_quote(ingestion_record.data_source_provider)} "
+            f"AND data_source = {sql_quote(knowledge_data_source(ingestion_record))} "
+            f"AND path IN ({', '.join(sql_quote(path) for path in batch)})"
         )
 
 
@@ -204,6 +383,87 @@ async def delete_ingestion(ingestion_record_id: int, ctx: Dict[str, Any] = {}):
     )
 
 
+async def with_scan_manifest(
+    session: Session,
+    ingestion: FsIngestion,
+    ingestion_record: IngestionRecord,
+    splitter_config: Dict[str, Any],
+):
+    """
+    Set up the fs ingestion to skip the files that are unchanged since the last scan
+    and already chunked with the same splitter config.
+    """
+    key = json.dumps(
+        [ingestion.local_path, ingestion.glob_pattern, splitter_config],
+        sort_keys=True,
+    )
+    ingestion.manifest_path = str(
+        Path(config.ingestion_manifests_path)
+        / f"fs-{sha256(key.encode('utf-8')).hexdigest()}.json"
+    )
+    ingestion.indexed = {
+        doc_record.path: doc_record.sha
+        for doc_record in await DocumentRecord.find_all_by_ingestion_id(
+            session, ingestion_record.id
+        )
+        if doc_record.chunk_config == splitter_config
+    }
+
+
+@dbq_task(
+    retry_on=(Exception,),
+    max_retries=10,
+    back_off_func=backoff_func,
+)
+async def delete_document(
+    ingestion_record_id: int, path: str, ctx: Dict[str, Any] = {}
+):
+    """
+    Remove the chunks and the document record of a document deleted from the source.
+    """
+    session = ctx["session"]
+
+    ingestion_record = await IngestionRecord.find_by_id(session, ingestion_record_id)
+    if ingestion_record is None:
+        logger.error(
+            "ingestion record not found",
+            ingestion_record_id=ingestion_record_id,
+        )
+        return
+
+    await delete_chunks(ingestion_record, [path])
+
+    doc_record = await DocumentRecord.find_by_ingestion_id_and_path(
+        session, ingestion_record.id, path
+    )
+    if doc_record is not None:
+        session.delete(doc_record)
+        session.commit()
+
+    logger.info(
+        "document deleted",
+        ingestion_record_id=ingestion_record.id,
+        path=path,
+    )
+
+
+def sql_quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def knowledge_data_source(ingestion_record: IngestionRecord) -> str:
+    """
+    The data source the chunks of the ingestion are stored under in the knowledge store.
+    """
+    # fs ingestions store the chunks under the path joined with the glob pattern
+    if ingestion_record.data_source_provider == "fs":
+        return FsIngestion(
+            local_path=ingestion_record.data_source,
+            glob_pattern=ingestion_record.glob,
+        ).data_source()
+    return ingestion_record.data_source
+
+
 def ingestor_from_config(name: str, config: Dict[str, Any]):
     if name == "github":
         return GithubIngestion(**config)
@@ -6,6 +6,8 @@ from sqlmodel import (
     Relationship,
     JSON,
     Column,
+    col,
+    delete,
 )
 from sqlalchemy.orm import registry
 from datetime import datetime, UTC
@@ -119,6 +121,10 @@ class DocumentRecord(SQLModel, table=True):
             select(cls).where(cls.ingestion_id == ingestion_id, cls.path == path)
         ).first()
 
+    @classmethod
+    async def find_all_by_ingestion_id(cls, session: Session, ingestion_id: int):
+        return session.exec(select(cls).where(cls.ingestion_id == ingestion_id)).all()
+
     @classmethod
     async def find_or_create(
         cls,
@@ -147,6 +153,17 @@ class DocumentRecord(SQLModel, table=True):
         session.refresh(document)
         return document
 
+    @classmethod
+    async def delete_by_ingestion_id_and_paths(
+        cls, session: Session, ingestion_id: int, paths: List[str]
+    ):
+        session.exec(
+            delete(cls).where(
+                cls.ingestion_id == ingestion_id, col(cls.path).in_(paths)
+            )
+        )
+        session.commit()
+
     def update_chunk_count(self, session: Session, chunk_count: int):
         self.chunk_count = chunk_count
         self.updated_at = datetime.now(UTC)
@@ -0,0 +1,145 @@
+from typing import AsyncGenerator, Dict, Set, Tuple, Any
+from opsmate.ingestions.fs import FsIngestion, FileStat
+from opsmate.ingestions.models import IngestionRecord
+from opsmate.ingestions.blobs import BlobStore
+from opsmate.ingestions.jobs import (
+    CHUNK_BATCH_SIZE,
+    chunk_and_store,
+    delete_document,
+)
+from opsmate.dbq.dbq import enqueue_task
+from sqlmodel import Session
+from os import path
+import asyncio
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+Changes = Tuple[Set[str], Set[str]]
+
+
+async def watch_fs(
+    ingestion: FsIngestion,
+    debounce_ms: int = 1600,
+    poll_interval: float = 1.0,
+    force_polling: bool = False,
+) -> AsyncGenerator[Changes, None]:
+    """
+    Watch the local path of the fs ingestion and yield the (changed, deleted) file paths
+    matched by its glob pattern. Bursts of changes are debounced into a single batch.
+
+    inotify (via watchfiles) is used when available, falling back to polling otherwise.
+    """
+    if not force_polling:
+        try:
+            async for changes in _watch_inotify(ingestion, debounce_ms):
+                yield changes
+            return
+        except (ImportError, OSError, RuntimeError) as e:
+            logger.warning(
+                "failed to watch with inotify, falling back to polling",
+                local_path=ingestion.local_path,
+                error=str(e),
+            )
+
+    async for changes in _watch_polling(ingestion, poll_interval):
+        yield changes
+
+
+async def _watch_inotify(
+    ingestion: FsIngestion, debounce_ms: int
+) -> AsyncGenerator[Changes, None]:
+    from watchfiles import awatch
+
+    async for batch in awatch(
+        ingestion.local_path,
+        watch_filter=lambda _, file_path: ingestion.matches(file_path),
+        debounce=debounce_ms,
+    ):
+        changed, deleted = set(), set()
+        for _, file_path in batch:
+            # the state on disk wins over the event type, e.g. a file deleted
+            # and recreated in the same batch has changed
+            file_path = path.abspath(file_path)
+            if path.isfile(file_path):
+                changed.add(file_path)
+            elif not path.exists(file_path):
+                deleted.add(file_path)
+        if changed or deleted:
+            yield changed, deleted
+
+
+async def _watch_polling(
+    ingestion: FsIngestion, poll_interval: float
+) -> AsyncGenerator[Changes, None]:
+    def snapshot() -> Dict[str, FileStat]:
+        return {path.abspath(f.path): f for f in ingestion.scan()}
+
+    previous = await asyncio.to_thread(snapshot)
+    changed, deleted = set(), set()
+    while True:
+        await asyncio.sleep(poll_interval)
+        current = await asyncio.to_thread(snapshot)
+
+        new_changed = {
+            file_path
+            for file_path, stat in current.items()
+            if file_path not in previous or previous[file_path] != stat
+        }
+        new_deleted = previous.keys() - current.keys()
+        previous = current
+
+        if new_changed or new_deleted:
+            # keep accumulating until the burst settles
+            changed = (changed - new_deleted) | new_changed
+            deleted = (deleted - new_changed) | new_deleted
+            continue
+
+        if changed or deleted:
+            yield changed, deleted
+            changed, deleted = set(), set()
+
+
+async def watch_and_ingest(
+    session: Session,
+    ingestor_config: Dict[str, Any],
+    splitter_config: Dict[str, Any] = {},
+    force_polling: bool = False,
+):
+    """
+    Keep watching the fs source and enqueue chunk_and_store for the batches of the changed files,
+    and delete_document for the deleted ones.
+    """
+    ingestion = FsIngestion(**ingestor_config)
+    ingestion_record = await IngestionRecord.find_or_create(
+        session, "fs", ingestor_config
+    )
+    blob_store = BlobStore()
+
+    logger.info("watching for changes", ingestor_config=ingestor_config)
+    async for changed, deleted in watch_fs(ingestion, force_polling=force_polling):
+        logger.info(
+            "files changed",
+            ingestor_config=ingestor_config,
+            changed=len(changed),
+            deleted=len(deleted),
+        )
+        doc_refs = [
+            blob_store.put(doc.model_dump_json().encode("utf-8"))
+            async for doc in ingestion.load_files(sorted(changed))
+        ]
+        for i in range(0, len(doc_refs), CHUNK_BATCH_SIZE):
+            enqueue_task(
+                session,
+                chunk_and_store,
+                ingestion_record.id,
+                splitter_config=splitter_config,
+                doc_refs=doc_refs[i : i + CHUNK_BATCH_SIZE],
+            )
+        for file_path in sorted(deleted):
+            enqueue_task(
+                session,
+                delete_document,
+                ingestion_record.id,
+                path=file_path,
+            )
@@ -46,6 +46,7 @@ Tool usage:
     tool_calls_per_action=1,
     max_iter=20,
     iterable=True,
+    stream=True,
 )
 async def iac_sme(instruction: str, chat_history: List[Message] = []):
     """
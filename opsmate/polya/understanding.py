@@ -80,6 +80,7 @@ async def initial_understanding(
 @dino(
     "claude-3-5-sonnet-20241022",
     response_model=InitialUnderstandingResponse,
+    cache=True,
 )
 async def load_inital_understanding(text: str):
     """
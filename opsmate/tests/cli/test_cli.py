@@ -213,3 +213,44 @@ class TestSolveCommandIntegration:
         )
 
         assert result.exit_code == 0
+
+
+class TestUsageCommand:
+    def test_usage(self, cli_runner, tmp_path):
+        """Test that the usage command reports the recorded usage"""
+        from opsmate.dino.usage import UsageRecord, UsageRegistry
+
+        path = str(tmp_path / "usage.jsonl")
+        registry = UsageRegistry(path=path)
+        for context in ["cli", "k8s"]:
+            registry.record(
+                UsageRecord(
+                    timestamp=0,
+                    function="react_prompt",
+                    provider="openai",
+                    model="gpt-4o",
+                    context=context,
+                    ttft=0.5,
+                    latency=1.0,
+                    prompt_tokens=2000,
+                    cached_tokens=1000,
+                )
+            )
+
+        result = cli_runner.invoke(
+            opsmate_cli, ["usage", "--path", path, "--by", "model"]
+        )
+
+        assert result.exit_code == 0
+        assert "gpt-4o" in result.output
+        assert "4000" in result.output
+        assert "2000 (50%)" in result.output
+
+    def test_usage_not_recorded(self, cli_runner, tmp_path):
+        """Test that the usage command fails without any usage recorded"""
+        result = cli_runner.invoke(
+            opsmate_cli, ["usage", "--path", str(tmp_path / "usage.jsonl")]
+        )
+
+        assert result.exit_code == 1
+        assert "No usage recorded" in result.output
@@ -0,0 +1,213 @@
+import asyncio
+import pytest
+import time
+from unittest.mock import AsyncMock, patch
+from pydantic import BaseModel
+from typing import Union
+from opsmate.dino import dino
+from opsmate.dino.cache import (
+    ResponseCache,
+    SingleFlight,
+    dump_response,
+    load_response,
+)
+from opsmate.dino.provider.openai import OpenAIProvider
+
+
+class UserInfo(BaseModel):
+    name: str
+    email: str
+
+
+class NotFound(BaseModel):
+    reason: str
+
+
+def test_response_cache_lru():
+    cache = ResponseCache(maxsize=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+
+    # b is the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_response_cache_ttl(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr("opsmate.dino.cache.time.time", lambda: now)
+    cache = ResponseCache(ttl=10)
+    cache.set("a", "1")
+    assert cache.get("a") == "1"
+
+    now += 11
+    assert cache.get("a") is None
+
+
+def test_response_cache_disk(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache" / "dino.db")
+    ResponseCache(path=path, ttl=10).set("a", "1")
+    assert ResponseCache(path=path).get("a") == "1"
+
+    now = time.time() + 11
+    monkeypatch.setattr("opsmate.dino.cache.time.time", lambda: now)
+    assert ResponseCache(path=path).get("a") is None
+
+
+def test_dump_and_load_response():
+    response = [NotFound(reason="no user"), UserInfo(name="a", email="b")]
+    loaded = load_response(dump_response(response), list[Union[UserInfo, NotFound]])
+    assert loaded == response
+    assert loaded[0] is not response[0]
+    assert load_response(dump_response("text"), str) == "text"
+
+
+@pytest.mark.asyncio
+async def test_dino_cache():
+    chat_completion = AsyncMock(
+        side_effect=lambda **kwargs: UserInfo(name="John", email="john@example.com")
+    )
+
+    @dino("gpt-4o-mini", response_model=UserInfo, cache=ResponseCache())
+    async def get_user_info(text: str):
+        return f"extract the user info: {text}"
+
+    with patch.object(OpenAIProvider, "chat_completion", chat_completion):
+        first = await get_user_info("John, john@example.com")
+        second = await get_user_info("John, john@example.com")
+        assert chat_completion.await_count == 1
+        assert first == second
+        assert first is not second
+
+        await get_user_info("Jane, jane@example.com")
+        assert chat_completion.await_count == 2
+
+        # the model is part of the key
+        await get_user_info("John, john@example.com", model="gpt-4o")
+        assert chat_completion.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_dino_without_cache():
+    chat_completion = AsyncMock(
+        side_effect=lambda **kwargs: UserInfo(name="John", email="john@example.com")
+    )
+
+    @dino("gpt-4o-mini", response_model=UserInfo)
+    async def get_user_info(text: str):
+        return f"extract the user info: {text}"
+
+    with patch.object(OpenAIProvider, "chat_completion", chat_completion):
+        await get_user_info("John, john@example.com")
+        await get_user_info("John, john@example.com")
+        assert chat_completion.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"calls": calls}
+
+    results = await asyncio.gather(*[single_flight.do("a", fn) for _ in range(3)])
+    assert calls == 1
+    assert all(result == ({"calls": 1}, True) for result in results)
+    assert results[0][0] is not results[1][0]
+
+    # the flight is over, a new call is made
+    assert await single_flight.do("a", fn) == ({"calls": 2}, False)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_error():
+    single_flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        single_flight.do("a", fn), single_flight.do("a", fn), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_leader_cancelled():
+    single_flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    leader = asyncio.create_task(single_flight.do("a", fn))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(single_flight.do("a", fn))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == ("done", True)
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.asyncio
+async def test_dino_coalesce():
+    async def chat_completion(**kwargs):
+        await asyncio.sleep(0.01)
+        return UserInfo(name="John", email="john@example.com")
+
+    chat_completion = AsyncMock(side_effect=chat_completion)
+
+    @dino("gpt-4o-mini", response_model=UserInfo, coalesce=True)
+    async def get_user_info(text: str):
+        return f"extract the user info: {text}"
+
+    with patch.object(OpenAIProvider, "chat_completion", chat_completion):
+        results = await asyncio.gather(
+            *[get_user_info("John, john@example.com") for _ in range(3)]
+        )
+        assert chat_completion.await_count == 1
+        assert results[0] == results[1] == results[2]
+        assert results[0] is not results[1]
+
+        # not cached, so the next call goes to the provider
+        await get_user_info("John, john@example.com")
+        assert chat_completion.await_count == 2
+
+
+def test_single_flight_event_loops(monkeypatch):
+    single_flight = SingleFlight()
+    # the loops share an id, as a new loop can once the old one is gone
+    monkeypatch.setattr("opsmate.dino.cache.id", lambda _: 0, raising=False)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def fn():
+        return "done"
+
+    loop = asyncio.new_event_loop()
+    leader = loop.create_task(single_flight.do("a", hang))
+    loop.run_until_complete(asyncio.sleep(0.01))
+
+    # the flight in flight on one loop is not shared with the calls on the others
+    assert asyncio.run(asyncio.wait_for(single_flight.do("a", fn), 1)) == (
+        "done",
+        False,
+    )
+
+    for task in asyncio.all_tasks(loop):
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(leader, return_exceptions=True))
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+    assert all(not flights for flights in single_flight._flights.values())
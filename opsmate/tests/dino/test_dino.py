@@ -5,6 +5,9 @@ from typing import Literal, Iterable, Any, List
 from openai import AsyncOpenAI
 import instructor
 from opsmate.dino.types import ResponseWithToolOutputs, Message, ToolCall
+from opsmate.dino.provider import Provider
+from opsmate.dino.provider.openai import OpenAIProvider
+from unittest.mock import AsyncMock, patch
 import os
 
 MODELS = ["gpt-4o-mini", "claude-3-5-sonnet-20241022"]
@@ -239,6 +242,35 @@ async def test_dino_after_hook_must_have_response_param():
         await get_weather_info("San Francisco")
 
 
+@pytest.mark.asyncio
+async def test_dino_after_hook_validated_before_the_call():
+    class UserInfo(BaseModel):
+        name: str
+
+    def after_hook(text: str):
+        return None
+
+    @dino("gpt-4o-mini", response_model=UserInfo, after_hook=after_hook)
+    async def get_user_info(text: str):
+        return f"extract the user info: {text}"
+
+    chat_completion = AsyncMock(return_value=UserInfo(name="John"))
+    with patch.object(OpenAIProvider, "chat_completion", chat_completion):
+        with pytest.raises(ValueError, match="`response`"):
+            await get_user_info("John")
+    chat_completion.assert_not_called()
+
+
+def test_provider_from_model_memoized():
+    Provider._model_providers.clear()
+    with patch.object(OpenAIProvider, "models", ["gpt-4o-mini"]):
+        assert Provider.from_model("gpt-4o-mini") is OpenAIProvider
+        with patch.object(OpenAIProvider, "models", []):
+            # served without listing the models again
+            assert Provider.from_model("gpt-4o-mini") is OpenAIProvider
+    Provider._model_providers.clear()
+
+
 @pytest.mark.asyncio
 async def test_swap_model():
     brand = Literal["OpenAI", "Anthropic"]
@@ -0,0 +1,86 @@
+import pytest
+import re
+import yaml
+from opsmate.dino.history import ReactHistory
+from opsmate.dino.types import Message, React
+
+
+def add_iteration(history: ReactHistory, idx: int, output: str):
+    history.add_react(React(thoughts=f"thought {idx}", action=f"action {idx}"))
+    history.add_observation(
+        {"observation": f"observation {idx}", "tool_outputs": [output]}
+    )
+
+
+def test_react_history_within_budget():
+    history = ReactHistory(prefix=[Message.system("context")], max_tokens=10000)
+    add_iteration(history, 0, "x" * 1000)
+
+    messages = history.messages()
+    assert [m.content for m in messages[:2]] == [
+        "context",
+        React(thoughts="thought 0", action="action 0").model_dump_json(),
+    ]
+    assert yaml.safe_load(messages[2].content)["tool_outputs"] == ["x" * 1000]
+
+
+def test_react_history_compaction():
+    history = ReactHistory(
+        prefix=[Message.system("context")], max_tokens=1500, keep_recent=1
+    )
+    for idx in range(3):
+        add_iteration(history, idx, f"{idx}" * 2000)
+
+    messages = history.messages()
+    assert history.tokens() <= 1500
+    assert messages[0].content == "context"
+    assert len(messages) == 7
+
+    # the older observations are kept, but their tool outputs are spilled over
+    for idx in range(2):
+        observation = yaml.safe_load(messages[2 + idx * 2].content)
+        assert observation["observation"] == f"observation {idx}"
+        [elided] = observation["tool_outputs"]
+        path = re.search(r"see (\S+) for the full output", elided).group(1)
+        with open(path) as f:
+            assert f.read() == f"{idx}" * 2000
+
+    # the most recent one is verbatim
+    assert yaml.safe_load(messages[6].content)["tool_outputs"] == ["2" * 2000]
+
+
+def test_react_history_elision():
+    history = ReactHistory(max_tokens=300, keep_recent=1)
+    for idx in range(5):
+        add_iteration(history, idx, "x" * 600)
+
+    messages = history.messages()
+    assert history.tokens() <= 300
+    assert messages[0].content.startswith("<elided-history>")
+    assert "- action 0" in messages[0].content
+    assert messages[-2].content == (
+        React(thoughts="thought 4", action="action 4").model_dump_json()
+    )
+
+
+def test_react_history_stable_prefix():
+    history = ReactHistory(max_tokens=1500, keep_recent=1)
+    add_iteration(history, 0, "x" * 2000)
+    before = history.messages()
+
+    # below the budget the earlier messages are left as they are
+    history.add_react(React(thoughts="thought 1", action="action 1"))
+    assert history.messages()[: len(before)] == before
+
+
+def test_react_history_unbounded():
+    history = ReactHistory(max_tokens=None)
+    for idx in range(3):
+        add_iteration(history, idx, "x" * 100000)
+    assert all("<elided>" not in m.content for m in history.messages())
+
+
+def test_react_history_observation_without_react():
+    history = ReactHistory()
+    with pytest.raises(ValueError):
+        history.add_observation({"observation": "observation"})
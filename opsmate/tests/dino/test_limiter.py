@@ -0,0 +1,218 @@
+import asyncio
+import gc
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+from pydantic import BaseModel
+from opsmate.dino import dino
+from opsmate.dino.limiter import (
+    Priority,
+    RateLimit,
+    RateLimiter,
+    TokenBucket,
+    _parse_seconds,
+    record_rate_limits,
+    use_priority,
+)
+from opsmate.dino.provider.openai import OpenAIProvider
+
+
+class UserInfo(BaseModel):
+    name: str
+    email: str
+
+
+def test_token_bucket():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    assert bucket.delay(60, now) == 0
+    bucket.consume(60, now)
+    # refills one per second
+    assert bucket.delay(1, now) == pytest.approx(1)
+    assert bucket.delay(1, now + 1) == 0
+
+    unlimited = TokenBucket(None)
+    unlimited.consume(1000, 0)
+    assert unlimited.delay(1000, 0) == 0
+
+
+def test_token_bucket_update():
+    bucket = TokenBucket(None)
+    now = bucket.updated
+    bucket.update(limit=100, remaining=0, reset=10, now=now)
+    assert bucket.rate == 100
+    assert bucket.delay(1, now + 5) == pytest.approx(5)
+
+
+def test_parse_seconds():
+    assert _parse_seconds("1.5") == 1.5
+    assert _parse_seconds("6m0s") == 360
+    assert _parse_seconds("20ms") == pytest.approx(0.02)
+    assert _parse_seconds("1h2m3s") == 3723
+    assert _parse_seconds("2000-01-01T00:00:00Z") == 0
+    assert _parse_seconds("soon") is None
+    assert _parse_seconds(None) is None
+
+
+def test_rate_limiter_limit():
+    limiter = RateLimiter(
+        limits={
+            "openai/gpt-4o": {"rpm": 1},
+            "gpt-4o-mini": {"rpm": 2},
+            "anthropic": {"rpm": 3},
+        },
+        default=RateLimit(rpm=4),
+    )
+    assert limiter.limit("openai", "gpt-4o").rpm == 1
+    assert limiter.limit("openai", "gpt-4o-mini").rpm == 2
+    assert limiter.limit("anthropic", "claude-3-5-sonnet-20241022").rpm == 3
+    assert limiter.limit("xai", "grok-3-beta").rpm == 4
+
+
+def test_rate_limiter_limit_max_concurrency():
+    limiter = RateLimiter(
+        limits={
+            "openai/gpt-4o": {"rpm": 500},
+            "anthropic": {"max_concurrency": 4},
+            "xai": {"rpm": 10, "max_concurrency": None},
+        },
+        default=RateLimit(max_concurrency=32),
+    )
+    # the configured limits keep the default concurrency unless they set their own
+    assert limiter.limit("openai", "gpt-4o").max_concurrency == 32
+    assert limiter.limit("openai", "gpt-4o").rpm == 500
+    assert limiter.limit("anthropic", "claude-3-5-sonnet-20241022").max_concurrency == 4
+    assert limiter.limit("xai", "grok-3-beta").max_concurrency is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_concurrency():
+    limiter = RateLimiter(default=RateLimit(max_concurrency=2))
+    running, max_running = 0, 0
+
+    async def call():
+        nonlocal running, max_running
+        async with limiter.acquire("openai", "gpt-4o"):
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[call() for _ in range(6)])
+    assert max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_priority():
+    limiter = RateLimiter(default=RateLimit(max_concurrency=1))
+    order = []
+
+    async def call(name: str, level: Priority):
+        with use_priority(level):
+            async with limiter.acquire("openai", "gpt-4o"):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+    first = asyncio.create_task(call("first", Priority.BATCH))
+    await asyncio.sleep(0)
+    await asyncio.gather(
+        first,
+        call("batch", Priority.BATCH),
+        call("interactive", Priority.INTERACTIVE),
+    )
+    assert order == ["first", "interactive", "batch"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_cancelled():
+    limiter = RateLimiter(default=RateLimit(max_concurrency=1))
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.acquire("openai", "gpt-4o"):
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    release.set()
+    await holder
+
+    # the cancelled waiter does not block the queue
+    await asyncio.wait_for(hold(), 1)
+
+
+def test_rate_limiter_event_loops():
+    limiter = RateLimiter(default=RateLimit(max_concurrency=1))
+
+    async def call():
+        async with limiter.acquire("openai", "gpt-4o"):
+            await asyncio.sleep(0)
+        return limiter._limiter("openai", "gpt-4o")
+
+    loop = asyncio.new_event_loop()
+    first = loop.run_until_complete(call())
+    # each loop has its own limiters
+    assert asyncio.run(call()) is not first
+
+    # the limiters go away with their loop
+    assert len(limiter._limiters) == 1
+    loop.close()
+    del loop, first
+    gc.collect()
+    assert len(limiter._limiters) == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_headers():
+    limiter = RateLimiter()
+    response = httpx.Response(
+        429,
+        headers={
+            "x-ratelimit-limit-requests": "100",
+            "x-ratelimit-remaining-requests": "50",
+            "x-ratelimit-reset-requests": "1s",
+            "retry-after": "0.05",
+        },
+    )
+    async with limiter.acquire("openai", "gpt-4o"):
+        await record_rate_limits(response)
+
+    model_limiter = limiter._limiter("openai", "gpt-4o")
+    assert model_limiter.requests.rate == 100
+    assert model_limiter.requests.level <= 50
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    async with limiter.acquire("openai", "gpt-4o"):
+        pass
+    assert loop.time() - start >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_dino_rate_limiter():
+    running, max_running = 0, 0
+
+    async def chat_completion(**kwargs):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return UserInfo(name="John", email="john@example.com")
+
+    @dino(
+        "gpt-4o-mini",
+        response_model=UserInfo,
+        rate_limiter=RateLimiter(default=RateLimit(max_concurrency=1)),
+    )
+    async def get_user_info(text: str):
+        return f"extract the user info: {text}"
+
+    with patch.object(
+        OpenAIProvider, "chat_completion", AsyncMock(side_effect=chat_completion)
+    ):
+        await asyncio.gather(*[get_user_info(f"user {i}") for i in range(3)])
+    assert max_running == 1
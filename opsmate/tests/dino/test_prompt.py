@@ -0,0 +1,142 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from pydantic import BaseModel
+from opsmate.dino.prompt import MAX_CACHE_BREAKPOINTS, assemble_prompt
+from opsmate.dino.provider.anthropic import AnthropicProvider
+from opsmate.dino.types import Message
+from opsmate.dino.usage import record_usage, track_usage, usage_from_response
+
+
+class Answer(BaseModel):
+    answer: str
+
+
+def test_assemble_prompt():
+    messages = [
+        Message.system("instructions"),
+        Message.user("question"),
+        Message.assistant("thought"),
+        Message.system("context"),
+        Message.user("observation"),
+    ]
+    assembled = assemble_prompt(messages)
+
+    assert [m.content for m in assembled] == [
+        "instructions",
+        "context",
+        "question",
+        "thought",
+        "observation",
+    ]
+    assert [m.cache_breakpoint for m in assembled] == [
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+    # the messages of the caller are left untouched
+    assert not any(m.cache_breakpoint for m in messages)
+
+
+def test_assemble_prompt_max_breakpoints():
+    messages = [Message.system("instructions")] + [
+        Message(role="user", content=f"message {i}", cache_breakpoint=True)
+        for i in range(6)
+    ]
+    assembled = assemble_prompt(messages)
+
+    breakpoints = [m.content for m in assembled if m.cache_breakpoint]
+    assert len(breakpoints) == MAX_CACHE_BREAKPOINTS
+    assert breakpoints == ["instructions", "message 3", "message 4", "message 5"]
+
+
+def test_cache_breakpoint_not_dumped():
+    message = Message(role="user", content="hello", cache_breakpoint=True)
+    assert message.model_dump() == {"role": "user", "content": "hello"}
+
+
+@pytest.mark.asyncio
+async def test_anthropic_cache_control():
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=Answer(answer="42"))
+
+    await AnthropicProvider.chat_completion(
+        response_model=Answer,
+        messages=assemble_prompt(
+            [
+                Message.system("instructions"),
+                Message.system("context"),
+                Message.user("question"),
+                Message.user("observation"),
+            ]
+        ),
+        client=client,
+        model="claude-3-5-sonnet-20241022",
+    )
+
+    kwargs = client.chat.completions.create.call_args.kwargs
+    assert kwargs["system"] == [
+        {"type": "text", "text": "instructions"},
+        {"type": "text", "text": "context", "cache_control": {"type": "ephemeral"}},
+    ]
+    assert kwargs["messages"] == [
+        {"role": "user", "content": "question"},
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": "observation",
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ],
+        },
+    ]
+
+
+def test_usage_from_response():
+    openai_usage = usage_from_response(
+        SimpleNamespace(
+            usage=SimpleNamespace(
+                prompt_tokens=2000,
+                completion_tokens=100,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=1536),
+            )
+        )
+    )
+    assert openai_usage.prompt_tokens == 2000
+    assert openai_usage.cached_tokens == 1536
+
+    anthropic_usage = usage_from_response(
+        SimpleNamespace(
+            usage=SimpleNamespace(
+                input_tokens=50,
+                output_tokens=100,
+                cache_read_input_tokens=1800,
+                cache_creation_input_tokens=150,
+            )
+        )
+    )
+    assert anthropic_usage.prompt_tokens == 2000
+    assert anthropic_usage.cached_tokens == 1800
+    assert anthropic_usage.cache_creation_tokens == 150
+
+    assert usage_from_response(Answer(answer="42")) is None
+
+
+def test_record_usage():
+    response = SimpleNamespace(
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+    )
+    # outside of a dino call the usage goes nowhere
+    record_usage(response)
+
+    with track_usage() as usage:
+        # e.g. retried
+        record_usage(response)
+        record_usage(response)
+
+    assert usage.prompt_tokens == 20
+    assert usage.attributes()["dino.usage.completion_tokens"] == 10
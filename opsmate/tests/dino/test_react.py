@@ -1,9 +1,22 @@
+import asyncio
 import pytest
-from typing import Literal, Any
+import re
+from collections.abc import Iterable
+from typing import Literal, Any, get_origin
+from unittest.mock import patch
+from pydantic import TypeAdapter
 from opsmate.dino import run_react, dtool, dino
 from opsmate.dino.react import react
 from opsmate.dino.context import context
-from opsmate.dino.types import React, ReactAnswer, Observation, ToolCall, Message
+from opsmate.dino.provider.openai import OpenAIProvider
+from opsmate.dino.types import (
+    React,
+    ParallelReact,
+    ReactAnswer,
+    Observation,
+    ToolCall,
+    Message,
+)
 
 
 MODELS = ["gpt-4o", "claude-3-5-sonnet-20241022"]
@@ -276,3 +289,103 @@ async def test_react_decorator_with_tool_call_context():
     )
     answer = await category_weather(answer.answer)
     assert answer == "cloudy"
+
+
+class Lookup(ToolCall[str]):
+    key: str
+
+    async def __call__(self):
+        return f"value of {self.key}"
+
+
+@pytest.mark.asyncio
+async def test_run_react_parallel_actions():
+    running, max_running = 0, 0
+
+    async def chat_completion(messages, response_model, stream=False, **kwargs):
+        if response_model.__name__.startswith("Union"):
+            if any("value of a" in m.content for m in messages):
+                return ReactAnswer(answer="done")
+            return ParallelReact(
+                thoughts="look up the keys",
+                action="look up a",
+                actions=["look up b", "look up c", "look up d"],
+            )
+
+        [action] = re.findall(
+            r"<action>\nlook up (\w)\n</action>", "\n".join(m.content for m in messages)
+        )
+        if get_origin(response_model) is Iterable:
+
+            async def parse():
+                nonlocal running, max_running
+                running += 1
+                max_running = max(max_running, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+                yield Lookup(key=action)
+
+            if stream:
+                return parse()
+            return [tool_call async for tool_call in parse()]
+        return Observation(observation=f"looked up {action}")
+
+    with patch.object(OpenAIProvider, "chat_completion", chat_completion):
+        outputs = [
+            output
+            async for output in run_react(
+                "what are the values of a, b and c?",
+                model="gpt-4o-mini",
+                tools=[Lookup],
+                tool_calls_per_action=3,
+                parallel_actions=True,
+            )
+        ]
+
+    react_result, observation, answer = outputs
+    assert isinstance(react_result, ParallelReact)
+    assert max_running == 3
+    # bounded by tool_calls_per_action
+    assert [t.output for t in observation.tool_outputs] == [
+        "value of a",
+        "value of b",
+        "value of c",
+    ]
+    assert "<action>\nlook up b\n</action>\nlooked up b" in observation.observation
+    assert "look up d" not in observation.observation
+    assert answer.answer == "done"
+
+
+@pytest.mark.asyncio
+async def test_run_react_single_call():
+    calls = []
+
+    async def chat_completion(messages, response_model, **kwargs):
+        calls.append(response_model)
+        if any("value of a" in m.content for m in messages):
+            return ReactAnswer(answer="done")
+        return TypeAdapter(response_model).validate_python(
+            {
+                "thoughts": "look up the keys",
+                "action": "look up a and b",
+                "tool_calls": [{"key": "a"}, {"key": "b"}],
+            }
+        )
+
+    with patch.object(OpenAIProvider, "chat_completion", chat_completion):
+        outputs = [
+            output
+            async for output in run_react(
+                "what are the values of a and b?",
+                model="gpt-4o-mini",
+                tools=[Lookup],
+                single_call=True,
+            )
+        ]
+
+    # the thought and the tool calls come in one round trip
+    assert len(calls) == 2
+    react_result, observation, answer = outputs
+    assert isinstance(react_result, React)
+    assert [t.output for t in observation.tool_outputs] == ["value of a", "value of b"]
+    assert answer.answer == "done"
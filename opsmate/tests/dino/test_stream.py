@@ -0,0 +1,184 @@
+import asyncio
+import json
+import pytest
+from collections.abc import Iterable
+from typing import List, Union, get_origin
+from unittest.mock import patch
+from instructor import Partial
+from pydantic import BaseModel, TypeAdapter
+from opsmate.dino import dino, is_partial, run_react
+from opsmate.dino.types import React, ReactAnswer, Observation, ToolCall
+from opsmate.dino.provider.openai import OpenAIProvider
+
+
+class UserInfo(BaseModel):
+    name: str
+    email: str
+
+
+def streaming_provider(*payloads):
+    """
+    A stub of chat_completion streaming the payloads in small chunks, one per call.
+    """
+    payloads = list(payloads)
+
+    async def chat_completion(response_model, stream=False, **kwargs):
+        payload = payloads.pop(0)
+        if not stream:
+            return TypeAdapter(response_model).validate_python(payload)
+
+        text = json.dumps(payload)
+        chunks = [text[i : i + 5] for i in range(0, len(text), 5)]
+
+        async def gen():
+            for partial in Partial[response_model].model_from_chunks(iter(chunks)):
+                yield partial
+
+        return gen()
+
+    return chat_completion
+
+
+@pytest.mark.asyncio
+async def test_dino_stream():
+    @dino("gpt-4o-mini", response_model=UserInfo, stream=True)
+    async def get_user_info(text: str):
+        return f"extract the user info: {text}"
+
+    provider = streaming_provider({"name": "John", "email": "john@example.com"})
+    with patch.object(OpenAIProvider, "chat_completion", provider):
+        outputs = [output async for output in get_user_info("john@example.com")]
+
+    *partials, complete = outputs
+    assert len(partials) > 1
+    assert all(is_partial(partial) for partial in partials)
+    assert partials[-1].email == "john@example.com"
+    assert not is_partial(complete)
+    assert complete == UserInfo(name="John", email="john@example.com")
+
+
+@pytest.mark.asyncio
+async def test_dino_stream_union():
+    @dino("gpt-4o-mini", response_model=Union[React, ReactAnswer], stream=True)
+    async def think(question: str):
+        return question
+
+    provider = streaming_provider(
+        {"response": {"thoughts": "check the pods", "action": "kubectl get pods"}}
+    )
+    with patch.object(OpenAIProvider, "chat_completion", provider):
+        outputs = [output async for output in think("are the pods healthy?")]
+
+    *partials, complete = outputs
+    assert all(is_partial(p) and isinstance(p, React) for p in partials)
+    assert partials[0].action is None
+    assert complete == React(thoughts="check the pods", action="kubectl get pods")
+
+
+@pytest.mark.asyncio
+async def test_dino_stream_not_streamable():
+    @dino("gpt-4o-mini", response_model=str, stream=True)
+    async def echo(text: str):
+        return text
+
+    provider = streaming_provider("hello")
+    with patch.object(OpenAIProvider, "chat_completion", provider):
+        outputs = [output async for output in echo("hello")]
+    assert outputs == ["hello"]
+
+
+@pytest.mark.asyncio
+async def test_dino_stream_error():
+    async def chat_completion(**kwargs):
+        raise ValueError("boom")
+
+    @dino("gpt-4o-mini", response_model=UserInfo, stream=True)
+    async def get_user_info(text: str):
+        return text
+
+    with patch.object(OpenAIProvider, "chat_completion", chat_completion):
+        with pytest.raises(ValueError, match="boom"):
+            async for _ in get_user_info("john@example.com"):
+                pass
+
+
+@pytest.mark.asyncio
+async def test_run_react_stream():
+    provider = streaming_provider(
+        {"response": {"thoughts": "check the pods", "action": "kubectl get pods"}},
+        {"observation": "all the pods are running"},
+        {"response": {"answer": "the pods are healthy"}},
+    )
+    with patch.object(OpenAIProvider, "chat_completion", provider):
+        outputs = [
+            output
+            async for output in run_react(
+                "are the pods healthy?", model="gpt-4o-mini", stream=True
+            )
+        ]
+
+    complete = [output for output in outputs if not is_partial(output)]
+    assert [type(output) for output in complete] == [React, Observation, ReactAnswer]
+    assert complete[-1].answer == "the pods are healthy"
+
+    partials = [output for output in outputs if is_partial(output)]
+    assert {type(p).__mro__[1] for p in partials} == {React, Observation, ReactAnswer}
+
+
+class Echo(ToolCall[str]):
+    text: str
+
+    async def __call__(self):
+        events.append(f"run {self.text}")
+        return self.text
+
+
+events: List[str] = []
+
+
+def tool_calls_provider(*texts):
+    async def chat_completion(response_model, stream=False, **kwargs):
+        if get_origin(response_model) is not Iterable:
+            return Observation(observation="done")
+
+        async def parse():
+            for text in texts:
+                events.append(f"parsed {text}")
+                yield Echo(text=text)
+                # the generation of the next tool call
+                await asyncio.sleep(0.01)
+
+        if stream:
+            return parse()
+        return [tool_call async for tool_call in parse()]
+
+    return chat_completion
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "kwargs, expected",
+    [
+        ({"stream_tool_calls": True}, ["parsed a", "run a", "parsed b", "run b"]),
+        ({"stream_tool_calls": False}, ["parsed a", "parsed b", "run a", "run b"]),
+        # opt-in
+        ({}, ["parsed a", "parsed b", "run a", "run b"]),
+    ],
+)
+async def test_dino_stream_tool_calls(kwargs, expected):
+    events.clear()
+
+    @dino(
+        "gpt-4o-mini",
+        response_model=Observation,
+        tools=[Echo],
+        **kwargs,
+    )
+    async def echo(text: str):
+        return text
+
+    with patch.object(OpenAIProvider, "chat_completion", tool_calls_provider("a", "b")):
+        observation = await echo("echo a and b")
+
+    assert events == expected
+    assert [tool_call.output for tool_call in observation.tool_outputs] == ["a", "b"]
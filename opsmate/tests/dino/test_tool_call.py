@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+import time
+from opsmate.dino.types import ToolCall
+
+
+class Sleep(ToolCall[str]):
+    seconds: float
+
+    async def __call__(self):
+        self.partial_output = "started"
+        await asyncio.sleep(self.seconds)
+        return "done"
+
+
+@pytest.mark.asyncio
+async def test_tool_call_deadline():
+    slow, fast = Sleep(seconds=10), Sleep(seconds=0.01)
+    context = {"tool_timeout": 0.1}
+
+    started_at = time.monotonic()
+    await asyncio.gather(slow.run(context), fast.run(context))
+    # the hung tool call does not hold up its sibling for long
+    assert time.monotonic() - started_at < 1
+
+    assert fast.output == "done"
+    assert slow.output["message"] == "tool execution timeout"
+    assert slow.output["partial_output"] == "started"
+
+
+@pytest.mark.asyncio
+async def test_tool_call_cancellation():
+    cancellation = asyncio.Event()
+    tool = Sleep(seconds=10)
+
+    asyncio.get_running_loop().call_later(0.05, cancellation.set)
+    await tool.run({"cancellation": cancellation})
+
+    assert tool.output["message"] == "tool execution cancelled"
+    assert tool.output["partial_output"] == "started"
+
+    # no deadline
+    tool = Sleep(seconds=0.01)
+    assert await tool.run({"tool_timeout": None}) == "done"
@@ -0,0 +1,111 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from pydantic import BaseModel
+from opsmate.dino import dino
+from opsmate.dino.provider.openai import OpenAIProvider
+from opsmate.dino.usage import (
+    UsageRecord,
+    UsageRegistry,
+    record_usage,
+    track_usage,
+    usage_context,
+)
+
+
+class UserInfo(BaseModel):
+    name: str
+
+
+def usage_record(**kwargs) -> UsageRecord:
+    return UsageRecord(
+        **{
+            "timestamp": 0,
+            "function": "get_user_info",
+            "provider": "openai",
+            "model": "gpt-4o-mini",
+            "ttft": 1.0,
+            "latency": 2.0,
+            "prompt_tokens": 100,
+            "completion_tokens": 10,
+            **kwargs,
+        }
+    )
+
+
+def test_usage_registry_report():
+    registry = UsageRegistry()
+    registry.record(usage_record(ttft=1.0))
+    registry.record(usage_record(ttft=3.0, cached_tokens=50))
+    registry.record(usage_record(function="react", prompt_tokens=1000))
+
+    reports = registry.report(by=["function"])
+    assert [r.function for r in reports] == ["react", "get_user_info"]
+    assert reports[1].calls == 2
+    assert reports[1].prompt_tokens == 200
+    assert reports[1].cached_tokens == 50
+    assert reports[1].ttft == pytest.approx(2.0)
+    assert reports[1].model is None
+
+
+def test_usage_registry_load(tmp_path):
+    path = str(tmp_path / "usage" / "usage.jsonl")
+    registry = UsageRegistry(path=path)
+    registry.record(usage_record(context="k8s"))
+    with open(path, "a") as f:
+        f.write("not json\n")
+
+    loaded = UsageRegistry.load(path)
+    assert loaded.records() == registry.records()
+    assert loaded.path is None
+
+
+def test_track_usage_nested():
+    response = SimpleNamespace(
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=1)
+    )
+    with track_usage() as fn_usage:
+        with track_usage(call=True) as call_usage:
+            record_usage(response)
+            # e.g. a dino function run by a tool call streamed in
+            with track_usage() as nested_usage:
+                record_usage(response)
+
+    assert call_usage.prompt_tokens == 10
+    assert nested_usage.prompt_tokens == 10
+    assert fn_usage.prompt_tokens == 20
+
+
+@pytest.mark.asyncio
+async def test_dino_usage():
+    registry = UsageRegistry()
+
+    async def chat_completion(**kwargs):
+        record_usage(
+            SimpleNamespace(
+                usage=SimpleNamespace(
+                    prompt_tokens=2000,
+                    completion_tokens=20,
+                    prompt_tokens_details=SimpleNamespace(cached_tokens=1024),
+                )
+            )
+        )
+        return UserInfo(name="John")
+
+    @dino("gpt-4o-mini", response_model=UserInfo, usage_registry=registry)
+    async def get_user_info(text: str):
+        return f"extract the user info: {text}"
+
+    with patch.object(OpenAIProvider, "chat_completion", chat_completion):
+        with usage_context("k8s"):
+            await get_user_info("John")
+
+    [record] = registry.records()
+    assert record.function == "get_user_info"
+    assert record.provider == "openai"
+    assert record.model == "gpt-4o-mini"
+    assert record.context == "k8s"
+    assert record.prompt_tokens == 2000
+    assert record.cached_tokens == 1024
+    assert record.completion_tokens == 20
+    assert 0 <= record.ttft <= record.latency
@@ -0,0 +1,64 @@
+import pytest
+from hashlib import sha256
+from opsmate.ingestions.blobs import BlobStore
+from opsmate.ingestions.base import Document
+from opsmate.ingestions.jobs import chunk_and_store
+from opsmate.dbq.dbq import TaskItem, TaskStatus
+
+
+class TestBlobStore:
+    @pytest.fixture
+    def store(self, tmp_path):
+        return BlobStore(str(tmp_path))
+
+    def test_put_and_get(self, store: BlobStore):
+        ref = store.put(b"hello world")
+        assert ref == sha256(b"hello world").hexdigest()
+        assert store.path(ref).parent.name == ref[:2]
+        assert store.get(ref) == b"hello world"
+
+        # content addressed, so storing the same data returns the same ref
+        assert store.put(b"hello world") == ref
+        assert len(list(store.root.glob("*/*"))) == 1
+
+    def test_delete(self, store: BlobStore):
+        ref = store.put(b"hello world")
+        store.delete(ref)
+        assert store.get(ref) is None
+
+        # deleting a missing blob is a no-op
+        store.delete(ref)
+
+    def test_invalid_ref(self, store: BlobStore):
+        with pytest.raises(ValueError, match="Invalid blob reference"):
+            store.get("../../etc/passwd")
+
+    @pytest.mark.asyncio
+    async def test_chunk_and_store_cleanup(self, store: BlobStore, monkeypatch):
+        monkeypatch.setattr(
+            "opsmate.ingestions.jobs.BlobStore", lambda: BlobStore(str(store.root))
+        )
+
+        def put(name: str) -> str:
+            doc = Document(content=name, metadata={"path": f"/tmp/{name}.md"})
+            return store.put(doc.model_dump_json().encode("utf-8"))
+
+        for kwargs in [
+            {"doc_ref": put("hello")},
+            {"doc_refs": [put("foo"), put("bar")]},
+        ]:
+            refs = [kwargs["doc_ref"]] if "doc_ref" in kwargs else kwargs["doc_refs"]
+            task_item = TaskItem(
+                func="opsmate.ingestions.jobs.chunk_and_store",
+                args=[1],
+                kwargs=kwargs,
+            )
+
+            # the blobs are kept for retries
+            task_item.status = TaskStatus.PENDING
+            await chunk_and_store.on_failure(task_item, Exception("boom"))
+            assert all(store.get(ref) is not None for ref in refs)
+
+            task_item.status = TaskStatus.COMPLETED
+            await chunk_and_store.on_success(task_item)
+            assert all(store.get(ref) is None for ref in refs)
@@ -3,7 +3,12 @@ from opsmate.tests.base import BaseTestCase
 from opsmate.ingestions.fs import FsIngestion
 from opsmate.textsplitters.markdown_header import MarkdownHeaderTextSplitter
 from opsmate.ingestions.chunk import chunk_document
+from glob import glob
 from os import path
+import asyncio
+import builtins
+import os
+import time
 
 
 class TestFsIngestion(BaseTestCase):
@@ -88,6 +93,87 @@ class TestFsIngestion(BaseTestCase):
         assert "This is a test 2" in chunks[5].content
         assert chunks[5].metadata["path"].endswith("/nested/TEST2.md")
 
+    @pytest.mark.parametrize(
+        "glob_pattern",
+        [
+            "**/*.md",
+            "*.md",
+            "**/*",
+            "*",
+            "nested/*.md",
+            "./TEST.md",
+            "**",
+            "*.[tm][xd]*",
+        ],
+    )
+    def test_scan_matches_glob(self, fixtures_dir, glob_pattern):
+        ingestion = FsIngestion(local_path=fixtures_dir, glob_pattern=glob_pattern)
+
+        expected = {
+            path.abspath(f)
+            for f in glob(path.join(fixtures_dir, glob_pattern), recursive=True)
+            if path.isfile(f)
+        }
+        assert {path.abspath(f.path) for f in ingestion.scan()} == expected
+
+    @pytest.mark.asyncio
+    async def test_incremental_load(self, tmp_path):
+        docs_dir = tmp_path / "docs"
+        (docs_dir / "nested").mkdir(parents=True)
+        (docs_dir / "a.md").write_text("# a")
+        (docs_dir / "nested" / "b.md").write_text("# b")
+        manifest_path = str(tmp_path / "manifest.json")
+
+        ingestion = FsIngestion(
+            local_path=str(docs_dir),
+            glob_pattern="**/*.md",
+            manifest_path=manifest_path,
+        )
+        docs = [doc async for doc in ingestion.load()]
+        assert [doc.metadata["name"] for doc in docs] == ["a.md", "b.md"]
+        assert path.exists(manifest_path)
+
+        # the documents are indexed now, nothing has changed so nothing is loaded
+        ingestion.indexed = {doc.metadata["path"]: doc.metadata["sha"] for doc in docs}
+        assert [doc async for doc in ingestion.load()] == []
+
+        # touching the file without changing the content is detected via the sha
+        os.utime(docs_dir / "a.md", ns=(0, 0))
+        assert [doc async for doc in ingestion.load()] == []
+
+        (docs_dir / "nested" / "b.md").write_text("# b changed")
+        docs = [doc async for doc in ingestion.load()]
+        assert [doc.content for doc in docs] == ["# b changed"]
+
+        # without the documents being indexed everything is loaded
+        ingestion.indexed = {}
+        docs = [doc async for doc in ingestion.load()]
+        assert len(docs) == 2
+
+    @pytest.mark.asyncio
+    async def test_load_stops_early(self, tmp_path, monkeypatch):
+        for i in range(20):
+            (tmp_path / f"{i:02}.md").write_text(f"# {i}")
+
+        def slow_open(*args, **kwargs):
+            time.sleep(0.2)
+            return builtins.open(*args, **kwargs)
+
+        monkeypatch.setattr("opsmate.ingestions.fs.open", slow_open, raising=False)
+        ingestion = FsIngestion(
+            local_path=str(tmp_path), glob_pattern="*.md", concurrency=2
+        )
+
+        docs = ingestion.load()
+        doc = await docs.__anext__()
+        assert doc.metadata["name"] == "00.md"
+
+        # the pending reads do not block the event loop once the scan is closed
+        started_at = time.monotonic()
+        await docs.aclose()
+        await asyncio.sleep(0.05)
+        assert time.monotonic() - started_at < 0.15
+
     def test_from_config(self):
         config = {
             "/tmp/foo": "*.md",
@@ -1,9 +1,17 @@
 import pytest
 import httpx
 from unittest.mock import AsyncMock, Mock
-from opsmate.ingestions.github import GithubIngestion
+from opsmate.ingestions.github import (
+    GithubIngestion,
+    aclose_shared_clients,
+    shared_client,
+)
 import os
+import io
+import asyncio
 import base64
+import tarfile
+import respx
 
 
 @pytest.fixture
@@ -183,6 +191,161 @@ async def test_load(github_ingestion):
     assert documents[1].data_source == "owner/repo"
 
 
+@pytest.mark.asyncio
+async def test_load_bounds_inflight_docs(github_ingestion, mock_client):
+    github_ingestion.use_archive = False
+    github_ingestion.concurrency = 3
+    github_ingestion.max_inflight_docs = 2
+
+    files = [f"file{i}.md" for i in range(50)]
+    tree_query_response = Mock(spec=httpx.Response)
+    tree_query_response.json.return_value = {
+        "tree": [{"type": "blob", "path": file} for file in files]
+    }
+    tree_query_response.raise_for_status.return_value = None
+
+    fetched = []
+
+    async def side_effect(url: str, headers: dict):
+        if "tree" in url:
+            return tree_query_response
+        await asyncio.sleep(0)
+        fetched.append(url)
+        response = Mock(spec=httpx.Response)
+        response.json.return_value = {
+            "content": base64.b64encode(b"content").decode(),
+            "html_url": url,
+            "sha": "1234567890",
+        }
+        response.raise_for_status.return_value = None
+        return response
+
+    mock_client.get.side_effect = side_effect
+
+    loader = github_ingestion.load()
+    await anext(loader)
+    await asyncio.sleep(0.1)
+    # one consumed, two queued and one held by each of the blocked workers
+    assert len(fetched) <= 1 + 2 + 3
+
+    docs = [doc async for doc in loader]
+    assert len(docs) == 49
+    assert len(fetched) == 50
+
+
+@pytest.mark.asyncio
+async def test_shared_client_closed():
+    client = shared_client()
+    assert shared_client() is client
+
+    await aclose_shared_clients()
+    assert client.is_closed
+    # a new one is created once closed
+    new_client = shared_client()
+    assert new_client is not client
+    await aclose_shared_clients()
+
+
+def make_tarball(
+    files: dict[str, str | bytes], prefix: str = "owner-repo-abc123"
+) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, content in files.items():
+            data = content.encode() if isinstance(content, str) else content
+            info = tarfile.TarInfo(f"{prefix}/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_load_from_archive():
+    api = "https://api.github.com/repos/owner/repo"
+    respx.get(f"{api}/git/trees/main?recursive=1").mock(
+        return_value=httpx.Response(
+            200,
+            json={
+                "tree": [
+                    {"type": "blob", "path": "docs/a.md", "sha": "sha-a"},
+                    {"type": "blob", "path": "docs/b.md", "sha": "sha-b"},
+                    {"type": "blob", "path": "main.go", "sha": "sha-main"},
+                    {"type": "tree", "path": "docs"},
+                ]
+            },
+        )
+    )
+    respx.get(f"{api}/tarball/main").mock(
+        return_value=httpx.Response(
+            302, headers={"Location": "https://codeload.github.com/owner/repo"}
+        )
+    )
+    respx.get("https://codeload.github.com/owner/repo").mock(
+        return_value=httpx.Response(
+            200,
+            content=make_tarball(
+                {"docs/a.md": "content a", "docs/b.md": "content b", "main.go": "go"}
+            ),
+        )
+    )
+    contents_route = respx.get(url__startswith=f"{api}/contents/")
+
+    async with httpx.AsyncClient() as client:
+        github_ingestion = GithubIngestion(
+            repo="owner/repo",
+            github_token="fake-token",
+            glob="**/*.md",
+            client=client,
+            archive_min_files=1,
+        )
+        documents = [doc async for doc in github_ingestion.load()]
+
+    assert not contents_route.called
+    assert [doc.content for doc in documents] == ["content a", "content b"]
+    assert documents[0].metadata == {
+        "path": "docs/a.md",
+        "repo": "owner/repo",
+        "branch": "main",
+        "source": "https://github.com/owner/repo/blob/main/docs/a.md",
+        "sha": "sha-a",
+    }
+    assert documents[1].metadata["sha"] == "sha-b"
+    assert documents[1].data_provider == "github"
+    assert documents[1].data_source == "owner/repo"
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_load_from_archive_stops_early():
+    api = "https://api.github.com/repos/owner/repo"
+    files = {f"docs/{i}.md": f"content {i}" for i in range(100)}
+    # not valid utf-8, skipped
+    tarball = make_tarball({"docs/binary.md": b"\xff\xfe\x00", **files})
+
+    async def stream():
+        # the tarball trickles in, it is read as it is downloaded
+        for i in range(0, len(tarball), 1024):
+            yield tarball[i : i + 1024]
+            await asyncio.sleep(0)
+
+    respx.get(f"{api}/tarball/main").mock(
+        return_value=httpx.Response(200, stream=stream())
+    )
+
+    blobs = {path: {"path": path, "sha": "sha"} for path in files}
+    blobs["docs/binary.md"] = {"path": "docs/binary.md", "sha": "sha"}
+    async with httpx.AsyncClient() as client:
+        github_ingestion = GithubIngestion(
+            repo="owner/repo", github_token="fake-token", client=client
+        )
+        documents = github_ingestion.load_from_archive(blobs)
+        contents = [(await anext(documents)).content for _ in range(3)]
+        await asyncio.wait_for(documents.aclose(), timeout=5)
+
+    assert contents == ["content 0", "content 1", "content 2"]
+
+
 @pytest.mark.skipif(os.getenv("GITHUB_TOKEN") is None, reason="GITHUB_TOKEN is not set")
 @pytest.mark.asyncio
 async def test_integration():
@@ -1,12 +1,18 @@
 import pytest
 from sqlmodel import create_engine, Session
 from opsmate.dbq.dbq import Worker, SQLModel as DBQSQLModel, enqueue_task
-from opsmate.ingestions.models import SQLModel as IngestionSQLModel, IngestionRecord
+from opsmate.ingestions.models import (
+    SQLModel as IngestionSQLModel,
+    IngestionRecord,
+    DocumentRecord,
+)
 import asyncio
 from contextlib import asynccontextmanager
 import structlog
 from sqlalchemy import Engine
-from opsmate.ingestions.jobs import ingest
+from opsmate.ingestions.jobs import ingest, chunk_and_store
+from opsmate.ingestions.blobs import BlobStore
+from opsmate.config import config
 import time
 from opsmate.knowledgestore.models import aconn
 from opsmate.tests.base import BaseTestCase
@@ -117,6 +123,76 @@ class TestJobs(BaseTestCase):
             kbs = await get_kbs()
             assert len(kbs) == current_kbs_len, "Should have the same number of kbs"
 
+    @pytest.mark.asyncio
+    async def test_ingest_removes_orphans(self, session: Session, tmp_path):
+        (tmp_path / "kept.md").write_text("# kept")
+        ingestor_config = {"local_path": str(tmp_path), "glob_pattern": "*.md"}
+        ingestion_record = await IngestionRecord.find_or_create(
+            session, "fs", ingestor_config
+        )
+        kept_path = os.path.abspath(tmp_path / "kept.md")
+        orphan_paths = [
+            os.path.abspath(tmp_path / "removed.md"),
+            os.path.abspath(tmp_path / "it's removed.md"),
+        ]
+        for doc_path in [kept_path, *orphan_paths]:
+            await DocumentRecord.find_or_create(
+                session, ingestion_record.id, doc_path, "sha", {}
+            )
+
+        await ingest.run(
+            ingestor_type="fs",
+            ingestor_config=ingestor_config,
+            ctx={"session": session},
+        )
+
+        doc_records = await DocumentRecord.find_all_by_ingestion_id(
+            session, ingestion_record.id
+        )
+        assert [doc_record.path for doc_record in doc_records] == [kept_path]
+
+    @pytest.mark.asyncio
+    async def test_ingest_in_batches(self, session: Session, tmp_path, monkeypatch):
+        docs_dir = tmp_path / "docs"
+        docs_dir.mkdir()
+        for name in ["a", "b", "c"]:
+            (docs_dir / f"{name}.md").write_text(f"# {name}\n\n{name} content")
+        ingestor_config = {"local_path": str(docs_dir), "glob_pattern": "*.md"}
+
+        enqueued = []
+        monkeypatch.setattr("opsmate.ingestions.jobs.CHUNK_BATCH_SIZE", 2)
+        monkeypatch.setattr(
+            "opsmate.ingestions.jobs.enqueue_task",
+            lambda session, task, *args, **kwargs: enqueued.append((args, kwargs)),
+        )
+        blob_store = BlobStore(str(tmp_path / "blobs"))
+        monkeypatch.setattr("opsmate.ingestions.jobs.BlobStore", lambda: blob_store)
+        monkeypatch.setattr(config, "ingestion_manifests_path", str(tmp_path))
+        monkeypatch.setattr(config, "categorise", False)
+        monkeypatch.setattr(config, "splitter_workers", 2)
+
+        await ingest.run(
+            ingestor_type="fs",
+            ingestor_config=ingestor_config,
+            ctx={"session": session},
+        )
+        assert [len(kwargs["doc_refs"]) for _, kwargs in enqueued] == [2, 1]
+
+        # the batches are split across the splitter workers
+        stored = {}
+
+        async def store_chunks(session, table, doc, doc_record, chunks):
+            stored[doc.metadata["path"]] = [chunk.content for chunk in chunks]
+
+        monkeypatch.setattr("opsmate.ingestions.jobs._store_chunks", store_chunks)
+        for args, kwargs in enqueued:
+            await chunk_and_store.run(*args, **kwargs, ctx={"session": session})
+
+        assert stored == {
+            os.path.abspath(docs_dir / f"{name}.md"): [f"# {name}\n\n{name} content"]
+            for name in ["a", "b", "c"]
+        }
+
     async def await_task_pool_idle(self, worker: Worker, timeout: float = 10):
         start = time.time()
         while not worker.idle():
@@ -0,0 +1,142 @@
+import pytest
+import asyncio
+import builtins
+from os import path
+from sqlmodel import create_engine, Session
+from opsmate.tests.base import BaseTestCase
+from opsmate.ingestions.fs import FsIngestion
+from opsmate.ingestions.watch import watch_fs, watch_and_ingest
+from opsmate.ingestions.blobs import BlobStore
+from opsmate.ingestions.jobs import chunk_and_store, delete_document
+from opsmate.ingestions.base import Document
+from opsmate.ingestions.models import (
+    SQLModel as IngestionSQLModel,
+    IngestionRecord,
+    DocumentRecord,
+)
+
+
+class TestWatch(BaseTestCase):
+    @pytest.fixture
+    def docs_dir(self, tmp_path):
+        (tmp_path / "nested").mkdir()
+        (tmp_path / "a.md").write_text("# a")
+        (tmp_path / "nested" / "b.md").write_text("# b")
+        return tmp_path
+
+    def test_matches(self, docs_dir):
+        ingestion = FsIngestion(local_path=str(docs_dir), glob_pattern="**/*.md")
+        assert ingestion.matches(str(docs_dir / "a.md"))
+        assert ingestion.matches(str(docs_dir / "nested" / "b.md"))
+        assert not ingestion.matches(str(docs_dir / "a.txt"))
+        assert not ingestion.matches(str(docs_dir / ".hidden" / "c.md"))
+        assert not ingestion.matches(str(docs_dir.parent / "a.md"))
+
+    @pytest.mark.asyncio
+    async def test_load_files(self, docs_dir):
+        ingestion = FsIngestion(local_path=str(docs_dir), glob_pattern="**/*.md")
+        (docs_dir / "a.txt").write_text("a")
+
+        docs = [
+            doc
+            async for doc in ingestion.load_files(
+                [
+                    str(docs_dir / "nested" / "b.md"),
+                    str(docs_dir / "a.txt"),
+                    str(docs_dir / "missing.md"),
+                ]
+            )
+        ]
+        assert [doc.content for doc in docs] == ["# b"]
+
+    @pytest.mark.asyncio
+    async def test_watch_fs_polling(self, docs_dir):
+        ingestion = FsIngestion(local_path=str(docs_dir), glob_pattern="**/*.md")
+        watcher = watch_fs(ingestion, poll_interval=0.05, force_polling=True)
+        next_changes = asyncio.create_task(anext(watcher))
+        await asyncio.sleep(0.1)
+
+        (docs_dir / "a.md").write_text("# a changed")
+        (docs_dir / "c.md").write_text("# c")
+        (docs_dir / "c.txt").write_text("not matched")
+        (docs_dir / "nested" / "b.md").unlink()
+
+        changed, deleted = await asyncio.wait_for(next_changes, timeout=5)
+        assert changed == {
+            path.abspath(docs_dir / "a.md"),
+            path.abspath(docs_dir / "c.md"),
+        }
+        assert deleted == {path.abspath(docs_dir / "nested" / "b.md")}
+        await watcher.aclose()
+
+    @pytest.mark.asyncio
+    async def test_watch_and_ingest_skips_bad_files(
+        self, docs_dir, tmp_path_factory, monkeypatch
+    ):
+        (docs_dir / "gone.md").write_text("# gone")
+        (docs_dir / "binary.md").write_bytes(b"\xff\xfe\x00")
+        batches = [
+            ({str(docs_dir / "gone.md"), str(docs_dir / "binary.md")}, set()),
+            ({str(docs_dir / "a.md")}, {str(docs_dir / "nested" / "b.md")}),
+        ]
+
+        async def fake_watch_fs(*args, **kwargs):
+            for batch in batches:
+                yield batch
+
+        def vanishing_open(file, *args, **kwargs):
+            # removed between the change being seen and the file being read
+            if file.endswith("gone.md"):
+                raise FileNotFoundError(file)
+            return builtins.open(file, *args, **kwargs)
+
+        enqueued = []
+        blob_store = BlobStore(str(tmp_path_factory.mktemp("blobs")))
+        monkeypatch.setattr("opsmate.ingestions.watch.watch_fs", fake_watch_fs)
+        monkeypatch.setattr("opsmate.ingestions.watch.BlobStore", lambda: blob_store)
+        monkeypatch.setattr(
+            "opsmate.ingestions.watch.enqueue_task",
+            lambda session, task, *args, **kwargs: enqueued.append((task, kwargs)),
+        )
+        monkeypatch.setattr("opsmate.ingestions.fs.open", vanishing_open, raising=False)
+
+        engine = create_engine("sqlite:///:memory:")
+        IngestionSQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            await watch_and_ingest(
+                session, {"local_path": str(docs_dir), "glob_pattern": "**/*.md"}
+            )
+
+        # the bad files are skipped, the later batch is still processed
+        assert [task for task, _ in enqueued] == [chunk_and_store, delete_document]
+        (doc_ref,) = enqueued[0][1]["doc_refs"]
+        doc = Document.model_validate_json(blob_store.get(doc_ref).decode("utf-8"))
+        assert doc.content == "# a"
+        assert enqueued[1][1]["path"] == str(docs_dir / "nested" / "b.md")
+
+    @pytest.mark.asyncio
+    async def test_delete_document(self, docs_dir):
+        engine = create_engine("sqlite:///:memory:")
+        IngestionSQLModel.metadata.create_all(engine)
+
+        with Session(engine) as session:
+            ingestion_record = await IngestionRecord.find_or_create(
+                session,
+                "fs",
+                {"local_path": str(docs_dir), "glob_pattern": "**/*.md"},
+            )
+            doc_path = path.abspath(docs_dir / "a.md")
+            await DocumentRecord.find_or_create(
+                session, ingestion_record.id, doc_path, "sha", {}
+            )
+
+            await delete_document.run(
+                ingestion_record.id, path=doc_path, ctx={"session": session}
+            )
+
+            assert (
+                await DocumentRecord.find_by_ingestion_id_and_path(
+                    session, ingestion_record.id, doc_path
+                )
+                is None
+            )
@@ -0,0 +1,70 @@
+from opsmate.textsplitters.markdown_header import MarkdownHeaderTextSplitter
+from opsmate.textsplitters.base import Chunk
+import io
+
+headers_to_split_on = [("#", "h1"), ("##", "h2")]
+
+text = """# Title
+intro
+
+## Section
+content
+
+```bash
+# not a header
+```
+"""
+
+
+def test_markdown_header_text_splitter():
+    splitter = MarkdownHeaderTextSplitter(headers_to_split_on)
+    output = splitter.split_text(text)
+    expected_output = [
+        Chunk(content="intro", metadata={"h1": "Title"}),
+        Chunk(
+            content="content  \n```bash\n# not a header\n```",
+            metadata={"h1": "Title", "h2": "Section"},
+        ),
+    ]
+    assert output == expected_output
+
+
+def test_markdown_header_text_splitter_iter_split():
+    splitter = MarkdownHeaderTextSplitter(headers_to_split_on, strip_headers=False)
+    chunks = splitter.iter_split(io.StringIO(text))
+
+    assert next(chunks) == Chunk(content="# Title\nintro", metadata={"h1": "Title"})
+    assert list(chunks) == splitter.split_text(text)[1:]
+
+
+def test_markdown_header_text_splitter_headers():
+    splitter = MarkdownHeaderTextSplitter(
+        [("#", "h1"), ("##", "h2"), ("###", None)], strip_headers=False
+    )
+    output = splitter.split_text(
+        "#NotAHeader\n# Title\x07\n## \n### untracked\ntext\n# Next"
+    )
+    expected_output = [
+        Chunk(
+            content="#NotAHeader  \n# Title  \n##  \n### untracked\ntext",
+            metadata={"h1": "Title", "h2": ""},
+        ),
+        Chunk(content="# Next", metadata={"h1": "Next"}),
+    ]
+    assert output == expected_output
+
+
+def test_markdown_header_text_splitter_sub_split():
+    section = (
+        "# Title\n" + "\n".join(f"line {i}" for i in range(10)) + "\n# Small\nsmall"
+    )
+    splitter = MarkdownHeaderTextSplitter([("#", "h1")], chunk_size=20)
+    output = splitter.split_text(section)
+    expected_output = [
+        Chunk(content="line 0\nline 1\nline 2", metadata={"h1": "Title"}),
+        Chunk(content="line 3\nline 4\nline 5", metadata={"h1": "Title"}),
+        Chunk(content="line 6\nline 7\nline 8", metadata={"h1": "Title"}),
+        Chunk(content="line 9", metadata={"h1": "Title"}),
+        Chunk(content="small", metadata={"h1": "Small"}),
+    ]
+    assert output == expected_output
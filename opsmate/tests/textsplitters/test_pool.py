@@ -0,0 +1,36 @@
+from opsmate.textsplitters import split_texts, asplit_texts, splitter_from_config
+import pytest
+
+splitter_config = {
+    "splitter": "markdown_header",
+    "headers_to_split_on": [["#", "h1"], ["##", "h2"]],
+}
+
+texts = [f"# Doc {i}\n" + f"## Section {i}\ncontent {i}\n" * (i % 5) for i in range(40)]
+
+
+def expected_chunks():
+    splitter = splitter_from_config(splitter_config)
+    return [splitter.split_text(text) for text in texts]
+
+
+def test_splitter_from_config():
+    splitter_from_config(splitter_config)
+    # the config is not consumed
+    assert splitter_config["splitter"] == "markdown_header"
+
+
+def test_split_texts_in_process():
+    assert split_texts(texts, splitter_config, workers=0) == expected_chunks()
+
+
+def test_split_texts():
+    assert split_texts(texts, splitter_config, workers=2) == expected_chunks()
+    # the config is not consumed
+    assert splitter_config["splitter"] == "markdown_header"
+
+
+@pytest.mark.asyncio
+async def test_asplit_texts():
+    assert await asplit_texts(texts, splitter_config, workers=2) == expected_chunks()
+    assert await asplit_texts([], splitter_config, workers=2) == []
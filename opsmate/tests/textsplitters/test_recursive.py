@@ -1,3 +1,4 @@
+import mmap
 from opsmate.textsplitters.recursive import RecursiveTextSplitter
 from opsmate.textsplitters.base import Chunk
 
@@ -44,3 +45,46 @@ def test_recursive_text_splitter():
         Chunk(content="text.", metadata={"seperator": " "}),
     ]
     assert output == expected_output
+
+
+def test_recursive_text_splitter_unbroken_text():
+    text = "a" * 25
+    splitter = RecursiveTextSplitter(chunk_size=10, chunk_overlap=0)
+    output = splitter.split_text(text)
+    expected_output = [
+        Chunk(content="a" * 10, metadata={"seperator": ""}),
+        Chunk(content="a" * 10, metadata={"seperator": ""}),
+        Chunk(content="a" * 5, metadata={"seperator": ""}),
+    ]
+    assert output == expected_output
+
+
+def test_recursive_text_splitter_collapses_separators():
+    text = "a\n\n\n\nb\n\nc"
+    splitter = RecursiveTextSplitter(chunk_size=4, chunk_overlap=0)
+    output = splitter.split_text(text)
+    expected_output = [
+        Chunk(content="a\n\nb", metadata={"seperator": "\n\n"}),
+        Chunk(content="c", metadata={"seperator": "\n\n"}),
+    ]
+    assert output == expected_output
+
+
+def test_recursive_text_splitter_iter_split(monkeypatch, tmp_path):
+    # a tiny block size forces the streaming path
+    monkeypatch.setattr("opsmate.textsplitters.recursive.BLOCK_SIZE", 8)
+    text = "This is a piece of text.\n\nAnother paragraph, with commas; and more.\n" * 5
+    file_path = tmp_path / "text.txt"
+    file_path.write_text(text)
+
+    for chunk_overlap in (0, 5):
+        splitter = RecursiveTextSplitter(chunk_size=20, chunk_overlap=chunk_overlap)
+        expected_output = splitter.split_text(text)
+
+        with open(file_path, "r") as f:
+            assert list(splitter.iter_split(f)) == expected_output
+        with (
+            open(file_path, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+        ):
+            assert list(splitter.iter_split(mm)) == expected_output
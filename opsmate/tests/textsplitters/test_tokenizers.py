@@ -0,0 +1,95 @@
+from collections import Counter
+from opsmate.textsplitters.recursive import RecursiveTextSplitter
+from opsmate.textsplitters.markdown_header import MarkdownHeaderTextSplitter
+from opsmate.textsplitters.tokenizers import token_length_function
+from opsmate.textsplitters.base import Chunk
+import pytest
+
+
+def word_count(text: str) -> int:
+    return len(text.split())
+
+
+def test_recursive_text_splitter_length_function():
+    text = "one two three four five six seven eight nine ten eleven"
+    splitter = RecursiveTextSplitter(
+        chunk_size=4, separators=[" "], length_function=word_count
+    )
+    output = splitter.split_text(text)
+    # the separator is zero words long
+    expected_output = [
+        Chunk(content="one two three four", metadata={"seperator": " "}),
+        Chunk(content="five six seven eight", metadata={"seperator": " "}),
+        Chunk(content="nine ten eleven", metadata={"seperator": " "}),
+    ]
+    assert output == expected_output
+
+
+def test_recursive_text_splitter_measures_fragments_once():
+    measured = Counter()
+
+    def length_function(text: str) -> int:
+        measured[text] += 1
+        return len(text)
+
+    text = "\n\n".join(" ".join(f"word{i}-{j}" for j in range(20)) for i in range(20))
+    splitter = RecursiveTextSplitter(
+        chunk_size=50, chunk_overlap=10, length_function=length_function
+    )
+    assert splitter.split_text(text) == RecursiveTextSplitter(
+        chunk_size=50, chunk_overlap=10
+    ).split_text(text)
+
+    fragments = {
+        fragment: count
+        for fragment, count in measured.items()
+        if fragment not in splitter.separators
+    }
+    assert max(fragments.values()) == 1
+
+
+def test_markdown_header_text_splitter_tokenizer(monkeypatch):
+    monkeypatch.setattr(
+        "opsmate.textsplitters.base.token_length_function", lambda _: word_count
+    )
+    splitter = MarkdownHeaderTextSplitter(
+        [("#", "h1")], chunk_size=3, tokenizer="fake:words"
+    )
+    output = splitter.split_text("# Title\none two three four")
+    expected_output = [
+        Chunk(content="one two three", metadata={"h1": "Title"}),
+        Chunk(content="four", metadata={"h1": "Title"}),
+    ]
+    assert output == expected_output
+
+
+def test_token_length_function_invalid():
+    with pytest.raises(ValueError):
+        token_length_function("cl100k_base")
+    with pytest.raises(ValueError):
+        token_length_function("unknown:cl100k_base")
+
+
+def test_token_length_function_tiktoken():
+    pytest.importorskip("tiktoken")
+    length = token_length_function("tiktoken:cl100k_base")
+    assert length("hello world") == 2
+    assert length("hello world") == 2
+    assert length.cache_info().hits == 1
+    # special tokens in the documents are counted as plain text
+    assert length("<|endoftext|>") > 1
+
+
+def test_token_length_function_caches_short_texts_only(monkeypatch):
+    monkeypatch.setattr(
+        "opsmate.textsplitters.tokenizers._encoder", lambda _: str.split
+    )
+    length = token_length_function("fake:words", cache_max_length=100)
+    assert length("hello world") == 2
+    assert length.cache_info().currsize == 1
+
+    # the long texts are counted but not kept in the cache
+    document = "hello world " * 1000
+    assert length(document) == length(document) == 2000
+    assert length.cache_info().currsize == 1
+    assert length.cache_info().misses == 1
@@ -0,0 +1,89 @@
+import os
+import pytest
+import re
+import time
+from unittest.mock import patch
+from opsmate.dino.spill import SpillStore
+from opsmate.tools.spill import SpillRead
+from opsmate.tools.utils import maybe_truncate_text
+
+
+def test_spill_store_content_addressed(tmp_path):
+    store = SpillStore(path=str(tmp_path))
+    key = store.put("hello world")
+    assert store.put("hello world") == key
+    assert os.listdir(tmp_path) == [f"{key}.txt"]
+
+
+def test_spill_store_read(tmp_path):
+    store = SpillStore(path=str(tmp_path))
+    key = store.put("".join(f"line {i}\n" for i in range(10)))
+
+    assert store.read(key, start=2, end=4) == "line 2\nline 3\n"
+    assert store.read(key, start=8) == "line 8\nline 9\n"
+    assert store.read(key, start=0, end=4, unit="byte") == "line"
+
+    with pytest.raises(ValueError):
+        store.read("../../etc/passwd")
+    with pytest.raises(FileNotFoundError):
+        store.read("0" * 32)
+
+
+def test_spill_store_cleanup(tmp_path):
+    store = SpillStore(path=str(tmp_path), max_bytes=25, ttl=60)
+    old = store.put("a" * 10)
+    os.utime(store.file_path(old), (time.time() - 120,) * 2)
+    first = store.put("b" * 10)
+    os.utime(store.file_path(first), (time.time() - 10,) * 2)
+
+    # the expired one goes, then the least recent one over the size
+    latest = store.put("c" * 10)
+    assert not os.path.exists(store.file_path(old))
+    assert os.path.exists(store.file_path(first))
+
+    store.put("d" * 10)
+    assert not os.path.exists(store.file_path(first))
+    assert os.path.exists(store.file_path(latest))
+
+
+def test_spill_store_cleanup_throttled(tmp_path):
+    store = SpillStore(path=str(tmp_path), max_bytes=25, ttl=60)
+    store.put("a" * 10)
+
+    # within the budget the directory is not scanned
+    with patch("opsmate.dino.spill.os.scandir", wraps=os.scandir) as scandir:
+        store.put("b" * 10)
+        store.put("b" * 10)
+        assert scandir.call_count == 0
+
+        store.put("c" * 10)
+        assert scandir.call_count == 1
+    assert len(os.listdir(tmp_path)) == 2
+
+    # the expired ones are removed once the interval has passed
+    store.cleanup_interval = 0
+    for name in os.listdir(tmp_path):
+        os.utime(tmp_path / name, (time.time() - 120,) * 2)
+    latest = store.put("d" * 5)
+    assert os.listdir(tmp_path) == [f"{latest}.txt"]
+
+
+@pytest.mark.asyncio
+async def test_maybe_truncate_text(tmp_path):
+    store = SpillStore(path=str(tmp_path))
+    assert maybe_truncate_text("short", max_length=10, store=store) == "short"
+    assert os.listdir(tmp_path) == []
+
+    text = "".join(f"line {i}\n" for i in range(100))
+    truncated = maybe_truncate_text(text, max_length=100, store=store)
+    assert truncated.endswith(text[-100:])
+    key = re.search(r"spill id (\w+)", truncated).group(1)
+
+    with patch("opsmate.tools.spill.default_spill_store", return_value=store):
+        tool = SpillRead(spill_id=key, start=1, end=3)
+        assert await tool.run() == "line 1\nline 2\n"
+
+        tool = SpillRead(spill_id=key)
+        output = await tool.run(context={"max_output_length": 10})
+        assert output.startswith("line 0\nlin")
+        assert "read a narrower range" in output
@@ -13,6 +13,9 @@ from opsmate.tools.system import (
     SysEnv,
     HttpResponse,
 )
+from opsmate.dino.cache import ToolCache
+from opsmate.tools.command_line import ShellCommand
+import asyncio
 import os
 import json
 import respx
@@ -119,6 +122,79 @@ async def test_file_read(sample_file):
     assert result == "test content"
 
 
+@pytest.mark.asyncio
+async def test_file_read_cached(sample_file):
+    context = {"tool_cache": ToolCache()}
+    assert await FileRead(path=sample_file).run(context) == "test content"
+
+    with open(sample_file, "w") as f:
+        f.write("changed outside")
+    file_read = FileRead(path=sample_file)
+    assert await file_read.run(context) == "test content"
+    assert file_read.cached
+    assert file_read.prompt_display().startswith("<cached>")
+
+    # written by the tools, the cached reads are invalidated
+    await FileWrite(path=sample_file, data="new content").run(context)
+    file_read = FileRead(path=sample_file)
+    assert await file_read.run(context) == "new content"
+    assert not file_read.cached
+    assert not file_read.prompt_display().startswith("<cached>")
+
+    # not cached outside of a session
+    file_read = FileRead(path=sample_file)
+    await file_read.run()
+    await file_read.run()
+    assert not file_read.cached
+
+
+@pytest.mark.asyncio
+async def test_file_read_cache_invalidated_by_side_effects(sample_file):
+    context = {"tool_cache": ToolCache()}
+    assert await FileRead(path=sample_file).run(context) == "test content"
+
+    # the read-only tools keep the cache
+    await SysEnv(env_vars=["HOME"]).run(context)
+    file_read = FileRead(path=sample_file)
+    assert await file_read.run(context) == "test content"
+    assert file_read.cached
+
+    # any other tool may have side effects
+    await ShellCommand(
+        description="overwrite the file", command=f"echo -n changed > {sample_file}"
+    ).run(context)
+    file_read = FileRead(path=sample_file)
+    assert await file_read.run(context) == "changed"
+    assert not file_read.cached
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_http_get_cache_invalidated_while_in_flight():
+    context = {"tool_cache": ToolCache()}
+    release = asyncio.Event()
+    texts = iter(["before", "after"])
+
+    async def respond(request):
+        text = next(texts)
+        if text == "before":
+            await release.wait()
+        return Response(200, text=text)
+
+    respx.get("https://example.com").mock(side_effect=respond)
+
+    # the read started before the side effect does not cache its stale output
+    stale = asyncio.create_task(HttpGet(url="https://example.com").run(context))
+    await asyncio.sleep(0.05)
+    await ShellCommand(description="change the page", command="true").run(context)
+    release.set()
+    assert (await stale).text == "before"
+
+    http_get = HttpGet(url="https://example.com")
+    assert (await http_get.run(context)).text == "after"
+    assert not http_get.cached
+
+
 @pytest.mark.asyncio
 async def test_file_write(temp_dir):
     test_path = os.path.join(temp_dir, "write_test.txt")
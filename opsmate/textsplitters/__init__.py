@@ -1,9 +1,16 @@
 from .base import TextSplitter
 from .recursive import RecursiveTextSplitter
 from .markdown_header import MarkdownHeaderTextSplitter
+from .pool import split_texts, asplit_texts
 from typing import Dict, Any
 
-__all__ = ["TextSplitter", "RecursiveTextSplitter", "MarkdownHeaderTextSplitter"]
+__all__ = [
+    "TextSplitter",
+    "RecursiveTextSplitter",
+    "MarkdownHeaderTextSplitter",
+    "split_texts",
+    "asplit_texts",
+]
 
 RECURSIVE_SPLITTER = "recursive"
 MARKDOWN_HEADER_SPLITTER = "markdown_header"
@@ -15,6 +22,8 @@ SPLITTERS = {
 
 
 def splitter_from_config(config: Dict[str, Any]) -> TextSplitter:
+    # do not mutate the caller's config
+    config = dict(config)
     name = config.pop("splitter", RECURSIVE_SPLITTER)
     if name not in SPLITTERS:
         raise ValueError(
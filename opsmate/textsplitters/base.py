@@ -1,6 +1,37 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import BinaryIO, Callable, Iterator, List, TextIO, Union
 from pydantic import BaseModel, Field
+from mmap import mmap
+from .tokenizers import token_length_function
+import codecs
+
+# the number of characters (or bytes) read at a time from a file object
+BLOCK_SIZE = 64 * 1024
+
+TextSource = Union[str, TextIO, BinaryIO, mmap]
+
+
+def iter_blocks(source: TextSource, block_size: int = BLOCK_SIZE) -> Iterator[str]:
+    """
+    Iterate over the text of the source in blocks.
+    Binary file objects and mmap'd buffers are decoded as utf-8 incrementally.
+    """
+    if isinstance(source, str):
+        for idx in range(0, len(source), block_size):
+            yield source[idx : idx + block_size]
+        return
+
+    decoder = None
+    while block := source.read(block_size):
+        if isinstance(block, str):
+            yield block
+            continue
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder("utf-8")()
+        if text := decoder.decode(block):
+            yield text
+    if decoder is not None and (text := decoder.decode(b"", final=True)):
+        yield text
 
 
 class Chunk(BaseModel):
@@ -28,6 +59,8 @@ class TextSplitter(ABC):
         # practically, we don't want any overlap
         chunk_overlap: int = 0,
         separators: List[str] = [],
+        tokenizer: str | None = None,
+        length_function: Callable[[str], int] | None = None,
     ):
         """
         Initialize the text splitter
@@ -35,9 +68,16 @@ class TextSplitter(ABC):
             chunk_size: The size of the chunks to split the text into
             chunk_overlap: The overlap between the chunks
             separator: The separators to use to split the text
+            tokenizer: Measure the sizes in tokens of the tokenizer, e.g. "tiktoken:cl100k_base"
+                or "sentence-transformers:BAAI/bge-small-en-v1.5", instead of characters
+            length_function: Measure the sizes with a custom function instead of characters
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        if tokenizer:
+            length_function = token_length_function(tokenizer)
+        self.length_function = length_function
+        self._length = length_function or len
         if separators:
             self.separators = separators
         else:
@@ -45,3 +85,12 @@ class TextSplitter(ABC):
 
     @abstractmethod
     def split_text(self, text: str) -> List[Chunk]: ...
+
+    def iter_split(self, source: TextSource) -> Iterator[Chunk]:
+        """
+        Split the text of a string, a file object or a mmap'd buffer,
+        yielding the chunks as they complete.
+        """
+        if not isinstance(source, str):
+            source = "".join(iter_blocks(source))
+        yield from self.split_text(source)
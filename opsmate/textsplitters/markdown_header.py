@@ -2,9 +2,11 @@
 # The original code can be found at https://github.com/langchain-ai/langchain/blob/master/libs/text-splitters/langchain_text_splitters/markdown.py
 # License: MIT License
 
-from typing import List, Tuple, Dict, TypedDict
+from typing import Iterable, Iterator, List, Tuple, Dict, TypedDict
 from opsmate.textsplitters.base import Chunk
-from .base import TextSplitter
+from .base import TextSplitter, TextSource, iter_blocks
+from .recursive import RecursiveTextSplitter
+import re
 
 
 class LineType(TypedDict):
@@ -22,6 +24,16 @@ class HeaderType(TypedDict):
     data: str
 
 
+def _iter_lines(blocks: Iterable[str]) -> Iterator[str]:
+    """Same as "".join(blocks).split("\n") without joining the blocks."""
+    pending = ""
+    for block in blocks:
+        lines = (pending + block).split("\n")
+        pending = lines.pop()
+        yield from lines
+    yield pending
+
+
 class MarkdownHeaderTextSplitter(TextSplitter):
     """Splitting markdown files based on specified headers."""
 
@@ -30,6 +42,9 @@ class MarkdownHeaderTextSplitter(TextSplitter):
         headers_to_split_on: List[Tuple[str, str]],
         return_each_line: bool = False,
         strip_headers: bool = True,
+        chunk_size: int | None = None,
+        chunk_overlap: int = 0,
+        tokenizer: str | None = None,
     ):
         """Create a new MarkdownHeaderTextSplitter.
 
@@ -37,6 +52,10 @@ class MarkdownHeaderTextSplitter(TextSplitter):
             headers_to_split_on: Headers we want to track
             return_each_line: Return each line w/ associated headers
             strip_headers: Strip split headers from the content of the chunk
+            chunk_size: When set, sections larger than the chunk size are
+                sub-split with the recursive text splitter
+            chunk_overlap: The overlap between the sub-split chunks
+            tokenizer: Measure the chunk size in tokens of the tokenizer, see TextSplitter
         """
         # Output line-by-line or aggregated into chunks w/ common headers
         self.return_each_line = return_each_line
@@ -45,31 +64,53 @@ class MarkdownHeaderTextSplitter(TextSplitter):
         self.headers_to_split_on = sorted(
             headers_to_split_on, key=lambda split: len(split[0]), reverse=True
         )
+        # Match all the headers in one go, the alternation is tried in the order
+        # above, and a header is followed by a space or nothing
+        self.header_pattern = (
+            re.compile(
+                "(?:"
+                + "|".join(f"({re.escape(sep)})" for sep, _ in self.headers_to_split_on)
+                + r")(?= |\Z)"
+            )
+            if self.headers_to_split_on
+            else None
+        )
         # Strip headers split headers from the content of the chunk
         self.strip_headers = strip_headers
+        self.sub_splitter = (
+            RecursiveTextSplitter(
+                chunk_size=chunk_size, chunk_overlap=chunk_overlap, tokenizer=tokenizer
+            )
+            if chunk_size
+            else None
+        )
 
     def aggregate_lines_to_chunks(self, lines: List[LineType]) -> List[Chunk]:
         """Combine lines with common metadata into chunks
         Args:
             lines: Line of text / associated header metadata
         """
-        aggregated_chunks: List[LineType] = []
+        return list(self._iter_aggregated_chunks(lines))
+
+    def _iter_aggregated_chunks(self, lines: Iterable[LineType]) -> Iterator[Chunk]:
+        """Combine lines with common metadata into chunks, yielding each chunk
+        as soon as a line with different metadata starts the next one.
+        """
+        # Content parts and metadata of the chunk being aggregated
+        parts: List[str] = []
+        metadata: Dict[str, str] | None = None
 
         for line in lines:
-            if (
-                aggregated_chunks
-                and aggregated_chunks[-1]["metadata"] == line["metadata"]
-            ):
+            if metadata is not None and metadata == line["metadata"]:
                 # If the last line in the aggregated list
                 # has the same metadata as the current line,
                 # append the current content to the last lines's content
-                aggregated_chunks[-1]["content"] += "  \n" + line["content"]
+                parts.append(line["content"])
             elif (
-                aggregated_chunks
-                and aggregated_chunks[-1]["metadata"] != line["metadata"]
+                metadata is not None
                 # may be issues if other metadata is present
-                and len(aggregated_chunks[-1]["metadata"]) < len(line["metadata"])
-                and aggregated_chunks[-1]["content"].split("\n")[-1][0] == "#"
+                and len(metadata) < len(line["metadata"])
+                and parts[-1].rsplit("\n", 1)[-1].startswith("#")
                 and not self.strip_headers
             ):
                 # If the last line in the aggregated list
@@ -78,27 +119,62 @@ class MarkdownHeaderTextSplitter(TextSplitter):
                 # and the last line is a header,
                 # and we are not stripping headers,
                 # append the current content to the last line's content
-                aggregated_chunks[-1]["content"] += "  \n" + line["content"]
+                parts.append(line["content"])
                 # and update the last line's metadata
-                aggregated_chunks[-1]["metadata"] = line["metadata"]
+                metadata = line["metadata"]
             else:
-                # Otherwise, append the current line to the aggregated list
-                aggregated_chunks.append(line)
+                # Otherwise, the last chunk is complete,
+                # and the current line starts a new one
+                if metadata is not None:
+                    yield from self._chunks("  \n".join(parts), metadata)
+                parts, metadata = [line["content"]], line["metadata"]
+
+        if metadata is not None:
+            yield from self._chunks("  \n".join(parts), metadata)
 
-        return [
-            Chunk(content=chunk["content"], metadata=chunk["metadata"])
-            for chunk in aggregated_chunks
-        ]
+    def _chunks(self, content: str, metadata: Dict[str, str]) -> Iterator[Chunk]:
+        """Build the chunks of a section, sub-splitting it when it is too large"""
+        if (
+            self.sub_splitter is None
+            or self.sub_splitter._length(content) <= self.sub_splitter.chunk_size
+        ):
+            yield Chunk(content=content, metadata=metadata)
+            return
+
+        for chunk in self.sub_splitter.split_text(content):
+            yield Chunk(content=chunk.content, metadata=metadata)
 
     def split_text(self, text: str) -> List[Chunk]:
         """Split markdown file
         Args:
             text: Markdown file"""
+        return list(self.iter_split(text))
+
+    def iter_split(self, source: TextSource) -> Iterator[Chunk]:
+        """Split markdown from a string, a file object or a mmap'd buffer line by line,
+        yielding the chunks as they complete.
+        Args:
+            source: Markdown file"""
+        if isinstance(source, str):
+            # Split the input text by newline character ("\n").
+            lines = source.split("\n")
+        else:
+            lines = _iter_lines(iter_blocks(source))
+
+        lines_with_metadata = self._iter_lines_with_metadata(lines)
 
-        # Split the input text by newline character ("\n").
-        lines = text.split("\n")
-        # Final output
-        lines_with_metadata: List[LineType] = []
+        # lines_with_metadata has each line with associated header metadata
+        # aggregate these into chunks based on common metadata
+        if not self.return_each_line:
+            yield from self._iter_aggregated_chunks(lines_with_metadata)
+        else:
+            for chunk in lines_with_metadata:
+                yield Chunk(content=chunk["content"], metadata=chunk["metadata"])
+
+    def _iter_lines_with_metadata(self, lines: Iterable[str]) -> Iterator[LineType]:
+        """Attach the header metadata to the lines, yielding the lines as they complete
+        Args:
+            lines: Lines of the markdown file"""
         # Content and metadata of the chunk currently being processed
         current_content: List[str] = []
         current_metadata: Dict[str, str] = {}
@@ -113,8 +189,9 @@ class MarkdownHeaderTextSplitter(TextSplitter):
         for line in lines:
             stripped_line = line.strip()
             # Remove all non-printable characters from the string, keeping only visible
-            # text.
-            stripped_line = "".join(filter(str.isprintable, stripped_line))
+            # text. Most lines are printable already.
+            if not stripped_line.isprintable():
+                stripped_line = "".join(filter(str.isprintable, stripped_line))
             if not in_code_block:
                 # Exclude inline code spans
                 if stripped_line.startswith("```") and stripped_line.count("```") == 1:
@@ -132,83 +209,67 @@ class MarkdownHeaderTextSplitter(TextSplitter):
                 current_content.append(stripped_line)
                 continue
 
-            # Check each line against each of the header types (e.g., #, ##)
-            for sep, name in self.headers_to_split_on:
-                # Check if line starts with a header that we intend to split on
-                if stripped_line.startswith(sep) and (
-                    # Header with no text OR header is followed by space
-                    # Both are valid conditions that sep is being used a header
-                    len(stripped_line) == len(sep)
-                    or stripped_line[len(sep)] == " "
-                ):
-                    # Ensure we are tracking the header as metadata
-                    if name is not None:
-                        # Get the current header level
-                        current_header_level = sep.count("#")
-
-                        # Pop out headers of lower or same level from the stack
-                        while (
-                            header_stack
-                            and header_stack[-1]["level"] >= current_header_level
-                        ):
-                            # We have encountered a new header
-                            # at the same or higher level
-                            popped_header = header_stack.pop()
-                            # Clear the metadata for the
-                            # popped header in initial_metadata
-                            if popped_header["name"] in initial_metadata:
-                                initial_metadata.pop(popped_header["name"])
-
-                        # Push the current header to the stack
-                        header: HeaderType = {
-                            "level": current_header_level,
-                            "name": name,
-                            "data": stripped_line[len(sep) :].strip(),
-                        }
-                        header_stack.append(header)
-                        # Update initial_metadata with the current header
-                        initial_metadata[name] = header["data"]
-
-                    # Add the previous line to the lines_with_metadata
-                    # only if current_content is not empty
-                    if current_content:
-                        lines_with_metadata.append(
-                            {
-                                "content": "\n".join(current_content),
-                                "metadata": current_metadata.copy(),
-                            }
-                        )
-                        current_content.clear()
-
-                    if not self.strip_headers:
-                        current_content.append(stripped_line)
-
-                    break
-            else:
-                if stripped_line:
-                    current_content.append(stripped_line)
-                elif current_content:
-                    lines_with_metadata.append(
-                        {
-                            "content": "\n".join(current_content),
-                            "metadata": current_metadata.copy(),
-                        }
-                    )
+            # Check the line against all the header types (e.g., #, ##)
+            match = (
+                self.header_pattern.match(stripped_line)
+                if self.header_pattern is not None and stripped_line
+                else None
+            )
+            if match is not None:
+                sep, name = self.headers_to_split_on[match.lastindex - 1]
+                # Ensure we are tracking the header as metadata
+                if name is not None:
+                    # The metadata dicts are shared by the lines yielded until
+                    # the headers change, so never update them in place
+                    initial_metadata = initial_metadata.copy()
+
+                    # Get the current header level
+                    current_header_level = sep.count("#")
+
+                    # Pop out headers of lower or same level from the stack
+                    while (
+                        header_stack
+                        and header_stack[-1]["level"] >= current_header_level
+                    ):
+                        # We have encountered a new header
+                        # at the same or higher level
+                        popped_header = header_stack.pop()
+                        # Clear the metadata for the
+                        # popped header in initial_metadata
+                        if popped_header["name"] in initial_metadata:
+                            initial_metadata.pop(popped_header["name"])
+
+                    # Push the current header to the stack
+                    header: HeaderType = {
+                        "level": current_header_level,
+                        "name": name,
+                        "data": stripped_line[len(sep) :].strip(),
+                    }
+                    header_stack.append(header)
+                    # Update initial_metadata with the current header
+                    initial_metadata[name] = header["data"]
+
+                # Add the previous line to the lines_with_metadata
+                # only if current_content is not empty
+                if current_content:
+                    yield {
+                        "content": "\n".join(current_content),
+                        "metadata": current_metadata,
+                    }
                     current_content.clear()
 
-            current_metadata = initial_metadata.copy()
+                if not self.strip_headers:
+                    current_content.append(stripped_line)
+            elif stripped_line:
+                current_content.append(stripped_line)
+            elif current_content:
+                yield {
+                    "content": "\n".join(current_content),
+                    "metadata": current_metadata,
+                }
+                current_content.clear()
 
-        if current_content:
-            lines_with_metadata.append(
-                {"content": "\n".join(current_content), "metadata": current_metadata}
-            )
+            current_metadata = initial_metadata
 
-        # lines_with_metadata has each line with associated header metadata
-        # aggregate these into chunks based on common metadata
-        if not self.return_each_line:
-            return self.aggregate_lines_to_chunks(lines_with_metadata)
-        else:
-            return [
-                Chunk(content=chunk["content"], metadata=chunk["metadata"])
-                for chunk in lines_with_metadata
-            ]
+        if current_content:
+            yield {"content": "\n".join(current_content), "metadata": current_metadata}
@@ -0,0 +1,109 @@
+from typing import Any, Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from .base import TextSplitter, Chunk
+import asyncio
+import json
+import multiprocessing
+import os
+
+# the number of shards per worker, so that uneven shards even out
+SHARDS_PER_WORKER = 4
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Return the process pool shared by the splits with the same number of workers.
+    The workers are spawned rather than forked, as the parent process runs threads.
+    """
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pools[workers]
+
+
+@lru_cache(maxsize=8)
+def _splitter(splitter_config: str) -> TextSplitter:
+    from . import splitter_from_config
+
+    return splitter_from_config(json.loads(splitter_config))
+
+
+def _split_shard(splitter_config: str, texts: List[str]) -> List[List[Chunk]]:
+    splitter = _splitter(splitter_config)
+    return [list(splitter.iter_split(text)) for text in texts]
+
+
+def _shards(texts: List[str], num_shards: int) -> List[List[str]]:
+    """
+    Partition the texts into contiguous shards of roughly the same total size.
+    """
+    target = max(sum(len(text) for text in texts) // num_shards, 1)
+    shards, shard, size = [], [], 0
+    for text in texts:
+        shard.append(text)
+        size += len(text)
+        if size >= target:
+            shards.append(shard)
+            shard, size = [], 0
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def _workers(workers: int | None) -> int:
+    if workers is None:
+        return os.cpu_count() or 1
+    return workers
+
+
+def split_texts(
+    texts: List[str], splitter_config: Dict[str, Any], workers: int | None = None
+) -> List[List[Chunk]]:
+    """
+    Split the texts across a process pool, returning the chunks of each text in order.
+
+    Args:
+        texts: The texts to split
+        splitter_config: The config of the splitter, see splitter_from_config
+        workers: The number of worker processes, defaults to the number of CPUs.
+            With 1 or fewer the texts are split in the current process.
+    """
+    config = json.dumps(splitter_config, sort_keys=True)
+    workers = _workers(workers)
+    if workers <= 1 or len(texts) <= 1:
+        return _split_shard(config, texts)
+
+    shards = _shards(texts, workers * SHARDS_PER_WORKER)
+    pool = process_pool(workers)
+    return [
+        chunks
+        for shard_chunks in pool.map(_split_shard, [config] * len(shards), shards)
+        for chunks in shard_chunks
+    ]
+
+
+async def asplit_texts(
+    texts: List[str],
+    splitter_config: Dict[str, Any],
+    workers: int | None = None,
+) -> List[List[Chunk]]:
+    """
+    Same as split_texts without blocking the event loop.
+    A single text is still split in the pool, so that the loop is free meanwhile.
+    """
+    config = json.dumps(splitter_config, sort_keys=True)
+    workers = _workers(workers)
+    if workers <= 1:
+        return _split_shard(config, texts)
+
+    loop = asyncio.get_running_loop()
+    pool = process_pool(workers)
+    shards = _shards(texts, workers * SHARDS_PER_WORKER) if texts else []
+    results = await asyncio.gather(
+        *[loop.run_in_executor(pool, _split_shard, config, shard) for shard in shards]
+    )
+    return [chunks for shard_chunks in results for chunks in shard_chunks]
@@ -1,87 +1,304 @@
-from typing import List
-from .base import TextSplitter, Chunk
+from typing import Iterator, List, Tuple
+from collections import deque
+from itertools import chain
+from .base import TextSplitter, Chunk, TextSource, BLOCK_SIZE, iter_blocks
+
+# (start, end, separator, length) of a fragment of the text
+Span = Tuple[int, int, str, int]
 
 
 class RecursiveTextSplitter(TextSplitter):
-    def split_text(self, text: str) -> List[str]:
+    def split_text(self, text: str) -> List[Chunk]:
         """
         Split the text into chunks of size chunk_size with overlap chunk_overlap
+
+        The text is split into index spans in a single pass, and the strings are
+        only materialised when the chunks are built.
         """
-        splits = self._split_text(text, 0)
-        splits = self._merge_splits(splits)
-        return self._handle_overlap(splits)
+        spans = []
+        self._split_spans(text, 0, len(text), 0, self.separators[-1], spans)
+        merged = self._merge_spans(spans)
+        return self._handle_overlap(text, spans, merged)
 
-    def _split_text(self, text: str, separatorLevel: int) -> List[Chunk]:
-        if separatorLevel == len(self.separators):
-            return [
-                Chunk(
-                    content=text,
-                    metadata={"seperator": self.separators[-1]},
-                )
-            ]
+    def iter_split(self, source: TextSource) -> Iterator[Chunk]:
+        """
+        Split the text of a string, a file object or a mmap'd buffer incrementally,
+        yielding the same chunks as split_text as they complete.
 
-        if len(text) <= self.chunk_size:
-            return [
-                Chunk(
-                    content=text,
-                    metadata={"seperator": self.separators[separatorLevel - 1]},
-                )
-            ]
+        Pieces of the text that fit in a block are split in memory, larger ones are
+        split as a stream, so the memory used is bounded by the block and chunk sizes
+        rather than the size of the text.
+        """
+        if isinstance(source, str):
+            yield from self.split_text(source)
+            return
 
-        separator = self.separators[separatorLevel]
-        splits = text.split(separator)
-        splits = [split for split in splits if split]
+        leaves = self._iter_leaves(iter_blocks(source), 0, self.separators[-1])
+        yield from self._iter_overlap(self._iter_merge(leaves))
 
-        result = []
-        for split in splits:
-            result.extend(self._split_text(split, separatorLevel + 1))
+    def _iter_leaves(
+        self, blocks: Iterator[str], separator_level: int, separator: str
+    ) -> Iterator[Tuple[str, str, int]]:
+        """
+        Streaming counterpart of _split_spans, yielding the (fragment, separator, length)
+        leaves.
+        """
+        head, size = [], 0
+        limit = max(self.chunk_size, BLOCK_SIZE)
+        for block in blocks:
+            head.append(block)
+            size += len(block)
+            if size > limit:
+                if self.length_function is None:
+                    break
+                # a long run of characters can still be few tokens
+                if self.length_function("".join(head)) > self.chunk_size:
+                    break
+                limit = size * 2
+        else:
+            # the whole piece is in memory
+            text = "".join(head)
+            spans = []
+            self._split_spans(text, 0, len(text), separator_level, separator, spans)
+            for start, end, sep, length in spans:
+                yield text[start:end], sep, length
+            return
 
-        return result
+        blocks = chain(head, blocks)
+        if separator_level == len(self.separators):
+            text = "".join(blocks)
+            yield text, separator, self._length(text)
+            return
+
+        separator = self.separators[separator_level]
+        if not separator:
+            for block in blocks:
+                for char in block:
+                    yield char, separator, self._length(char)
+            return
+
+        for piece in self._iter_pieces(blocks, separator):
+            yield from self._iter_leaves(piece, separator_level + 1, separator)
+
+    @staticmethod
+    def _iter_pieces(blocks: Iterator[str], separator: str) -> Iterator[Iterator[str]]:
+        """
+        Split the stream of blocks by the separator, yielding a stream of blocks for
+        each non-empty piece. Each piece is drained before the next one is yielded.
+        """
+        blocks = iter(blocks)
+        pending, pos = "", 0
+        exhausted = False
+
+        def piece() -> Iterator[str]:
+            nonlocal pending, pos, exhausted
+            while True:
+                idx = pending.find(separator, pos)
+                if idx != -1:
+                    if idx > pos:
+                        yield pending[pos:idx]
+                    pos = idx + len(separator)
+                    return
+
+                # hold back the tail that may be the start of a separator
+                cut = max(pos, len(pending) - len(separator) + 1)
+                if cut > pos:
+                    yield pending[pos:cut]
+                    pos = cut
+
+                block = next(blocks, None)
+                if block is None:
+                    exhausted = True
+                    if pos < len(pending):
+                        yield pending[pos:]
+                    pending, pos = "", 0
+                    return
+                pending, pos = pending[pos:] + block, 0
+
+        while not exhausted:
+            blocks_of_piece = piece()
+            first = next(blocks_of_piece, None)
+            if first is None:
+                continue
+            yield chain((first,), blocks_of_piece)
+            for _ in blocks_of_piece:
+                pass
+
+    def _iter_merge(
+        self, leaves: Iterator[Tuple[str, str, int]]
+    ) -> Iterator[Tuple[List[str], str, int]]:
+        """
+        Streaming counterpart of _merge_spans, yielding the parts, separator and size
+        of each chunk.
+        """
+        parts = None
+        for text, separator, length in leaves:
+            separator_length = self._length(separator)
+            if (
+                parts is not None
+                and size + separator_length + length <= self.chunk_size
+            ):
+                parts.append(separator)
+                parts.append(text)
+                size += separator_length + length
+                continue
+            if parts is not None:
+                yield parts, first_separator, size
+            parts, first_separator, size = [text], separator, length
+
+        if parts is not None:
+            yield parts, first_separator, size
 
-    def _merge_splits(self, splits: List[Chunk]) -> List[Chunk]:
+    def _iter_overlap(
+        self, merged: Iterator[Tuple[List[str], str, int]]
+    ) -> Iterator[Chunk]:
+        """
+        Streaming counterpart of _handle_overlap, looking ahead only as far as
+        the overlap of the current chunk reaches.
+        """
+        merged = iter(merged)
+        window = deque()
+        while True:
+            if not window:
+                next_merged = next(merged, None)
+                if next_merged is None:
+                    return
+                window.append(next_merged)
+            parts, separator, size = window[0]
+            overlap_remain = self.chunk_overlap + self.chunk_size - size
+
+            content = list(parts)
+            idx = 1
+            while overlap_remain > 0:
+                if idx == len(window):
+                    next_merged = next(merged, None)
+                    if next_merged is None:
+                        break
+                    window.append(next_merged)
+                parts2, separator2, size2 = window[idx]
+                separator2_length = self._length(separator2)
+                if separator2_length + size2 > overlap_remain:
+                    break
+                content.append(separator2)
+                content.extend(parts2)
+                overlap_remain -= size2 - separator2_length
+                idx += 1
+
+            yield Chunk(content="".join(content), metadata={"seperator": separator})
+            window.popleft()
+
+    def _split_spans(
+        self,
+        text: str,
+        start: int,
+        end: int,
+        separator_level: int,
+        separator: str,
+        spans: List[Span],
+        length: int | None = None,
+    ):
+        """
+        Recursively split text[start:end] with the separators from separator_level onwards,
+        appending the spans of the fragments that fit in the chunk size to spans.
+        The length of each fragment is measured once and kept in its span.
+        """
+        if self.length_function is None:
+            length = end - start
+        elif length is None:
+            length = self.length_function(text[start:end])
+        if separator_level == len(self.separators) or length <= self.chunk_size:
+            spans.append((start, end, separator, length))
+            return
+
+        separator = self.separators[separator_level]
+        for split_start, split_end in self._separate(text, start, end, separator):
+            self._split_spans(
+                text,
+                split_start,
+                split_end,
+                separator_level + 1,
+                separator,
+                spans,
+                # the separator is not in the text, no need to measure it again
+                length if (split_start, split_end) == (start, end) else None,
+            )
+
+    @staticmethod
+    def _separate(
+        text: str, start: int, end: int, separator: str
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Same as text[start:end].split(separator) with the empty splits dropped,
+        yielding the index spans instead of the substrings.
+        An empty separator splits the text into characters.
+        """
+        if not separator:
+            for idx in range(start, end):
+                yield idx, idx + 1
+            return
+
+        while start <= end:
+            idx = text.find(separator, start, end)
+            if idx == -1:
+                idx = end
+            if idx > start:
+                yield start, idx
+            start = idx + len(separator)
+
+    def _merge_spans(self, spans: List[Span]) -> List[Tuple[int, int, int]]:
+        """
+        Greedily merge the consecutive spans into chunks of at most chunk_size.
+        Returns the (first, last) span indices of each chunk together with its size.
+        """
         result = []
         idx = 0
-        while idx < len(splits):
-            sep1, add = splits[idx].metadata["seperator"], splits[idx].content
+        while idx < len(spans):
+            first = idx
+            size = spans[idx][3]
             idx += 1
-            while idx < len(splits):
-                sep2, chunk = splits[idx].metadata["seperator"], splits[idx].content
-                if len(add) + len(sep2) + len(chunk) <= self.chunk_size:
-                    add += sep2 + chunk
+            while idx < len(spans):
+                _, _, separator, length = spans[idx]
+                length += self._length(separator)
+                if size + length <= self.chunk_size:
+                    size += length
                     idx += 1
                 else:
                     break
-            result.append(
-                Chunk(
-                    content=add,
-                    metadata={"seperator": sep1},
-                )
-            )
+            result.append((first, idx, size))
         return result
 
-    def _handle_overlap(self, splits: List[Chunk]) -> List[Chunk]:
+    def _handle_overlap(
+        self, text: str, spans: List[Span], merged: List[Tuple[int, int, int]]
+    ) -> List[Chunk]:
         result = []
-        for idx, split in enumerate(splits):
-            sep1, add = split.metadata["seperator"], split.content
-            overlap_remain = self.chunk_overlap + self.chunk_size - len(add)
+        for idx, (first, last, size) in enumerate(merged):
+            overlap_remain = self.chunk_overlap + self.chunk_size - size
 
-            while overlap_remain > 0:
-                for idx2 in range(idx + 1, len(splits)):
-                    sep2, chunk = (
-                        splits[idx2].metadata["seperator"],
-                        splits[idx2].content,
-                    )
-                    if len(sep2) + len(chunk) <= overlap_remain:
-                        add += sep2 + chunk
-                        overlap_remain -= len(chunk) - len(sep2)
+            if overlap_remain > 0:
+                for idx2 in range(idx + 1, len(merged)):
+                    first2, last2, size2 = merged[idx2]
+                    separator_length = self._length(spans[first2][2])
+                    if separator_length + size2 <= overlap_remain:
+                        last = last2
+                        overlap_remain -= size2 - separator_length
                     else:
                         break
-                break
+
             result.append(
                 Chunk(
-                    content=add,
-                    metadata={"seperator": sep1},
+                    content=self._join(text, spans, first, last),
+                    metadata={"seperator": spans[first][2]},
                 )
             )
 
         return result
+
+    @staticmethod
+    def _join(text: str, spans: List[Span], first: int, last: int) -> str:
+        start, end, _, _ = spans[first]
+        parts = [text[start:end]]
+        for idx in range(first + 1, last):
+            start, end, separator, _ = spans[idx]
+            parts.append(separator)
+            parts.append(text[start:end])
+        return "".join(parts)
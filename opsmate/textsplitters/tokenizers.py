@@ -0,0 +1,92 @@
+from functools import lru_cache
+from typing import Callable, List
+
+# the number of token counts cached per length function
+TOKEN_COUNT_CACHE_SIZE = 65536
+# texts longer than this, in characters, are counted without being cached,
+# about 4 chunks of the default 1000 tokens
+TOKEN_COUNT_CACHE_MAX_LENGTH = 16384
+
+
+def token_length_function(
+    tokenizer: str,
+    cache_size: int = TOKEN_COUNT_CACHE_SIZE,
+    cache_max_length: int = TOKEN_COUNT_CACHE_MAX_LENGTH,
+) -> Callable[[str], int]:
+    """
+    Return a function counting the tokens of a text, with the counts of the
+    recently seen fragments kept in an LRU cache, which lives as long as the
+    returned function, e.g. the text splitter using it.
+
+    Only the fragments up to cache_max_length characters are cached, the whole
+    documents and the large spans are counted directly so that they are not
+    kept alive by the cache.
+
+    Args:
+        tokenizer: "tiktoken:<encoding or model name>", e.g. "tiktoken:cl100k_base", or
+            "sentence-transformers:<model name>", e.g. "sentence-transformers:BAAI/bge-small-en-v1.5"
+        cache_size: The number of token counts to cache
+        cache_max_length: The maximum length in characters of the texts to cache
+    """
+    encode = _encoder(tokenizer)
+
+    @lru_cache(maxsize=cache_size)
+    def cached_length(text: str) -> int:
+        return len(encode(text))
+
+    def length(text: str) -> int:
+        if len(text) > cache_max_length:
+            return len(encode(text))
+        return cached_length(text)
+
+    length.cache_info = cached_length.cache_info
+    length.cache_clear = cached_length.cache_clear
+    return length
+
+
+@lru_cache
+def _encoder(tokenizer: str) -> Callable[[str], List[int]]:
+    kind, _, name = tokenizer.partition(":")
+    if not name:
+        raise ValueError(
+            f"Invalid tokenizer: {tokenizer}, must be in the form of <kind>:<name>"
+        )
+
+    match kind:
+        case "tiktoken":
+            encode = _tiktoken_encoder(name)
+        case "sentence-transformers":
+            encode = _transformers_encoder(name)
+        case _:
+            raise ValueError(
+                f"Unknown tokenizer: {kind}, must be one of tiktoken, sentence-transformers"
+            )
+    return encode
+
+
+def _tiktoken_encoder(name: str) -> Callable[[str], List[int]]:
+    try:
+        import tiktoken
+    except ImportError:
+        raise ImportError(
+            "tiktoken is not installed, please install it with `pip install tiktoken`"
+        )
+
+    if name in tiktoken.list_encoding_names():
+        encoding = tiktoken.get_encoding(name)
+    else:
+        encoding = tiktoken.encoding_for_model(name)
+    # documents are plain text, special tokens in them are not special
+    return lambda text: encoding.encode(text, disallowed_special=())
+
+
+def _transformers_encoder(name: str) -> Callable[[str], List[int]]:
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        raise ImportError(
+            "transformers is not installed, please install it with `pip install opsmate[sentence-transformers]`"
+        )
+
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    return lambda text: tokenizer.encode(text, add_special_tokens=False, verbose=False)
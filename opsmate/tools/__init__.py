@@ -21,6 +21,7 @@ from .system import (
 from .prom import PrometheusTool
 from .thinking import Thinking
 from .loki import LokiQueryTool
+from .spill import SpillRead
 from opsmate.dino.tools import discover_tools
 
 __all__ = [
@@ -46,6 +47,7 @@ __all__ = [
     "PrometheusTool",
     "Thinking",
     "LokiQueryTool",
+    "SpillRead",
 ]
 
 discover_tools()
@@ -24,7 +24,8 @@ class ShellCommandConfig(ToolCallConfig):
     )
 
 
-@register_tool(config=ShellCommandConfig)
+# no deadline, the command is bounded by its own timeout and the confirmation can take long
+@register_tool(config=ShellCommandConfig, timeout=None)
 class ShellCommand(ToolCall[str], PresentationMixin):
     """
     ShellCommand tool allows you to run shell commands and get the output.
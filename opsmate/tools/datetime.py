@@ -46,7 +46,7 @@ class DatetimeRange(BaseModel):
         return datetime.strptime(self.end, self._FMT)
 
 
-@register_tool()
+@register_tool(invalidates_cache=False)
 @dtool
 async def current_time() -> str:
     """
@@ -55,7 +55,7 @@ async def current_time() -> str:
     return datetime.now(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
-@register_tool()
+@register_tool(invalidates_cache=False)
 @dtool
 @dino(
     model="gpt-4o-mini",
@@ -47,7 +47,7 @@ class KnowledgeNotFound(BaseModel):
     """
 
 
-@register_tool()
+@register_tool(cacheable=True, ttl=300)
 class KnowledgeRetrieval(
     ToolCall[Union[RetrievalResult, KnowledgeNotFound]], PresentationMixin
 ):
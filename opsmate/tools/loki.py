@@ -37,6 +37,7 @@ class LogParser(str, Enum):
 @dino(
     model="claude-3-7-sonnet-20250219",
     response_model=LogParser,
+    cache=True,
 )
 async def log_format(logline: str, context: dict[str, Any] = {}):
     """
@@ -237,7 +238,7 @@ async def loki_query(query: str, context: dict[str, Any] = {}):
     ]
 
 
-@register_tool()
+@register_tool(invalidates_cache=False)
 class LokiQueryTool(ToolCall[LokiQuery], PresentationMixin):
     """
     A tool to query logs in loki
@@ -262,6 +263,8 @@ class LokiQueryTool(ToolCall[LokiQuery], PresentationMixin):
             model=model,
         )
 
+        # the query is worth returning should it hang
+        self.partial_output = query
         try:
             await query.run(context)
         except Exception as e:
@@ -458,7 +458,7 @@ async def prometheus_query(query: str, context: dict[str, Any] = {}):
     ]
 
 
-@register_tool()
+@register_tool(invalidates_cache=False)
 class PrometheusTool(ToolCall[PromQuery], PresentationMixin):
     """
     PrometheusTool is a tool to query metrics from prometheus tsdb via natural language
@@ -482,6 +482,8 @@ class PrometheusTool(ToolCall[PromQuery], PresentationMixin):
             model=model,
         )
 
+        # the query is worth returning should it hang
+        self.partial_output = prom_query
         await prom_query.run(context)
         if "error" in prom_query:
             raise Exception(prom_query["error"])
@@ -0,0 +1,49 @@
+from opsmate.dino.types import ToolCall, PresentationMixin, register_tool
+from opsmate.dino.spill import default_spill_store
+from typing import Any, Literal
+from pydantic import Field
+
+
+@register_tool(invalidates_cache=False)
+class SpillRead(ToolCall[str], PresentationMixin):
+    """
+    SpillRead tool allows you to read a range of a tool output that is truncated,
+    by the spill id given in the truncation notice.
+    """
+
+    spill_id: str = Field(description="The spill id of the truncated output")
+    start: int = Field(
+        description="The first line or byte of the range, counted from 0", default=0
+    )
+    end: int | None = Field(
+        description="The line or byte the range ends before, the end of the output if not set",
+        default=None,
+    )
+    unit: Literal["line", "byte"] = Field(
+        description="Whether the range is in lines or bytes", default="line"
+    )
+
+    async def __call__(self, context: dict[str, Any] = {}):
+        max_output_length = context.get("max_output_length", 10000)
+        text = default_spill_store().read(
+            self.spill_id, start=self.start, end=self.end, unit=self.unit
+        )
+        if len(text) > max_output_length:
+            return (
+                text[:max_output_length]
+                + f"\n<truncated>{len(text) - max_output_length} characters over the limit, read a narrower range</truncated>"
+            )
+        return text
+
+    def markdown(self, context: dict[str, Any] = {}):
+        return f"""
+### Spilled output
+
+{self.spill_id}, {self.unit}s {self.start} to {self.end if self.end is not None else "the end"}
+
+### Output
+
+```
+{self.output}
+```
+"""
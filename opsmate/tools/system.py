@@ -27,7 +27,7 @@ class HttpBase(ToolCall[HttpResponse], PresentationMixin):
         return self._client
 
 
-@register_tool()
+@register_tool(cacheable=True, ttl=60)
 class HttpGet(HttpBase):
     """HttpGet tool allows you to get the content of a URL"""
 
@@ -105,7 +105,7 @@ resp code: {self.output.status_code}
 """
 
 
-@register_tool()
+@register_tool(invalidates_cache=False)
 class HtmlToText(HttpBase):
     """HtmlToText tool allows you to convert an HTTP response to text"""
 
@@ -140,7 +140,7 @@ class Fs(ToolCall[str], PresentationMixin):
     def markdown(self, context: Dict[str, Any] = {}): ...
 
 
-@register_tool()
+@register_tool(cacheable=True, ttl=30)
 class FileRead(Fs):
     """FileRead tool allows you to read a file"""
 
@@ -220,7 +220,7 @@ class FileAppend(Fs):
 """
 
 
-@register_tool()
+@register_tool(cacheable=True, ttl=30)
 class FilesList(Fs):
     """FilesList tool allows you to list files in a directory recursively"""
 
@@ -257,7 +257,7 @@ class FilesList(Fs):
 """
 
 
-@register_tool()
+@register_tool(invalidates_cache=False)
 class FilesFind(Fs):
     """FilesFind tool allows you to find files in a directory"""
 
@@ -312,7 +312,7 @@ class FileDelete(Fs):
 """
 
 
-@register_tool()
+@register_tool(invalidates_cache=False)
 class SysStats(Fs):
     """SysStats tool allows you to get the stats of a file"""
 
@@ -368,7 +368,7 @@ class SysChdir(Fs):
 """
 
 
-@register_tool()
+@register_tool(invalidates_cache=False)
 class SysEnv(Fs):
     """SysEnv tool allows you to get the environment variables"""
 
@@ -6,7 +6,7 @@ import structlog
 logger = structlog.get_logger(__name__)
 
 
-@register_tool()
+@register_tool(invalidates_cache=False)
 class Thinking(ToolCall[str], PresentationMixin):
     """
     Use the tool to think about something.
@@ -1,21 +1,31 @@
-import tempfile
+from opsmate.dino.spill import SpillStore, default_spill_store
+import structlog
 
+logger = structlog.get_logger(__name__)
 
-def maybe_truncate_text(text: str, max_length: int = 10000) -> str:
-    tmp_file = _write_text_to_tmp_file(text)
 
-    truncate_notice = f"""<truncated>
-The initial content is truncated due to the maximum text length reached
-Please refer to the file for the full content: {tmp_file}
-<truncated>
-"""
-    if len(text) > max_length:
-        return truncate_notice + text[len(text) - max_length :]
-    return text
+def maybe_truncate_text(
+    text: str, max_length: int = 10000, store: SpillStore | None = None
+) -> str:
+    """
+    Keep the tail of the text over max_length, spilling the full text over
+    to the store for the `SpillRead` tool to read.
+    """
+    if len(text) <= max_length:
+        return text
 
+    store = store or default_spill_store()
+    try:
+        key = store.put(text)
+        reference = f"""The full content is spilled over to {store.file_path(key)},
+use the SpillRead tool with the spill id {key} to read the ranges of it"""
+    except OSError as e:
+        logger.warning("failed to spill the text over", error=str(e))
+        reference = "The full content is not available"
 
-def _write_text_to_tmp_file(text: str) -> str:
-    tmp_file = tempfile.NamedTemporaryFile(delete=False)
-    tmp_file.write(text.encode())
-    tmp_file.close()
-    return tmp_file.name
+    truncate_notice = f"""<truncated>
+The initial {len(text) - max_length} characters are truncated due to the maximum text length reached
+{reference}
+</truncated>
+"""
+    return truncate_notice + text[len(text) - max_length :]